@@ -1,9 +1,17 @@
 """
 Flask application factory.
 """
+from .services import startup
+import sys
+import click
 from flask import Flask
-from .config import get_config
-from .extensions import db, migrate, login_manager, bcrypt, csrf
+from werkzeug.middleware.proxy_fix import ProxyFix
+from .config import get_config, validate_config
+from .extensions import db, login_manager, bcrypt, csrf, pool_monitor, template_profiler, assets
+from .extensions import admission, autocomplete, search_cache, shared_cache, db_time, profiler, tracer
+from .extensions import metrics, text_search, analytics, user_activity
+from .services.db_pool import build_engine_options
+from .services.templates import configure_bytecode_cache, precompile
 
 
 def create_app(config_class=None):
@@ -16,24 +24,55 @@ def create_app(config_class=None):
     Returns:
         Flask application instance.
     """
+    timer = startup.StartupTimer()
     app = Flask(__name__)
+    app.extensions['startup'] = timer
     
     # Load configuration
-    if config_class is None:
-        config_class = get_config()
-    app.config.from_object(config_class)
+    with timer.phase('config'):
+        if config_class is None:
+            config_class = get_config()
+        app.config.from_object(config_class)
+        validate_config(app.config)
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(app.config)
+        configure_bytecode_cache(app)
+        if app.config['TRUSTED_PROXY_COUNT']:
+            proxies = app.config['TRUSTED_PROXY_COUNT']
+            app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies)
     
     # Initialize extensions
-    db.init_app(app)
-    migrate.init_app(app, db)
-    login_manager.init_app(app)
-    bcrypt.init_app(app)
-    csrf.init_app(app)
+    with timer.phase('extensions'):
+        db.init_app(app)
+        login_manager.init_app(app)
+        bcrypt.init_app(app)
+        csrf.init_app(app)
+        pool_monitor.init_app(app)
+        template_profiler.init_app(app)
+        assets.init_app(app)
+        admission.init_app(app)
+        autocomplete.init_app(app)
+        shared_cache.init_app(app)
+        search_cache.init_app(app)
+        db_time.init_app(app)
+        profiler.init_app(app)
+        tracer.init_app(app)
+        metrics.init_app(app)
+        text_search.init_app(app)
+        analytics.init_app(app)
+        user_activity.init_app(app)
+        
+        # Alembic is only needed by the `flask db` commands
+        if not app.config['FAST_START'] or click.get_current_context(silent=True):
+            from flask_migrate import Migrate
+            Migrate(app, db)
     
     # Import models for migrations
-    from .models import User, Company, JobPosting, Resume, Country, State
-    from .models import EducationLevel, ExperienceLevel, JobType
-    from .models import MyJob, MyResume, MySearch
+    with timer.phase('models'):
+        from .models import User, Company, JobPosting, Resume, Country, State
+        from .models import EducationLevel, ExperienceLevel, JobType
+        from .models import MyJob, MyResume, MySearch
+        from .models import BackgroundTask, JobPostingBucket, JobPostingDailyStats
+        from .models import ArchivedJobPosting, ArchivedMyJob
     
     # User loader for Flask-Login
     @login_manager.user_loader
@@ -41,31 +80,48 @@ def create_app(config_class=None):
         return User.query.get(int(user_id))
     
     # Register blueprints
-    from .routes.main import main_bp
-    from .routes.auth import auth_bp
-    from .routes.employer import employer_bp
-    from .routes.jobseeker import jobseeker_bp
-    from .routes.admin import admin_bp
-    
-    app.register_blueprint(main_bp)
-    app.register_blueprint(auth_bp, url_prefix='/auth')
-    app.register_blueprint(employer_bp, url_prefix='/employer')
-    app.register_blueprint(jobseeker_bp, url_prefix='/jobseeker')
-    app.register_blueprint(admin_bp, url_prefix='/admin')
-    
-    # Create database tables (with error handling for missing DB connection)
-    with app.app_context():
-        try:
-            db.create_all()
-        except Exception as e:
-            app.logger.warning(f"Could not create database tables: {e}")
-            app.logger.warning("Database may not be available. Some features may not work.")
-    
-    # Register error handlers
-    register_error_handlers(app)
-    
-    # Register template context processors
-    register_context_processors(app)
+    with timer.phase('blueprints'):
+        from .routes.main import main_bp
+        from .routes.auth import auth_bp
+        from .routes.employer import employer_bp
+        from .routes.jobseeker import jobseeker_bp
+        from .routes.admin import admin_bp
+        
+        app.register_blueprint(main_bp)
+        app.register_blueprint(auth_bp, url_prefix='/auth')
+        app.register_blueprint(employer_bp, url_prefix='/employer')
+        app.register_blueprint(jobseeker_bp, url_prefix='/jobseeker')
+        app.register_blueprint(admin_bp, url_prefix='/admin')
+    
+    # Compile templates up front so a preloading master shares them with workers
+    if app.config['PRECOMPILE_TEMPLATES']:
+        with timer.phase('templates'):
+            precompile(app)
+    
+    # Create database tables (with error handling for missing DB connection).
+    # Fast-start trusts the schema to be managed by migrations, and so do the
+    # `flask db` commands: tables created here would make them fail.
+    if app.config['FAST_START'] or _loading_for_migrations():
+        timer.skip('create_all')
+    else:
+        with timer.phase('create_all'), app.app_context():
+            try:
+                db.create_all()
+            except Exception as e:
+                app.logger.warning(f"Could not create database tables: {e}")
+                app.logger.warning("Database may not be available. Some features may not work.")
+    
+    with timer.phase('handlers'):
+        # Register error handlers
+        register_error_handlers(app)
+        
+        # Register template context processors
+        register_context_processors(app)
+        
+        # Register CLI commands
+        register_commands(app)
+    
+    app.logger.info(timer.report())
     
     return app
 
@@ -96,3 +152,24 @@ def register_context_processors(app):
     @app.context_processor
     def inject_app_name():
         return {'app_name': app.config.get('APP_NAME', 'JobSite')}
+
+
+def _loading_for_migrations():
+    """Whether the app is being loaded to run a `flask db` command."""
+    if click.get_current_context(silent=True) is None:
+        return False
+    # The app is loaded while click resolves the command name, before the
+    # context knows it; `flask [--app NAME] db ...`
+    words = [arg for arg in sys.argv[1:] if not arg.startswith('-')]
+    return 'db' in words[:2]
+
+
+def register_commands(app):
+    """Register custom CLI commands."""
+    from .commands import commands
+    
+    for command in commands:
+        app.cli.add_command(command)
+
+
+startup.mark_imported()
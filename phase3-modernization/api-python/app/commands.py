@@ -0,0 +1,236 @@
+"""
+Custom Flask CLI commands.
+"""
+import os
+
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+
+assets_cli = AppGroup('assets', help='Build fingerprinted, precompressed static assets.')
+
+
+@click.command('startup-report')
+@with_appcontext
+def startup_report():
+    """Print how long each phase of create_app took."""
+    click.echo(current_app.extensions['startup'].report())
+
+
+@click.command('compile-templates')
+@with_appcontext
+def compile_templates():
+    """Compile all templates into the Jinja bytecode cache."""
+    from .services.templates import precompile
+
+    count = precompile(current_app)
+    cache = current_app.jinja_env.bytecode_cache
+    if cache is None:
+        click.echo(f'Compiled {count} templates (no bytecode cache configured).')
+    else:
+        click.echo(f'Compiled {count} templates into {cache.directory}.')
+
+
+@assets_cli.command('build')
+@click.option('--vendor', is_flag=True, help='Download the Bootstrap bundles to self-host first.')
+def build_assets_command(vendor):
+    """Fingerprint and precompress everything under static/."""
+    from .services.assets import build_assets, download_vendor_assets
+
+    if vendor:
+        for filename in download_vendor_assets(current_app.static_folder):
+            click.echo(f'Downloaded {filename}')
+    manifest = build_assets(current_app.static_folder)
+    click.echo(f'Built {len(manifest)} assets into {current_app.static_folder}/build.')
+
+
+@assets_cli.command('vendor')
+def vendor_assets_command():
+    """Download the Bootstrap bundles into static/vendor."""
+    from .services.assets import download_vendor_assets
+
+    for filename in download_vendor_assets(current_app.static_folder):
+        click.echo(f'Downloaded {filename}')
+
+
+@click.command('worker')
+@click.option('--concurrency', '-c', default=4, show_default=True, help='Tasks run at once.')
+@click.option('--pool', type=click.Choice(['thread', 'process']), default='thread', show_default=True,
+              help='Use processes for CPU-bound tasks.')
+@click.option('--poll-interval', default=1.0, show_default=True, help='Seconds between queue polls.')
+@click.option('--burst', is_flag=True, help='Exit once the queue is empty.')
+@with_appcontext
+def worker(concurrency, pool, poll_interval, burst):
+    """Run queued background tasks."""
+    from .services.tasks import Worker
+
+    click.echo(f'Starting {pool} worker with concurrency {concurrency}.')
+    Worker(current_app._get_current_object(), concurrency=concurrency, pool=pool,
+           poll_interval=poll_interval).run(burst=burst)
+
+
+dedup_cli = AppGroup('dedup', help='Near-duplicate job posting detection.')
+
+
+@dedup_cli.command('cluster')
+@click.option('--batch-size', default=1000, show_default=True, help='Postings read per batch.')
+def dedup_cluster(batch_size):
+    """Recompute signatures for all job postings and re-cluster duplicates."""
+    from .services.dedup import cluster_catalog
+
+    postings, clusters, duplicates = cluster_catalog(
+        batch_size=batch_size,
+        progress=lambda done: click.echo(f'Indexed {done} postings...'),
+    )
+    click.echo(f'{postings} postings: {duplicates} duplicates in {clusters} clusters.')
+
+
+archive_cli = AppGroup('archive', help='Move expired job postings to the archive tables.')
+
+
+@archive_cli.command('sweep')
+@click.option('--batch-size', type=int, default=None, help='Postings moved per transaction (default ARCHIVE_BATCH_SIZE).')
+@click.option('--dry-run', is_flag=True, help='Only count the postings that would be archived.')
+def archive_sweep(batch_size, dry_run):
+    """Archive job postings matching the expiry rules."""
+    from .services.archive import count_expired, sweep
+
+    if dry_run:
+        click.echo(f'{count_expired()} postings would be archived.')
+        return
+    click.echo(f'Archived {sweep(batch_size=batch_size)} postings.')
+
+
+cache_cli = AppGroup('cache', help='Shared cache maintenance.')
+
+
+@cache_cli.command('clear')
+def cache_clear():
+    """Invalidate every entry of the shared cache in all workers."""
+    from .extensions import shared_cache
+
+    if not shared_cache.enabled:
+        click.echo('The shared cache is disabled.')
+        return
+    shared_cache.clear()
+    click.echo('Shared cache cleared.')
+
+
+server_cli = AppGroup('server', help='Production server (gunicorn, preloaded).')
+
+
+@server_cli.command('start')
+@click.option('--bind', default=None, help='Address to listen on (default SERVE_BIND).')
+@click.option('--worker-class', type=click.Choice(['sync', 'threaded']), default=None,
+              help='Worker type (default SERVE_WORKER_CLASS).')
+@click.option('--workers', '-w', type=int, default=None, help='Worker processes (default: sized automatically).')
+@click.option('--threads', type=int, default=None, help='Threads per threaded worker (default: sized automatically).')
+@click.option('--db-wait-ratio', type=click.FloatRange(0, 1), default=None,
+              help='Share of request time spent waiting on the database (default: measured).')
+def server_start(bind, worker_class, workers, threads, db_wait_ratio):
+    """Serve the preloaded application with forked workers."""
+    from .services import serving
+
+    serving.run(current_app._get_current_object(), bind=bind, worker_class=worker_class,
+                workers=workers, threads=threads, db_wait_ratio=db_wait_ratio)
+
+
+@server_cli.command('reload')
+@click.option('--code', is_flag=True, help='Start a new master from the current code, then stop the old one.')
+@click.option('--timeout', default=60, show_default=True, help='Seconds to wait for the new workers.')
+def server_reload(code, timeout):
+    """Gracefully restart the workers of the running server."""
+    from .services import serving
+
+    pidfile = current_app.config['SERVE_PIDFILE'] or os.path.join(current_app.instance_path, 'serve.pid')
+    try:
+        pid = serving.reload_server(pidfile, code=code, timeout=timeout)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Reloaded; master {pid} is serving.')
+
+
+@server_cli.command('status')
+def server_status():
+    """Show the running server's workers, their memory and the worker sizing."""
+    from .services import serving
+
+    app = current_app._get_current_object()
+    pidfile = app.config['SERVE_PIDFILE'] or os.path.join(app.instance_path, 'serve.pid')
+    master = serving.read_pid(pidfile)
+    if master is None:
+        click.echo(f'No server pid in {pidfile}.')
+    else:
+        click.echo(f'Master {master}: {serving.format_memory(serving.memory_usage(master))}')
+        for pid in serving.worker_pids(master):
+            click.echo(f'  worker {pid}: {serving.format_memory(serving.memory_usage(pid))}')
+    worker_class, workers, threads, ratio, source = serving.sizing(app)
+    click.echo(f'Sizing: {serving.describe(worker_class, workers, threads)} '
+               f'({serving.cpu_count()} CPUs, DB wait ratio {ratio:.2f} {source}).')
+
+
+traces_cli = AppGroup('traces', help='Inspect exported request traces.')
+
+
+@traces_cli.command('show')
+@click.option('--limit', '-n', type=int, default=5, help='Number of traces to print.')
+@click.option('--slowest', is_flag=True, help='Print the slowest traces instead of the latest.')
+@click.option('--path', default=None, help='Trace file (default TRACE_FILE).')
+def traces_show(limit, slowest, path):
+    """Print exported traces as span trees."""
+    from .extensions import tracer
+    from .services.tracing import format_trace, read_traces
+
+    path = path or tracer.path
+    if not os.path.exists(path):
+        click.echo(f'No traces in {path}.')
+        return
+    traces = list(read_traces(path))
+    if slowest:
+        traces.sort(key=lambda spans: max(int(s['endTimeUnixNano']) - int(s['startTimeUnixNano'])
+                                          for s in spans))
+    for spans in traces[-limit:]:
+        click.echo(f'trace {spans[0]["traceId"]}')
+        click.echo(format_trace(spans))
+        click.echo()
+
+
+sitemap_cli = AppGroup('sitemap', help='Sitemaps of active job postings and companies.')
+
+
+@sitemap_cli.command('build')
+@click.option('--full', is_flag=True, help='Rewrite every sitemap, not only the ones that changed.')
+def sitemap_build(full):
+    """Write the sitemaps whose postings or companies changed."""
+    from .services.sitemaps import build, sitemap_dir
+
+    report = build(full=full)
+    click.echo(f'Sitemaps in {sitemap_dir(current_app)}: {len(report["written"])} written, '
+               f'{report["unchanged"]} unchanged, {len(report["removed"])} removed.')
+
+
+job_pages_cli = AppGroup('job-pages', help='Static snapshots of public job pages.')
+
+
+@job_pages_cli.command('publish')
+@click.option('--company-id', type=int, default=None, help='Only the postings of this company.')
+def job_pages_publish(company_id):
+    """Rewrite the snapshots of all active postings."""
+    from .services.job_pages import pages_root, publish_all
+
+    click.echo(f'Published {publish_all(company_id=company_id)} job pages to {pages_root()}.')
+
+
+commands = [
+    startup_report,
+    compile_templates,
+    assets_cli,
+    worker,
+    dedup_cli,
+    archive_cli,
+    cache_cli,
+    server_cli,
+    traces_cli,
+    sitemap_cli,
+    job_pages_cli,
+]
@@ -1,18 +1,50 @@
 """
 Flask extensions initialization.
+
+Flask-Migrate is set up in create_app so that Alembic is only imported when
+it is needed.
 """
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_bcrypt import Bcrypt
 from flask_wtf.csrf import CSRFProtect
+from .services.admission import AdmissionController
+from .services.analytics import PostingAnalytics
+from .services.assets import AssetPipeline
+from .services.autocomplete import Autocomplete
+from .services.db_pool import PoolMonitor
+from .services.db_routing import RoutingSession
+from .services.metrics import Metrics
+from .services.profiler import Profiler
+from .services.search_cache import SearchCache
+from .services.serving import DbTimeMeter
+from .services.shared_cache import SharedCache
+from .services.spelling import SpellChecker
+from .services.templates import TemplateProfiler
+from .services.text_search import TextSearch
+from .services.tracing import Tracer
+from .services.user_activity import UserActivity
 
 # Initialize extensions
-db = SQLAlchemy()
-migrate = Migrate()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 bcrypt = Bcrypt()
 csrf = CSRFProtect()
+pool_monitor = PoolMonitor()
+template_profiler = TemplateProfiler()
+assets = AssetPipeline()
+admission = AdmissionController()
+autocomplete = Autocomplete()
+spelling = SpellChecker()
+shared_cache = SharedCache()
+search_cache = SearchCache(shared_cache)
+db_time = DbTimeMeter()
+profiler = Profiler()
+tracer = Tracer()
+metrics = Metrics()
+text_search = TextSearch()
+analytics = PostingAnalytics()
+user_activity = UserActivity()
 
 # Configure login manager
 login_manager.login_view = 'auth.login'
@@ -4,10 +4,10 @@ WTForms form definitions.
 from .auth_forms import LoginForm, RegistrationForm, ChangePasswordForm
 from .company_forms import CompanyProfileForm
 from .job_forms import JobPostingForm
-from .resume_forms import ResumeForm
+from .resume_forms import ResumeForm, ResumeDocumentForm
 from .admin_forms import (
     EducationLevelForm, ExperienceLevelForm, JobTypeForm,
-    CountryForm, StateForm
+    CountryForm, StateForm, ProfilerTargetForm
 )
 
 __all__ = [
@@ -17,9 +17,11 @@ __all__ = [
     'CompanyProfileForm',
     'JobPostingForm',
     'ResumeForm',
+    'ResumeDocumentForm',
     'EducationLevelForm',
     'ExperienceLevelForm',
     'JobTypeForm',
     'CountryForm',
     'StateForm',
+    'ProfilerTargetForm',
 ]
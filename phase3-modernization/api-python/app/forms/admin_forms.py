@@ -2,8 +2,8 @@
 Admin forms for reference data management.
 """
 from flask_wtf import FlaskForm
-from wtforms import StringField, SelectField
-from wtforms.validators import DataRequired, Length
+from wtforms import StringField, SelectField, FloatField
+from wtforms.validators import DataRequired, InputRequired, Length, NumberRange
 
 
 class EducationLevelForm(FlaskForm):
@@ -52,3 +52,15 @@ class StateForm(FlaskForm):
     country_id = SelectField('Country', coerce=int, validators=[
         DataRequired(message='Country is required')
     ])
+
+
+class ProfilerTargetForm(FlaskForm):
+    """Profiler target form."""
+    
+    endpoint = SelectField('Endpoint', validators=[
+        DataRequired(message='Endpoint is required')
+    ])
+    rate = FloatField('Sample Rate (%)', validators=[
+        InputRequired(message='Rate is required'),
+        NumberRange(min=0, max=100)
+    ])
@@ -2,6 +2,7 @@
 Resume forms.
 """
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileAllowed, FileRequired
 from wtforms import StringField, TextAreaField, SelectField, BooleanField
 from wtforms.validators import DataRequired, Length, Optional
 
@@ -30,3 +31,12 @@ class ResumeForm(FlaskForm):
     education_level_id = SelectField('Education Level', coerce=int, validators=[Optional()])
     experience_level_id = SelectField('Experience Level', coerce=int, validators=[Optional()])
     is_searchable = BooleanField('Make my resume searchable by employers', default=True)
+
+
+class ResumeDocumentForm(FlaskForm):
+    """Resume document upload form."""
+    
+    document = FileField('Resume Document', validators=[
+        FileRequired(message='Choose a file to upload'),
+        FileAllowed(['pdf', 'docx', 'txt'], message='Upload a PDF, DOCX or TXT file')
+    ])
@@ -4,14 +4,20 @@ SQLAlchemy models for JobSite application.
 from .user import User
 from .company import Company
 from .job_posting import JobPosting
+from .job_posting_bucket import JobPostingBucket
+from .job_posting_stats import JobPostingDailyStats
 from .resume import Resume
 from .reference_data import Country, State, EducationLevel, ExperienceLevel, JobType
 from .user_data import MyJob, MyResume, MySearch
+from .background_task import BackgroundTask
+from .archive import ArchivedJobPosting, ArchivedMyJob
 
 __all__ = [
     'User',
     'Company',
     'JobPosting',
+    'JobPostingBucket',
+    'JobPostingDailyStats',
     'Resume',
     'Country',
     'State',
@@ -21,4 +27,7 @@ __all__ = [
     'MyJob',
     'MyResume',
     'MySearch',
+    'BackgroundTask',
+    'ArchivedJobPosting',
+    'ArchivedMyJob',
 ]
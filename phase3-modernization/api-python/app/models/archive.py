@@ -0,0 +1,76 @@
+"""
+Archive models for expired job postings and their saved-job references.
+
+Rows keep the id they had in the live tables, so old links still resolve.
+"""
+from datetime import datetime
+from ..extensions import db
+from .job_posting import JobPostingDisplayMixin
+
+
+class ArchivedJobPosting(JobPostingDisplayMixin, db.Model):
+    """Job posting moved out of ``job_postings`` by the archive sweeper."""
+    
+    __tablename__ = 'archived_job_postings'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False, index=True)
+    
+    # Job details
+    title = db.Column(db.String(255), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    department = db.Column(db.String(50))
+    job_code = db.Column(db.String(50))
+    contact_person = db.Column(db.String(255))
+    
+    # Location
+    city = db.Column(db.String(50))
+    state_id = db.Column(db.Integer, db.ForeignKey('states.id'))
+    country_id = db.Column(db.Integer, db.ForeignKey('countries.id'))
+    
+    # Requirements
+    education_level_id = db.Column(db.Integer, db.ForeignKey('education_levels.id'))
+    job_type_id = db.Column(db.Integer, db.ForeignKey('job_types.id'))
+    category_id = db.Column(db.Integer)
+    
+    # Salary
+    min_salary = db.Column(db.Numeric(12, 2))
+    max_salary = db.Column(db.Numeric(12, 2))
+    
+    # Metadata
+    posted_date = db.Column(db.DateTime)
+    posted_by = db.Column(db.String(50))
+    is_active = db.Column(db.Boolean)
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    archive_reason = db.Column(db.String(20))  # inactive, expired
+    
+    # Relationships
+    company = db.relationship('Company', backref=db.backref('archived_job_postings', lazy='dynamic'))
+    state = db.relationship('State')
+    country = db.relationship('Country')
+    education_level = db.relationship('EducationLevel')
+    job_type = db.relationship('JobType')
+    
+    def __repr__(self):
+        return f'<ArchivedJobPosting {self.title}>'
+
+
+class ArchivedMyJob(db.Model):
+    """Saved job whose posting was archived."""
+    
+    __tablename__ = 'archived_my_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    job_posting_id = db.Column(db.Integer, db.ForeignKey('archived_job_postings.id'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime)
+    
+    # Relationships
+    job_posting = db.relationship('ArchivedJobPosting', backref='saved_by')
+    
+    def __repr__(self):
+        return f'<ArchivedMyJob user={self.user_id} job={self.job_posting_id}>'
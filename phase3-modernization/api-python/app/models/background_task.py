@@ -0,0 +1,38 @@
+"""
+BackgroundTask model for the durable task queue.
+"""
+from datetime import datetime
+from ..extensions import db
+
+
+class BackgroundTask(db.Model):
+    """Queued unit of background work (see app.services.tasks)."""
+    
+    __tablename__ = 'background_tasks'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(255), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Status: 'queued', 'running', 'done' or 'failed'
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    # Claim information
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_background_tasks_dequeue', 'status', 'priority', 'run_at'),
+    )
+    
+    def __repr__(self):
+        return f'<BackgroundTask {self.id} {self.name} {self.status}>'
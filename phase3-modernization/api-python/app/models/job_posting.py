@@ -5,10 +5,43 @@ from datetime import datetime
 from ..extensions import db
 
 
-class JobPosting(db.Model):
+class JobPostingDisplayMixin:
+    """Formatting shared by live and archived job postings."""
+    
+    @property
+    def salary_range(self):
+        """Return formatted salary range."""
+        if self.min_salary and self.max_salary:
+            return f'${self.min_salary:,.0f} - ${self.max_salary:,.0f}'
+        elif self.min_salary:
+            return f'From ${self.min_salary:,.0f}'
+        elif self.max_salary:
+            return f'Up to ${self.max_salary:,.0f}'
+        return 'Not specified'
+    
+    @property
+    def location(self):
+        """Return formatted location."""
+        parts = []
+        if self.city:
+            parts.append(self.city)
+        if self.state:
+            parts.append(self.state.state_name)
+        if self.country:
+            parts.append(self.country.country_name)
+        return ', '.join(parts) if parts else 'Not specified'
+
+
+class JobPosting(JobPostingDisplayMixin, db.Model):
     """Job posting model."""
     
     __tablename__ = 'job_postings'
+    __table_args__ = (
+        # Company pages list open postings newest first (keyset pagination)
+        db.Index('ix_job_postings_company_listing', 'company_id', 'is_active', 'posted_date', 'id'),
+        # Never reuse the id of an archived posting on SQLite
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False, index=True)
@@ -34,6 +67,10 @@ class JobPosting(db.Model):
     min_salary = db.Column(db.Numeric(12, 2))
     max_salary = db.Column(db.Numeric(12, 2))
     
+    # Near-duplicate detection (see app.services.dedup)
+    minhash = db.Column(db.LargeBinary)
+    duplicate_of_id = db.Column(db.Integer, db.ForeignKey('job_postings.id', ondelete='SET NULL'), index=True)
+    
     # Metadata
     posted_date = db.Column(db.DateTime, default=datetime.utcnow)
     posted_by = db.Column(db.String(50))
@@ -51,26 +88,3 @@ class JobPosting(db.Model):
     
     def __repr__(self):
         return f'<JobPosting {self.title}>'
-    
-    @property
-    def salary_range(self):
-        """Return formatted salary range."""
-        if self.min_salary and self.max_salary:
-            return f'${self.min_salary:,.0f} - ${self.max_salary:,.0f}'
-        elif self.min_salary:
-            return f'From ${self.min_salary:,.0f}'
-        elif self.max_salary:
-            return f'Up to ${self.max_salary:,.0f}'
-        return 'Not specified'
-    
-    @property
-    def location(self):
-        """Return formatted location."""
-        parts = []
-        if self.city:
-            parts.append(self.city)
-        if self.state:
-            parts.append(self.state.state_name)
-        if self.country:
-            parts.append(self.country.country_name)
-        return ', '.join(parts) if parts else 'Not specified'
@@ -0,0 +1,18 @@
+"""
+JobPostingBucket model for near-duplicate detection.
+"""
+from ..extensions import db
+
+
+class JobPostingBucket(db.Model):
+    """LSH bucket membership of a job posting (see app.services.dedup)."""
+    
+    __tablename__ = 'job_posting_buckets'
+    
+    # Hash of (company, band, band of the MinHash signature)
+    bucket = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    job_posting_id = db.Column(db.Integer, db.ForeignKey('job_postings.id', ondelete='CASCADE'),
+                               primary_key=True, index=True)
+    
+    def __repr__(self):
+        return f'<JobPostingBucket {self.bucket} {self.job_posting_id}>'
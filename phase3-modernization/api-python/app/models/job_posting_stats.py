@@ -0,0 +1,23 @@
+"""
+JobPostingDailyStats model for posting analytics.
+"""
+from ..extensions import db
+
+
+class JobPostingDailyStats(db.Model):
+    """Views and saves of a job posting on one (UTC) day (see app.services.analytics).
+
+    There is no foreign key to ``job_postings``: buffered counts may be
+    written after a posting is deleted, and an archived posting keeps its
+    figures under the same id.
+    """
+    
+    __tablename__ = 'job_posting_daily_stats'
+    
+    job_posting_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    day = db.Column(db.Date, primary_key=True)
+    views = db.Column(db.BigInteger, nullable=False, default=0)
+    saves = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<JobPostingDailyStats {self.job_posting_id} {self.day}>'
@@ -33,6 +33,11 @@ class Resume(db.Model):
     category_id = db.Column(db.Integer)
     subcategory_id = db.Column(db.Integer)
     
+    # Uploaded document (stored by content hash; text extracted in the background)
+    document_sha256 = db.Column(db.String(64), index=True)
+    document_filename = db.Column(db.String(255))
+    document_status = db.Column(db.String(20))  # processing, ready, failed
+    
     # Visibility
     is_searchable = db.Column(db.Boolean, default=True)
     
@@ -3,7 +3,8 @@ User model for authentication and authorization.
 """
 from datetime import datetime
 from flask_login import UserMixin
-from ..extensions import db, bcrypt
+from ..extensions import db, bcrypt, metrics
+from ..services.tracing import span
 
 
 class User(UserMixin, db.Model):
@@ -45,11 +46,13 @@ class User(UserMixin, db.Model):
     
     def set_password(self, password):
         """Hash and set the user's password."""
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        with span('bcrypt.hash'), metrics.timer('jobsite_bcrypt_duration_seconds', operation='hash'):
+            self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
     
     def check_password(self, password):
         """Check if the provided password matches the hash."""
-        return bcrypt.check_password_hash(self.password_hash, password)
+        with span('bcrypt.check'), metrics.timer('jobsite_bcrypt_duration_seconds', operation='check'):
+            return bcrypt.check_password_hash(self.password_hash, password)
     
     @property
     def full_name(self):
@@ -21,6 +21,7 @@ class MyJob(db.Model):
     # Unique constraint to prevent duplicate saves
     __table_args__ = (
         db.UniqueConstraint('user_id', 'job_posting_id', name='uq_user_job'),
+        {'sqlite_autoincrement': True},
     )
     
     def __repr__(self):
@@ -1,14 +1,19 @@
 """
 Admin routes (manage reference data).
 """
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+import os
+
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, Response, abort
 from flask_login import login_required, current_user
 from functools import wraps
-from ..extensions import db
+from ..extensions import db, pool_monitor, template_profiler, admission, autocomplete, spelling, search_cache
+from ..extensions import shared_cache, db_time, profiler, tracer, text_search, analytics, user_activity
+from ..services import profiler as profiling, serving
+from ..services.db_routing import replica_reads
 from ..models import EducationLevel, ExperienceLevel, JobType, Country, State
 from ..forms.admin_forms import (
     EducationLevelForm, ExperienceLevelForm, JobTypeForm,
-    CountryForm, StateForm
+    CountryForm, StateForm, ProfilerTargetForm
 )
 
 admin_bp = Blueprint('admin', __name__)
@@ -30,6 +35,7 @@ def admin_required(f):
 @admin_bp.route('/')
 @login_required
 @admin_required
+@replica_reads
 def dashboard():
     """Admin dashboard."""
     stats = {
@@ -251,3 +257,105 @@ def create_state():
         flash('State created successfully.', 'success')
         return redirect(url_for('admin.states'))
     return render_template('admin/state_form.html', form=form, is_new=True)
+
+
+# System
+@admin_bp.route('/instrumentation')
+@login_required
+@admin_required
+def instrumentation():
+    """Show pool gauges, admission control, search indexes and template render timings."""
+    return render_template('admin/instrumentation.html',
+                          pools=pool_monitor.snapshot(),
+                          admission=admission.snapshot(),
+                          autocomplete=autocomplete.snapshot(),
+                          spelling=spelling.snapshot(),
+                          search_cache=search_cache.snapshot(),
+                          text_search=text_search.snapshot(),
+                          shared_cache=shared_cache.snapshot(),
+                          worker=_worker_snapshot(),
+                          tracing=tracer.snapshot(),
+                          write_behind=[analytics.snapshot(), user_activity.snapshot()],
+                          templates=template_profiler.snapshot())
+
+
+def _worker_snapshot():
+    """This worker's pid, memory and DB wait ratio, with the resulting sizing."""
+    worker_class, workers, threads, ratio, source = serving.sizing(current_app)
+    return {
+        'pid': os.getpid(),
+        'memory': serving.format_memory(serving.memory_usage()),
+        'db_time': db_time.snapshot(),
+        'sizing': {'worker_class': worker_class, 'workers': workers, 'threads': threads,
+                   'ratio': ratio, 'source': source, 'cpus': serving.cpu_count()},
+    }
+
+
+@admin_bp.route('/profiler', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def profiler_targets():
+    """List sampled endpoints and their recorded profiles; set sample rates."""
+    form = ProfilerTargetForm()
+    form.endpoint.choices = sorted({rule.endpoint for rule in current_app.url_map.iter_rules()
+                                    if rule.endpoint != 'static'})
+    if form.validate_on_submit():
+        profiler.set_target(form.endpoint.data, form.rate.data)
+        if form.rate.data > 0:
+            flash(f'Sampling {form.rate.data:g}% of {form.endpoint.data} requests.', 'success')
+        else:
+            flash(f'Stopped sampling {form.endpoint.data}.', 'success')
+        return redirect(url_for('admin.profiler_targets'))
+    return render_template('admin/profiler.html', form=form,
+                          targets=profiler.targets(), profiles=profiler.profiles(),
+                          interval_ms=current_app.config['PROFILER_INTERVAL_MS'],
+                          header=profiling.HEADER)
+
+
+@admin_bp.route('/profiler/<name>')
+@login_required
+@admin_required
+def profiler_report(name):
+    """Top functions of an endpoint's recorded samples."""
+    _check_endpoint(name)
+    stacks = profiler.stacks(name)
+    return render_template('admin/profiler_report.html', endpoint=name,
+                          total=sum(stacks.values()),
+                          functions=profiling.top_functions(stacks))
+
+
+@admin_bp.route('/profiler/<name>.folded')
+@login_required
+@admin_required
+def profiler_folded(name):
+    """Download an endpoint's samples in collapsed-stack format."""
+    _check_endpoint(name)
+    return Response(profiling.folded(profiler.stacks(name)), mimetype='text/plain',
+                    headers={'Content-Disposition': f'attachment; filename={name}.folded'})
+
+
+@admin_bp.route('/profiler/<name>.svg')
+@login_required
+@admin_required
+def profiler_flamegraph(name):
+    """Flame graph of an endpoint's samples."""
+    _check_endpoint(name)
+    return Response(profiling.flamegraph_svg(profiler.stacks(name), name),
+                    mimetype='image/svg+xml')
+
+
+@admin_bp.route('/profiler/<name>/clear', methods=['POST'])
+@login_required
+@admin_required
+def profiler_clear(name):
+    """Discard an endpoint's recorded samples."""
+    _check_endpoint(name)
+    profiler.clear(name)
+    flash(f'Profile of {name} cleared.', 'success')
+    return redirect(url_for('admin.profiler_targets'))
+
+
+def _check_endpoint(name):
+    """404 unless ``name`` is an endpoint (it is also used as a directory name)."""
+    if name not in current_app.view_functions:
+        abort(404)
@@ -1,17 +1,18 @@
 """
 Authentication routes (login, register, logout, password management).
 """
-from datetime import datetime
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
-from ..extensions import db
+from ..extensions import db, user_activity
 from ..models import User
+from ..services.admission import admission_control
 from ..forms.auth_forms import LoginForm, RegistrationForm, ChangePasswordForm
 
 auth_bp = Blueprint('auth', __name__)
 
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
+@admission_control('login', methods=('POST',))
 def login():
     """User login page."""
     if current_user.is_authenticated:
@@ -27,8 +28,7 @@ def login():
                 return render_template('auth/login.html', form=form)
             
             login_user(user, remember=form.remember_me.data)
-            user.last_login = datetime.utcnow()
-            db.session.commit()
+            user_activity.stamp(user.id, 'last_login')
             
             flash('Login successful!', 'success')
             
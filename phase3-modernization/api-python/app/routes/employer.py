@@ -1,17 +1,28 @@
 """
 Employer routes (company profile, job postings, resume search).
 """
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, Response, stream_with_context
 from flask_login import login_required, current_user
 from functools import wraps
-from ..extensions import db
-from ..models import Company, JobPosting, Resume, MyResume, Country, State
-from ..models import EducationLevel, JobType
+from ..extensions import db, spelling, text_search
+from ..services import favorites as saved_favorites
+from ..services.admission import admission_control
+from ..services.analytics import posting_totals
+from ..services.db_routing import replica_reads
+from ..services import job_pages
+from ..services.dedup import index_posting, remove_posting
+from ..services.reference_data import choices
+from ..services.resume_documents import send_document
+from ..models import Company, JobPosting, Resume, Country, State
+from ..models import EducationLevel, JobType, ArchivedJobPosting
 from ..forms.company_forms import CompanyProfileForm
 from ..forms.job_forms import JobPostingForm
 
 employer_bp = Blueprint('employer', __name__)
 
+# Days of views and saves shown on the dashboard
+STATS_DAYS = 30
+
 
 def employer_required(f):
     """Decorator to require employer user type."""
@@ -29,11 +40,13 @@ def employer_required(f):
 @employer_bp.route('/dashboard')
 @login_required
 @employer_required
+@replica_reads
 def dashboard():
     """Employer dashboard."""
     company = Company.query.filter_by(user_id=current_user.id).first()
     job_count = 0
     recent_jobs = []
+    stats = {}
     
     if company:
         job_count = JobPosting.query.filter_by(company_id=company.id).count()
@@ -41,11 +54,14 @@ def dashboard():
             .order_by(JobPosting.posted_date.desc())\
             .limit(5)\
             .all()
+        stats = posting_totals([job.id for job in recent_jobs], days=STATS_DAYS)
     
     return render_template('employer/dashboard.html',
                           company=company,
                           job_count=job_count,
-                          recent_jobs=recent_jobs)
+                          recent_jobs=recent_jobs,
+                          stats=stats,
+                          stats_days=STATS_DAYS)
 
 
 @employer_bp.route('/company-profile', methods=['GET', 'POST'])
@@ -57,12 +73,8 @@ def company_profile():
     form = CompanyProfileForm(obj=company)
     
     # Populate dropdown choices
-    form.country_id.choices = [(0, 'Select Country')] + [
-        (c.id, c.country_name) for c in Country.query.order_by(Country.country_name).all()
-    ]
-    form.state_id.choices = [(0, 'Select State')] + [
-        (s.id, s.state_name) for s in State.query.order_by(State.state_name).all()
-    ]
+    form.country_id.choices = [(0, 'Select Country')] + list(choices(Country))
+    form.state_id.choices = [(0, 'Select State')] + list(choices(State))
     
     if form.validate_on_submit():
         if company is None:
@@ -70,6 +82,9 @@ def company_profile():
             db.session.add(company)
         
         form.populate_obj(company)
+        db.session.flush()
+        # The company name and address appear on its job pages
+        job_pages.publish_company_pages.delay(company_id=company.id)
         db.session.commit()
         
         flash('Company profile updated successfully.', 'success')
@@ -89,11 +104,14 @@ def job_postings():
         return redirect(url_for('employer.company_profile'))
     
     page = request.args.get('page', 1, type=int)
-    jobs = JobPosting.query.filter_by(company_id=company.id)\
-        .order_by(JobPosting.posted_date.desc())\
+    archived = request.args.get('archived', type=int) == 1
+    model = ArchivedJobPosting if archived else JobPosting
+    jobs = model.query.filter_by(company_id=company.id)\
+        .order_by(model.posted_date.desc())\
         .paginate(page=page, per_page=10)
+    stats = posting_totals([job.id for job in jobs.items])
     
-    return render_template('employer/job_postings.html', jobs=jobs)
+    return render_template('employer/job_postings.html', jobs=jobs, archived=archived, stats=stats)
 
 
 @employer_bp.route('/job-postings/new', methods=['GET', 'POST'])
@@ -117,7 +135,9 @@ def create_job_posting():
         form.populate_obj(job)
         
         db.session.add(job)
+        index_posting(job)
         db.session.commit()
+        job_pages.try_publish(job.id)
         
         flash('Job posting created successfully.', 'success')
         return redirect(url_for('employer.job_postings'))
@@ -138,7 +158,9 @@ def edit_job_posting(id):
     
     if form.validate_on_submit():
         form.populate_obj(job)
+        index_posting(job)
         db.session.commit()
+        job_pages.try_publish(job.id)
         
         flash('Job posting updated successfully.', 'success')
         return redirect(url_for('employer.job_postings'))
@@ -154,8 +176,10 @@ def delete_job_posting(id):
     company = Company.query.filter_by(user_id=current_user.id).first()
     job = JobPosting.query.filter_by(id=id, company_id=company.id).first_or_404()
     
+    remove_posting(job)
     db.session.delete(job)
     db.session.commit()
+    job_pages.remove(id)
     
     flash('Job posting deleted successfully.', 'success')
     return redirect(url_for('employer.job_postings'))
@@ -164,68 +188,86 @@ def delete_job_posting(id):
 @employer_bp.route('/resume-search')
 @login_required
 @employer_required
+@replica_reads
+@admission_control('search')
 def resume_search():
     """Search resumes."""
     page = request.args.get('page', 1, type=int)
     keyword = request.args.get('keyword', '')
     city = request.args.get('city', '')
+    exact = request.args.get('exact', 0, type=int)
+    
+    correction = spelling.suggest('resumes', keyword) if keyword and not exact else None
+    search_keyword = correction.keyword if correction and correction.applied else keyword
     
     query = Resume.query.filter_by(is_searchable=True)
     
-    if keyword:
-        query = query.filter(
-            Resume.job_title.ilike(f'%{keyword}%') |
-            Resume.resume_text.ilike(f'%{keyword}%')
-        )
+    rank = None
+    if search_keyword:
+        query, rank = text_search.apply(query, Resume, search_keyword)
     
     if city:
         query = query.filter(Resume.target_city.ilike(f'%{city}%'))
     
-    resumes = query.order_by(Resume.post_date.desc())\
+    order = (rank,) if rank is not None else ()
+    resumes = query.order_by(*order, Resume.post_date.desc())\
         .paginate(page=page, per_page=10)
     
     return render_template('employer/resume_search.html',
                           resumes=resumes,
                           keyword=keyword,
+                          correction=correction,
+                          exact=exact,
                           city=city)
 
 
 @employer_bp.route('/resume/<int:id>')
 @login_required
 @employer_required
+@replica_reads
 def view_resume(id):
     """View a resume."""
     resume = Resume.query.filter_by(id=id, is_searchable=True).first_or_404()
     return render_template('employer/view_resume.html', resume=resume)
 
 
+@employer_bp.route('/resume/<int:id>/document')
+@login_required
+@employer_required
+def resume_document(id):
+    """Download a searchable resume's uploaded document."""
+    resume = Resume.query.filter_by(id=id, is_searchable=True).first_or_404()
+    return send_document(resume)
+
+
 @employer_bp.route('/favorites')
 @login_required
 @employer_required
 def favorites():
     """View favorite resumes."""
     page = request.args.get('page', 1, type=int)
-    my_resumes = MyResume.query.filter_by(user_id=current_user.id)\
-        .order_by(MyResume.created_at.desc())\
-        .paginate(page=page, per_page=10)
+    my_resumes = saved_favorites.favorite_resumes_page(current_user.id, page)
     
     return render_template('employer/favorites.html', my_resumes=my_resumes)
 
 
+@employer_bp.route('/favorites/export.csv')
+@login_required
+@employer_required
+def export_favorites():
+    """Download all favorite resumes as CSV."""
+    lines = saved_favorites.export_csv('resumes', current_user.id,
+                                       lambda id: url_for('employer.view_resume', id=id, _external=True))
+    return Response(stream_with_context(lines), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=favorite-resumes.csv'})
+
+
 @employer_bp.route('/favorites/add/<int:resume_id>', methods=['POST'])
 @login_required
 @employer_required
 def add_favorite_resume(resume_id):
     """Add a resume to favorites."""
-    existing = MyResume.query.filter_by(
-        user_id=current_user.id,
-        resume_id=resume_id
-    ).first()
-    
-    if not existing:
-        my_resume = MyResume(user_id=current_user.id, resume_id=resume_id)
-        db.session.add(my_resume)
-        db.session.commit()
+    if saved_favorites.save('resumes', current_user.id, [resume_id]):
         flash('Resume added to favorites.', 'success')
     else:
         flash('Resume is already in your favorites.', 'info')
@@ -233,34 +275,41 @@ def add_favorite_resume(resume_id):
     return redirect(url_for('employer.view_resume', id=resume_id))
 
 
+@employer_bp.route('/favorites/add', methods=['POST'])
+@login_required
+@employer_required
+def add_favorite_resumes():
+    """Add the selected resumes to favorites."""
+    added = saved_favorites.save('resumes', current_user.id, request.form.getlist('resume_id', type=int))
+    flash(f'{len(added)} resume{"s" if len(added) != 1 else ""} added to favorites.', 'success')
+    return redirect(url_for('employer.favorites'))
+
+
 @employer_bp.route('/favorites/remove/<int:id>', methods=['POST'])
 @login_required
 @employer_required
 def remove_favorite_resume(id):
     """Remove a resume from favorites."""
-    my_resume = MyResume.query.filter_by(
-        id=id,
-        user_id=current_user.id
-    ).first_or_404()
-    
-    db.session.delete(my_resume)
-    db.session.commit()
+    if not saved_favorites.remove('resumes', current_user.id, [id]):
+        abort(404)
     
     flash('Resume removed from favorites.', 'success')
     return redirect(url_for('employer.favorites'))
 
 
+@employer_bp.route('/favorites/remove', methods=['POST'])
+@login_required
+@employer_required
+def remove_favorite_resumes():
+    """Remove the selected resumes from favorites."""
+    removed = saved_favorites.remove('resumes', current_user.id, request.form.getlist('id', type=int))
+    flash(f'{removed} resume{"s" if removed != 1 else ""} removed from favorites.', 'success')
+    return redirect(url_for('employer.favorites'))
+
+
 def _populate_job_form_choices(form):
     """Populate dropdown choices for job form."""
-    form.country_id.choices = [(0, 'Select Country')] + [
-        (c.id, c.country_name) for c in Country.query.order_by(Country.country_name).all()
-    ]
-    form.state_id.choices = [(0, 'Select State')] + [
-        (s.id, s.state_name) for s in State.query.order_by(State.state_name).all()
-    ]
-    form.education_level_id.choices = [(0, 'Any Education Level')] + [
-        (e.id, e.education_level_name) for e in EducationLevel.query.all()
-    ]
-    form.job_type_id.choices = [(0, 'Select Job Type')] + [
-        (j.id, j.job_type_name) for j in JobType.query.all()
-    ]
+    form.country_id.choices = [(0, 'Select Country')] + list(choices(Country))
+    form.state_id.choices = [(0, 'Select State')] + list(choices(State))
+    form.education_level_id.choices = [(0, 'Any Education Level')] + list(choices(EducationLevel))
+    form.job_type_id.choices = [(0, 'Select Job Type')] + list(choices(JobType))
@@ -1,13 +1,21 @@
 """
 Job seeker routes (job search, resume management, favorites).
 """
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, Response, stream_with_context
 from flask_login import login_required, current_user
 from functools import wraps
-from ..extensions import db
-from ..models import JobPosting, Resume, MyJob, Company, Country, State
+from ..extensions import db, analytics, search_cache, spelling, text_search
+from ..services import favorites as saved_favorites
+from ..services.admission import admission_control
+from ..services.db_routing import replica_reads
+from ..services.dedup import collapse_duplicates, duplicate_counts
+from ..services.job_pages import anonymous_snapshot
+from ..services.reference_data import choices
+from ..models import JobPosting, Resume, MyJob, Country, State
+from ..models import ArchivedJobPosting
 from ..models import EducationLevel, ExperienceLevel, JobType
-from ..forms.resume_forms import ResumeForm
+from ..forms.resume_forms import ResumeForm, ResumeDocumentForm
+from ..services.resume_documents import DocumentTooLarge, attach_document, send_document
 
 jobseeker_bp = Blueprint('jobseeker', __name__)
 
@@ -28,6 +36,7 @@ def jobseeker_required(f):
 @jobseeker_bp.route('/dashboard')
 @login_required
 @jobseeker_required
+@replica_reads
 def dashboard():
     """Job seeker dashboard."""
     resume = Resume.query.filter_by(user_id=current_user.id).first()
@@ -55,20 +64,26 @@ def dashboard():
 @jobseeker_bp.route('/job-search')
 @login_required
 @jobseeker_required
+@replica_reads
+@admission_control('search')
 def job_search():
     """Search for jobs."""
     page = request.args.get('page', 1, type=int)
-    keyword = request.args.get('keyword', '')
-    city = request.args.get('city', '')
+    keyword = ' '.join(request.args.get('keyword', '').split())
+    city = ' '.join(request.args.get('city', '').split())
     job_type_id = request.args.get('job_type_id', 0, type=int)
+    exact = request.args.get('exact', 0, type=int)
+    
+    # Correct misspelled keywords up front instead of running a search
+    # that finds nothing
+    correction = spelling.suggest('jobs', keyword) if keyword and not exact else None
+    search_keyword = correction.keyword if correction and correction.applied else keyword
     
     query = JobPosting.query.filter_by(is_active=True)
     
-    if keyword:
-        query = query.filter(
-            JobPosting.title.ilike(f'%{keyword}%') |
-            JobPosting.description.ilike(f'%{keyword}%')
-        )
+    rank = None
+    if search_keyword:
+        query, rank = text_search.apply(query, JobPosting, search_keyword)
     
     if city:
         query = query.filter(JobPosting.city.ilike(f'%{city}%'))
@@ -76,25 +91,44 @@ def job_search():
     if job_type_id > 0:
         query = query.filter(JobPosting.job_type_id == job_type_id)
     
-    jobs = query.order_by(JobPosting.posted_date.desc())\
-        .paginate(page=page, per_page=10)
+    # Reposts of the same ad are shown once
+    query = collapse_duplicates(query)
+    
+    # Filters match case-insensitively, so the lowercased inputs identify
+    # the result set
+    cache_key = (search_keyword.lower(), city.lower(), job_type_id)
+    order = (rank,) if rank is not None else ()
+    jobs = search_cache.paginate(cache_key,
+                                 query.order_by(*order, JobPosting.posted_date.desc(), JobPosting.id.desc()),
+                                 page=page, per_page=10)
     
-    job_types = JobType.query.all()
+    job_types = choices(JobType)
     
     return render_template('jobseeker/job_search.html',
                           jobs=jobs,
+                          similar_counts=duplicate_counts([job.id for job in jobs.items]),
                           keyword=keyword,
+                          correction=correction,
+                          exact=exact,
                           city=city,
                           job_type_id=job_type_id,
                           job_types=job_types)
 
 
 @jobseeker_bp.route('/job/<int:id>')
+@anonymous_snapshot
 @login_required
 @jobseeker_required
+@replica_reads
 def view_job(id):
     """View a job posting."""
-    job = JobPosting.query.filter_by(id=id, is_active=True).first_or_404()
+    job = JobPosting.query.filter_by(id=id, is_active=True).first()
+    if job is None:
+        # Old links to archived postings say the job is gone rather than 404
+        archived = db.session.get(ArchivedJobPosting, id)
+        if archived is None:
+            abort(404)
+        return render_template('jobseeker/view_job.html', job=archived, archived=True), 410
     
     # Check if job is already saved
     is_saved = MyJob.query.filter_by(
@@ -102,22 +136,14 @@ def view_job(id):
         job_posting_id=id
     ).first() is not None
     
+    analytics.record(job.id, 'views')
     return render_template('jobseeker/view_job.html', job=job, is_saved=is_saved)
 
 
 @jobseeker_bp.route('/company/<int:id>')
-@login_required
-@jobseeker_required
 def view_company(id):
-    """View company profile."""
-    company = Company.query.get_or_404(id)
-    
-    # Get active job postings for this company
-    jobs = JobPosting.query.filter_by(company_id=id, is_active=True)\
-        .order_by(JobPosting.posted_date.desc())\
-        .all()
-    
-    return render_template('jobseeker/view_company.html', company=company, jobs=jobs)
+    """Company profiles are public now; keep old links working."""
+    return redirect(url_for('main.company', id=id), 301)
 
 
 @jobseeker_bp.route('/resume', methods=['GET', 'POST'])
@@ -142,7 +168,46 @@ def resume():
         flash('Resume updated successfully.', 'success')
         return redirect(url_for('jobseeker.dashboard'))
     
-    return render_template('jobseeker/resume.html', form=form, resume=resume)
+    return render_template('jobseeker/resume.html', form=form, resume=resume,
+                          document_form=ResumeDocumentForm())
+
+
+@jobseeker_bp.route('/resume/document', methods=['POST'])
+@login_required
+@jobseeker_required
+def upload_resume_document():
+    """Upload a resume document; its text is extracted in the background."""
+    resume = Resume.query.filter_by(user_id=current_user.id).first()
+    if resume is None:
+        flash('Save your resume details before uploading a document.', 'warning')
+        return redirect(url_for('jobseeker.resume'))
+    
+    form = ResumeDocumentForm()
+    if form.validate_on_submit():
+        try:
+            attach_document(resume, form.document.data)
+        except DocumentTooLarge as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('jobseeker.resume'))
+        db.session.commit()
+        if resume.document_status == 'ready':
+            flash('Resume document uploaded.', 'success')
+        else:
+            flash('Resume document uploaded. Its text will appear in your resume shortly.', 'success')
+    else:
+        for error in form.document.errors:
+            flash(error, 'danger')
+    return redirect(url_for('jobseeker.resume'))
+
+
+@jobseeker_bp.route('/resume/document')
+@login_required
+@jobseeker_required
+def resume_document():
+    """Download the uploaded resume document."""
+    resume = Resume.query.filter_by(user_id=current_user.id).first_or_404()
+    return send_document(resume)
+
 
 
 @jobseeker_bp.route('/favorites')
@@ -151,11 +216,21 @@ def resume():
 def favorites():
     """View favorite/saved jobs."""
     page = request.args.get('page', 1, type=int)
-    my_jobs = MyJob.query.filter_by(user_id=current_user.id)\
-        .order_by(MyJob.created_at.desc())\
-        .paginate(page=page, per_page=10)
+    expired = request.args.get('expired', type=int) == 1
+    my_jobs = saved_favorites.saved_jobs_page(current_user.id, page, expired=expired)
     
-    return render_template('jobseeker/favorites.html', my_jobs=my_jobs)
+    return render_template('jobseeker/favorites.html', my_jobs=my_jobs, expired=expired)
+
+
+@jobseeker_bp.route('/favorites/export.csv')
+@login_required
+@jobseeker_required
+def export_favorites():
+    """Download all saved jobs as CSV."""
+    lines = saved_favorites.export_csv('jobs', current_user.id,
+                                       lambda id: url_for('jobseeker.view_job', id=id, _external=True))
+    return Response(stream_with_context(lines), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=saved-jobs.csv'})
 
 
 @jobseeker_bp.route('/favorites/add/<int:job_id>', methods=['POST'])
@@ -163,15 +238,8 @@ def favorites():
 @jobseeker_required
 def add_favorite_job(job_id):
     """Add a job to favorites."""
-    existing = MyJob.query.filter_by(
-        user_id=current_user.id,
-        job_posting_id=job_id
-    ).first()
-    
-    if not existing:
-        my_job = MyJob(user_id=current_user.id, job_posting_id=job_id)
-        db.session.add(my_job)
-        db.session.commit()
+    if saved_favorites.save('jobs', current_user.id, [job_id]):
+        analytics.record(job_id, 'saves')
         flash('Job added to favorites.', 'success')
     else:
         flash('Job is already in your favorites.', 'info')
@@ -179,40 +247,45 @@ def add_favorite_job(job_id):
     return redirect(url_for('jobseeker.view_job', id=job_id))
 
 
+@jobseeker_bp.route('/favorites/add', methods=['POST'])
+@login_required
+@jobseeker_required
+def add_favorite_jobs():
+    """Add the selected jobs to favorites."""
+    added = saved_favorites.save('jobs', current_user.id, request.form.getlist('job_id', type=int))
+    for job_id in added:
+        analytics.record(job_id, 'saves')
+    flash(f'{len(added)} job{"s" if len(added) != 1 else ""} added to favorites.', 'success')
+    return redirect(url_for('jobseeker.favorites'))
+
+
 @jobseeker_bp.route('/favorites/remove/<int:id>', methods=['POST'])
 @login_required
 @jobseeker_required
 def remove_favorite_job(id):
     """Remove a job from favorites."""
-    my_job = MyJob.query.filter_by(
-        id=id,
-        user_id=current_user.id
-    ).first_or_404()
-    
-    db.session.delete(my_job)
-    db.session.commit()
+    if not saved_favorites.remove('jobs', current_user.id, [id]):
+        abort(404)
     
     flash('Job removed from favorites.', 'success')
     return redirect(url_for('jobseeker.favorites'))
 
 
+@jobseeker_bp.route('/favorites/remove', methods=['POST'])
+@login_required
+@jobseeker_required
+def remove_favorite_jobs():
+    """Remove the selected jobs from favorites."""
+    removed = saved_favorites.remove('jobs', current_user.id, request.form.getlist('id', type=int))
+    flash(f'{removed} job{"s" if removed != 1 else ""} removed from favorites.', 'success')
+    return redirect(url_for('jobseeker.favorites'))
+
+
 def _populate_resume_form_choices(form):
     """Populate dropdown choices for resume form."""
-    form.target_country_id.choices = [(0, 'Select Country')] + [
-        (c.id, c.country_name) for c in Country.query.order_by(Country.country_name).all()
-    ]
-    form.target_state_id.choices = [(0, 'Select State')] + [
-        (s.id, s.state_name) for s in State.query.order_by(State.state_name).all()
-    ]
-    form.relocation_country_id.choices = [(0, 'No Preference')] + [
-        (c.id, c.country_name) for c in Country.query.order_by(Country.country_name).all()
-    ]
-    form.education_level_id.choices = [(0, 'Select Education Level')] + [
-        (e.id, e.education_level_name) for e in EducationLevel.query.all()
-    ]
-    form.experience_level_id.choices = [(0, 'Select Experience Level')] + [
-        (e.id, e.experience_level_name) for e in ExperienceLevel.query.all()
-    ]
-    form.target_job_type_id.choices = [(0, 'Any Job Type')] + [
-        (j.id, j.job_type_name) for j in JobType.query.all()
-    ]
+    form.target_country_id.choices = [(0, 'Select Country')] + list(choices(Country))
+    form.target_state_id.choices = [(0, 'Select State')] + list(choices(State))
+    form.relocation_country_id.choices = [(0, 'No Preference')] + list(choices(Country))
+    form.education_level_id.choices = [(0, 'Select Education Level')] + list(choices(EducationLevel))
+    form.experience_level_id.choices = [(0, 'Select Experience Level')] + list(choices(ExperienceLevel))
+    form.target_job_type_id.choices = [(0, 'Any Job Type')] + list(choices(JobType))
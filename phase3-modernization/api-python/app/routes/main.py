@@ -1,13 +1,23 @@
 """
 Main routes (home, about, public pages).
 """
-from flask import Blueprint, render_template
+import os
+
+from flask import Blueprint, current_app, render_template, request, jsonify, abort
+from flask_login import login_required, current_user
+from ..extensions import autocomplete
+from ..services import company_pages
 from ..models import JobPosting
+from ..services.assets import send_precompressed
+from ..services.autocomplete import SOURCES as AUTOCOMPLETE_SOURCES
+from ..services.db_routing import replica_reads
+from ..services.sitemaps import INDEX_NAME as SITEMAP_INDEX, sitemap_dir
 
 main_bp = Blueprint('main', __name__)
 
 
 @main_bp.route('/')
+@replica_reads
 def index():
     """Home page with latest job postings."""
     latest_jobs = JobPosting.query.filter_by(is_active=True)\
@@ -17,6 +27,68 @@ def index():
     return render_template('main/index.html', jobs=latest_jobs)
 
 
+@main_bp.route('/companies/<int:id>')
+@replica_reads
+def company(id):
+    """Public company profile with its open positions, newest first."""
+    found = company_pages.header(id)
+    if found is None:
+        abort(404)
+    company_name, header = found
+    after = request.args.get('after')
+    cursor = company_pages.decode_cursor(after) if after else None
+    if after and cursor is None:
+        abort(404)
+    jobs, next_cursor = company_pages.postings(id, cursor)
+    return render_template('main/company.html',
+                          company_id=id,
+                          company_name=company_name,
+                          header=header,
+                          jobs=jobs,
+                          open_positions=company_pages.open_positions(id),
+                          after=after,
+                          next_cursor=next_cursor)
+
+
+@main_bp.route('/autocomplete/<source>')
+@login_required
+@replica_reads
+def complete(source):
+    """Search box completions as a JSON list of strings."""
+    if source not in AUTOCOMPLETE_SOURCES:
+        abort(404)
+    if source == 'resume_title' and not current_user.is_employer:
+        abort(403)
+    limit = min(request.args.get('limit', 8, type=int), 20)
+    response = jsonify(autocomplete.complete(source, request.args.get('q', ''), limit))
+    response.cache_control.private = True
+    response.cache_control.max_age = 60
+    return response
+
+
+@main_bp.route('/sitemap.xml')
+def sitemap():
+    """Sitemap index, as written by `flask sitemap build`."""
+    return _send_sitemap(SITEMAP_INDEX)
+
+
+@main_bp.route('/sitemaps/<filename>')
+def sitemap_file(filename):
+    """One sitemap file of the index."""
+    if filename == SITEMAP_INDEX or not filename.endswith('.xml'):
+        abort(404)
+    return _send_sitemap(filename)
+
+
+def _send_sitemap(filename):
+    directory = sitemap_dir(current_app)
+    if not os.path.isfile(os.path.join(directory, filename)):
+        abort(404)
+    response = send_precompressed(directory, filename, max_age=3600)
+    response.cache_control.public = True
+    return response
+
+
 @main_bp.route('/about')
 def about():
     """About page."""
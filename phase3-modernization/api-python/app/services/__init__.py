@@ -0,0 +1,6 @@
+"""
+Application services (database routing, caching, background work, search helpers).
+
+Modules are imported directly where they are used so that importing the
+package stays cheap and free of import cycles with ``app.extensions``.
+"""
@@ -0,0 +1,316 @@
+"""
+Admission control: token-bucket rate limits and concurrency caps.
+
+Views are assigned to an endpoint class (``login``, ``search``) with the
+``admission_control`` decorator. Before the request reaches the view - and so
+before any database query or bcrypt check - the client's per-IP and per-user
+token buckets are charged and the class's in-flight count is checked. The
+per-user bucket of a signed-in user is keyed on their id; anonymous login
+attempts are keyed on the IP address and the username posted, so nobody can
+lock another user out by posting their name. Tokens are only taken when every
+bucket has one. Clients over their rate get a ``429`` and clients arriving
+while the class is at its concurrency cap get a ``503``, both with
+``Retry-After``.
+
+Buckets and in-flight counts live in a small memory-mapped file shared by all
+worker processes, so limits hold across the whole server rather than per
+worker.
+"""
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+from flask import Response, current_app, g, request, session
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows development
+    fcntl = None
+
+BUCKET_SLOTS = 8192
+BUCKET_PROBES = 8
+WORKER_SLOTS = 128
+_BUCKET = struct.Struct('<Qdd')   # key hash, tokens, updated at
+_WORKER = struct.Struct('<iI')    # pid, in-flight requests
+_COUNTER = struct.Struct('<Q')    # rejections of a class for one reason
+REJECTION_REASONS = ('rate', 'concurrency')
+
+
+def admission_control(endpoint_class, methods=('GET', 'HEAD', 'POST')):
+    """Decorator assigning a view to an admission-control endpoint class."""
+    def decorator(f):
+        f.admission_class = endpoint_class
+        f.admission_methods = frozenset(methods)
+        return f
+    return decorator
+
+
+class SharedLimiterState:
+    """Token buckets, per-worker in-flight counts and rejection counts in a shared mmap file."""
+
+    def __init__(self, path, classes):
+        self.path = path
+        self.classes = sorted(classes)
+        self._bucket_bytes = BUCKET_SLOTS * _BUCKET.size
+        self._worker_bytes = len(self.classes) * WORKER_SLOTS * _WORKER.size
+        self._size = (self._bucket_bytes + self._worker_bytes
+                      + len(self.classes) * len(REJECTION_REASONS) * _COUNTER.size)
+        self._thread_lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._map = None
+
+    def _ensure_open(self):
+        # Each process needs its own file description for flock to exclude
+        # the other workers, so reopen after a fork.
+        if self._pid == os.getpid():
+            return
+        if self._map is not None:
+            # Inherited from the parent; the parent keeps its own
+            self._map.close()
+            os.close(self._fd)
+            self._map = self._fd = None
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < self._size:
+            os.ftruncate(fd, self._size)
+        self._fd = fd
+        self._map = mmap.mmap(fd, self._size)
+        self._pid = os.getpid()
+
+    def _locked(self):
+        return _FileLock(self)
+
+    def take_token(self, key, capacity, per_seconds, now=None):
+        """Take one token from ``key``'s bucket; return 0 or seconds until one is available."""
+        return self.take_tokens([(key, capacity, per_seconds)], now)
+
+    def take_tokens(self, buckets, now=None):
+        """Take one token from each ``(key, capacity, per_seconds)`` bucket, or from none.
+
+        Returns 0, or the seconds until every bucket has a token.
+        """
+        now = time.time() if now is None else now
+        retry_after = 0
+        with self._locked():
+            slots = []
+            for key, capacity, per_seconds in buckets:
+                rate = capacity / per_seconds
+                key_hash = _hash(key)
+                slot = self._find_bucket(key_hash)
+                stored_hash, tokens, updated = _BUCKET.unpack_from(self._map, slot)
+                if stored_hash != key_hash:
+                    tokens, updated = float(capacity), now
+                tokens = min(float(capacity), tokens + (now - updated) * rate)
+                _BUCKET.pack_into(self._map, slot, key_hash, tokens, now)
+                slots.append((slot, key_hash))
+                if tokens < 1:
+                    retry_after = max(retry_after, max(1, math.ceil((1 - tokens) / rate)))
+            if not retry_after:
+                for slot, key_hash in slots:
+                    stored_hash, tokens, updated = _BUCKET.unpack_from(self._map, slot)
+                    if stored_hash == key_hash:
+                        _BUCKET.pack_into(self._map, slot, key_hash, tokens - 1, updated)
+        return retry_after
+
+    def _find_bucket(self, key_hash):
+        """Return the offset of ``key_hash``'s slot, claiming the stalest probe if absent."""
+        start = key_hash % BUCKET_SLOTS
+        stalest, stalest_updated = None, None
+        for probe in range(BUCKET_PROBES):
+            offset = ((start + probe) % BUCKET_SLOTS) * _BUCKET.size
+            stored_hash, tokens, updated = _BUCKET.unpack_from(self._map, offset)
+            if stored_hash == key_hash or stored_hash == 0:
+                return offset
+            if stalest is None or updated < stalest_updated:
+                stalest, stalest_updated = offset, updated
+        return stalest
+
+    def acquire(self, endpoint_class, limit):
+        """Count one more in-flight request for the class unless it is at ``limit``.
+
+        A worker holds a slot only while it has requests in flight; slots of
+        workers that died are reclaimed whatever their count. Without a slot
+        the request couldn't be counted, so it is refused.
+        """
+        pid = os.getpid()
+        base = self._worker_base(endpoint_class)
+        with self._locked():
+            total, mine, free = 0, None, None
+            for i in range(WORKER_SLOTS):
+                offset = base + i * _WORKER.size
+                slot_pid, count = _WORKER.unpack_from(self._map, offset)
+                if slot_pid == pid:
+                    mine = offset
+                    total += count
+                elif slot_pid == 0:
+                    free = offset if free is None else free
+                elif count and _pid_alive(slot_pid):
+                    total += count
+                else:
+                    # Requests of a worker that died mid-flight never finish
+                    _WORKER.pack_into(self._map, offset, 0, 0)
+                    free = offset if free is None else free
+            offset = mine if mine is not None else free
+            if total >= limit or offset is None:
+                return False
+            count = _WORKER.unpack_from(self._map, offset)[1] if mine is not None else 0
+            _WORKER.pack_into(self._map, offset, pid, count + 1)
+            return True
+
+    def release(self, endpoint_class):
+        """Count one in-flight request of the class as finished."""
+        pid = os.getpid()
+        base = self._worker_base(endpoint_class)
+        with self._locked():
+            for i in range(WORKER_SLOTS):
+                offset = base + i * _WORKER.size
+                slot_pid, count = _WORKER.unpack_from(self._map, offset)
+                if slot_pid == pid:
+                    # Free the slot once the worker has nothing in flight
+                    count = max(0, count - 1)
+                    _WORKER.pack_into(self._map, offset, pid if count else 0, count)
+                    return
+
+    def in_flight(self, endpoint_class):
+        """Return the in-flight count of the class across all workers."""
+        base = self._worker_base(endpoint_class)
+        with self._locked():
+            return sum(
+                _WORKER.unpack_from(self._map, base + i * _WORKER.size)[1]
+                for i in range(WORKER_SLOTS)
+            )
+
+    def count_rejection(self, endpoint_class, reason):
+        """Count one request of the class rejected for ``reason``."""
+        offset = self._counter_offset(endpoint_class, reason)
+        with self._locked():
+            _COUNTER.pack_into(self._map, offset, _COUNTER.unpack_from(self._map, offset)[0] + 1)
+
+    def rejections(self, endpoint_class, reason):
+        """Return how many requests of the class all workers rejected for ``reason``."""
+        offset = self._counter_offset(endpoint_class, reason)
+        with self._locked():
+            return _COUNTER.unpack_from(self._map, offset)[0]
+
+    def _counter_offset(self, endpoint_class, reason):
+        index = self.classes.index(endpoint_class) * len(REJECTION_REASONS) + REJECTION_REASONS.index(reason)
+        return self._bucket_bytes + self._worker_bytes + index * _COUNTER.size
+
+    def _worker_base(self, endpoint_class):
+        index = self.classes.index(endpoint_class)
+        return self._bucket_bytes + index * WORKER_SLOTS * _WORKER.size
+
+
+class _FileLock:
+    """Excludes other threads (thread lock) and other workers (flock)."""
+
+    def __init__(self, state):
+        self.state = state
+
+    def __enter__(self):
+        self.state._thread_lock.acquire()
+        try:
+            self.state._ensure_open()
+            if fcntl is not None:
+                fcntl.flock(self.state._fd, fcntl.LOCK_EX)
+        except BaseException:
+            self.state._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.state._fd, fcntl.LOCK_UN)
+        finally:
+            self.state._thread_lock.release()
+
+
+class AdmissionController:
+    """Rejects over-limit requests before their view runs."""
+
+    def __init__(self):
+        self.state = None
+
+    def init_app(self, app):
+        if not app.config.get('ADMISSION_CONTROL_ENABLED'):
+            return
+        path = app.config.get('ADMISSION_STATE_FILE') or os.path.join(app.instance_path, 'admission.shm')
+        self.state = SharedLimiterState(path, app.config['ADMISSION_LIMITS'])
+        app.before_request(self._admit)
+        app.teardown_request(self._release)
+
+    def _admit(self):
+        view = current_app.view_functions.get(request.endpoint)
+        endpoint_class = getattr(view, 'admission_class', None)
+        if endpoint_class is None or request.method not in view.admission_methods:
+            return None
+        limits = current_app.config['ADMISSION_LIMITS'][endpoint_class]
+
+        buckets = [(key, *limits[scope]) for scope, key in self._client_keys(endpoint_class)]
+        retry_after = self.state.take_tokens(buckets)
+        if retry_after:
+            return self._reject(endpoint_class, 'rate', 429, retry_after,
+                                'Too many requests. Please slow down and try again shortly.')
+
+        if not self.state.acquire(endpoint_class, limits['concurrency']):
+            return self._reject(endpoint_class, 'concurrency', 503, 1,
+                                'The service is busy. Please try again in a moment.')
+        g.admission_class = endpoint_class
+        return None
+
+    def _client_keys(self, endpoint_class):
+        """Yield (limit scope, bucket key) pairs for the current client."""
+        yield 'per_ip', f'{endpoint_class}:ip:{request.remote_addr}'
+        # Flask-Login keeps the user id in the session cookie; no DB lookup needed
+        user_id = session.get('_user_id')
+        if user_id:
+            yield 'per_user', f'{endpoint_class}:user:{user_id}'
+        elif request.form.get('username'):
+            # Anyone can post a username, so it only counts together with the IP
+            yield 'per_user', f'{endpoint_class}:ip-user:{request.remote_addr}:{request.form["username"]}'
+
+    def _reject(self, endpoint_class, reason, status, retry_after, message):
+        self.state.count_rejection(endpoint_class, reason)
+        return Response(message, status, {'Retry-After': str(retry_after)}, mimetype='text/plain')
+
+    def _release(self, exc):
+        endpoint_class = g.pop('admission_class', None)
+        if endpoint_class is not None:
+            self.state.release(endpoint_class)
+
+    def snapshot(self):
+        """Return rejection counts and current in-flight counts per endpoint class."""
+        if self.state is None:
+            return {}
+        return {
+            endpoint_class: {
+                'in_flight': self.state.in_flight(endpoint_class),
+                'rejected_rate': self.state.rejections(endpoint_class, 'rate'),
+                'rejected_concurrency': self.state.rejections(endpoint_class, 'concurrency'),
+            }
+            for endpoint_class in self.state.classes
+        }
+
+
+def _hash(key):
+    """Stable non-zero 64-bit hash of a bucket key (0 marks an empty slot)."""
+    value = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little')
+    return value or 1
+
+
+def _pid_alive(pid):
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
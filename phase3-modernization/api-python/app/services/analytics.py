@@ -0,0 +1,121 @@
+"""
+Write-behind job posting analytics.
+
+Views and saves of job postings are counted per day in
+``job_posting_daily_stats``. Recording one only increments a counter in the
+worker's memory (see ``app.services.write_behind``); flushes add the counts
+to the day's row with one batched upsert:
+
+* PostgreSQL and SQLite: ``INSERT ... ON CONFLICT DO UPDATE``,
+* SQL Server: ``MERGE``,
+* other databases: ``UPDATE``, then ``INSERT`` for the rows that didn't exist.
+
+However many times a posting is viewed, a flush writes one row per posting
+and day.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, text
+
+from .write_behind import WriteBehind
+
+KINDS = ('views', 'saves')
+
+
+class PostingAnalytics(WriteBehind):
+    """Buffers posting views and saves and writes them behind the requests."""
+
+    name = 'analytics'
+
+    def __init__(self):
+        super().__init__()
+        self.batch_size = 500
+
+    def init_app(self, app):
+        config = app.config
+        super().init_app(app, config['ANALYTICS_FLUSH_SECONDS'], config['ANALYTICS_MAX_PENDING'])
+        self.batch_size = config['ANALYTICS_BATCH_SIZE']
+
+    def record(self, job_posting_id, kind='views'):
+        """Count one view or save of a posting today; nothing is written yet."""
+        index = KINDS.index(kind)
+        key = (job_posting_id, datetime.utcnow().date())
+        with self._lock:
+            counts = self._pending.get(key)
+            if counts is None:
+                counts = self._pending[key] = [0] * len(KINDS)
+                self._mark()
+            counts[index] += 1
+            backlog = len(self._pending)
+        self._changed(backlog)
+
+    def _rows(self, pending):
+        # The same order in every worker, so concurrent upserts can't deadlock
+        return [dict(job_posting_id=job_posting_id, day=day, **dict(zip(KINDS, pending[job_posting_id, day])))
+                for job_posting_id, day in sorted(pending)]
+
+    def _restore(self, rows):
+        for row in rows:
+            counts = self._pending.setdefault((row['job_posting_id'], row['day']), [0] * len(KINDS))
+            for index, kind in enumerate(KINDS):
+                counts[index] += row[kind]
+
+    def _write(self, connection, rows):
+        for start in range(0, len(rows), self.batch_size):
+            upsert(connection, rows[start:start + self.batch_size])
+
+
+def upsert(connection, rows):
+    """Add the ``views`` and ``saves`` of ``rows`` to their day's stats rows."""
+    from ..models import JobPostingDailyStats
+
+    table = JobPostingDailyStats.__table__
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.job_posting_id, table.c.day],
+            set_={kind: table.c[kind] + statement.excluded[kind] for kind in KINDS},
+        )
+        connection.execute(statement, rows)
+    elif dialect == 'mssql':
+        connection.execute(text(
+            f'MERGE {table.name} WITH (HOLDLOCK) AS target '
+            'USING (VALUES (:job_posting_id, :day, :views, :saves)) '
+            'AS source (job_posting_id, day, views, saves) '
+            'ON target.job_posting_id = source.job_posting_id AND target.day = source.day '
+            'WHEN MATCHED THEN UPDATE SET views = target.views + source.views, saves = target.saves + source.saves '
+            'WHEN NOT MATCHED THEN INSERT (job_posting_id, day, views, saves) '
+            'VALUES (source.job_posting_id, source.day, source.views, source.saves);'
+        ), rows)
+    else:
+        for row in rows:
+            updated = connection.execute(
+                table.update()
+                .where(table.c.job_posting_id == row['job_posting_id'], table.c.day == row['day'])
+                .values({kind: table.c[kind] + row[kind] for kind in KINDS})
+            )
+            if not updated.rowcount:
+                connection.execute(table.insert(), row)
+
+
+def posting_totals(job_posting_ids, days=None):
+    """Return ``{job_posting_id: (views, saves)}``, over the last ``days`` days if given.
+
+    Only counts already written are included.
+    """
+    from ..extensions import db
+    from ..models import JobPostingDailyStats as Stats
+
+    if not job_posting_ids:
+        return {}
+    query = db.session.query(Stats.job_posting_id, func.sum(Stats.views), func.sum(Stats.saves))\
+        .filter(Stats.job_posting_id.in_(list(job_posting_ids)))\
+        .group_by(Stats.job_posting_id)
+    if days is not None:
+        query = query.filter(Stats.day > datetime.utcnow().date() - timedelta(days=days))
+    return {job_posting_id: (int(views or 0), int(saves or 0)) for job_posting_id, views, saves in query}
@@ -0,0 +1,107 @@
+"""
+Hot/archive partitioning of job postings.
+
+``job_postings`` should only hold postings people can still apply to. The
+sweeper (``flask archive sweep``, run from cron) moves postings matching the
+expiry rules - deactivated more than ``ARCHIVE_INACTIVE_DAYS`` ago, or posted
+more than ``ARCHIVE_MAX_AGE_DAYS`` ago - into ``archived_job_postings``
+together with the saved-job rows that reference them. Each batch is copied
+with ``INSERT ... SELECT`` and deleted in one transaction, so a posting is
+always in exactly one of the two tables.
+
+Read paths look at the archive only when asked to: a job page whose id is no
+longer live, or the "expired" views of saved jobs and an employer's postings.
+"""
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from ..extensions import db
+from ..models import ArchivedJobPosting, ArchivedMyJob, JobPosting, JobPostingBucket, MyJob
+from . import job_pages
+
+
+def expiry_condition(now=None, config=None):
+    """Return the SQL condition selecting live postings that should be archived."""
+    config = config or current_app.config
+    now = now or datetime.utcnow()
+    conditions = []
+    if config['ARCHIVE_INACTIVE_DAYS'] > 0:
+        conditions.append(db.and_(
+            JobPosting.is_active.is_(False),
+            JobPosting.updated_at < now - timedelta(days=config['ARCHIVE_INACTIVE_DAYS']),
+        ))
+    if config['ARCHIVE_MAX_AGE_DAYS'] > 0:
+        conditions.append(JobPosting.posted_date < now - timedelta(days=config['ARCHIVE_MAX_AGE_DAYS']))
+    return db.or_(*conditions) if conditions else db.false()
+
+
+def _copy_columns(source, target):
+    """Names of the columns ``target`` copies from ``source``."""
+    return [column.name for column in target.__table__.c if column.name in source.__table__.c]
+
+
+def archive_postings(ids, now=None):
+    """Move the postings with ``ids`` and their saved-job rows to the archive.
+
+    Runs in the current transaction; the caller commits.
+    """
+    now = now or datetime.utcnow()
+    postings = JobPosting.__table__
+    saved = MyJob.__table__
+
+    columns = _copy_columns(JobPosting, ArchivedJobPosting)
+    reason = db.case((postings.c.is_active.is_(False), 'inactive'), else_='expired')
+    db.session.execute(
+        ArchivedJobPosting.__table__.insert().from_select(
+            columns + ['archived_at', 'archive_reason'],
+            db.select(*(postings.c[name] for name in columns), db.literal(now), reason)
+            .where(postings.c.id.in_(ids)),
+        )
+    )
+    saved_columns = _copy_columns(MyJob, ArchivedMyJob)
+    db.session.execute(
+        ArchivedMyJob.__table__.insert().from_select(
+            saved_columns,
+            db.select(*(saved.c[name] for name in saved_columns)).where(saved.c.job_posting_id.in_(ids)),
+        )
+    )
+
+    # Everything that references the postings in the live tables
+    db.session.execute(saved.delete().where(saved.c.job_posting_id.in_(ids)))
+    buckets = JobPostingBucket.__table__
+    db.session.execute(buckets.delete().where(buckets.c.job_posting_id.in_(ids)))
+    db.session.execute(
+        postings.update().where(postings.c.duplicate_of_id.in_(ids))
+        .values(duplicate_of_id=None, updated_at=postings.c.updated_at)
+    )
+    db.session.execute(postings.delete().where(postings.c.id.in_(ids)))
+
+
+def sweep(batch_size=None, now=None, limit=None):
+    """Archive expired postings in batches; return how many were moved."""
+    batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+    now = now or datetime.utcnow()
+    condition = expiry_condition(now)
+    moved = 0
+    while limit is None or moved < limit:
+        size = batch_size if limit is None else min(batch_size, limit - moved)
+        ids = db.session.execute(
+            db.select(JobPosting.id).where(condition).order_by(JobPosting.id).limit(size)
+        ).scalars().all()
+        if not ids:
+            break
+        try:
+            archive_postings(ids, now)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        job_pages.remove(*ids)
+        moved += len(ids)
+    return moved
+
+
+def count_expired(now=None):
+    """Return how many live postings the next sweep would archive."""
+    return JobPosting.query.filter(expiry_condition(now)).count()
@@ -0,0 +1,165 @@
+"""
+Static asset pipeline: fingerprinting, precompression and serving.
+
+``flask assets build`` copies every file under ``static/`` into
+``static/build/`` twice: under its original name (so relative references
+inside CSS keep working) and under a content-hashed name, and writes gzip and
+brotli variants of compressible files next to them. A ``manifest.json`` maps
+each source name to its fingerprinted name.
+
+When ``USE_ASSET_MANIFEST`` is enabled, ``url_for('static', filename=...)``
+is rewritten to the fingerprinted name, and fingerprinted files are served
+with the best ``Content-Encoding`` the client accepts and immutable caching.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import urllib.request
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+BUILD_DIR = 'build'
+MANIFEST_NAME = 'manifest.json'
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.xml', '.html', '.map')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Third-party bundles that can be self-hosted instead of loaded from jsdelivr
+VENDOR_ASSETS = {
+    'vendor/bootstrap/bootstrap.min.css':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css',
+    'vendor/bootstrap/bootstrap.bundle.min.js':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js',
+    'vendor/bootstrap-icons/bootstrap-icons.css':
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.1/font/bootstrap-icons.css',
+    'vendor/bootstrap-icons/fonts/bootstrap-icons.woff2':
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.1/font/fonts/bootstrap-icons.woff2',
+    'vendor/bootstrap-icons/fonts/bootstrap-icons.woff':
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.1/font/fonts/bootstrap-icons.woff',
+}
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def fingerprint_name(filename, content):
+    """Return ``filename`` with a short content hash before its extension."""
+    root, ext = os.path.splitext(filename)
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    return f'{root}.{digest}{ext}'
+
+
+def build_assets(static_folder):
+    """Fingerprint and precompress every static file; return the manifest."""
+    build_root = os.path.join(static_folder, BUILD_DIR)
+    if os.path.isdir(build_root):
+        shutil.rmtree(build_root)
+
+    manifest = {}
+    for dirpath, dirnames, filenames in os.walk(static_folder):
+        if os.path.abspath(dirpath) == os.path.abspath(static_folder) and BUILD_DIR in dirnames:
+            dirnames.remove(BUILD_DIR)
+        for name in filenames:
+            if name.startswith('.'):
+                continue
+            source = os.path.join(dirpath, name)
+            filename = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                content = f.read()
+            hashed = fingerprint_name(filename, content)
+            for target in (filename, hashed):
+                _write_with_variants(os.path.join(build_root, target), content)
+            manifest[filename] = f'{BUILD_DIR}/{hashed}'
+
+    with open(os.path.join(build_root, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def _write_with_variants(path, content):
+    """Write ``content`` to ``path`` plus .gz/.br variants if it compresses."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    if not path.endswith(COMPRESSIBLE_EXTENSIONS):
+        return
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content, quality=11)
+    for suffix, data in variants.items():
+        if len(data) < len(content):
+            with open(path + suffix, 'wb') as f:
+                f.write(data)
+
+
+def send_precompressed(directory, filename, max_age=None):
+    """Send ``filename`` from ``directory``, or its precompressed variant if the client accepts it."""
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    path = os.path.join(directory, filename)
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.isfile(path + suffix):
+            response = send_from_directory(directory, filename + suffix, mimetype=mimetype, max_age=max_age)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(directory, filename, mimetype=mimetype, max_age=max_age)
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def download_vendor_assets(static_folder):
+    """Download the vendored Bootstrap bundles into ``static/vendor``."""
+    for filename, url in VENDOR_ASSETS.items():
+        target = os.path.join(static_folder, filename)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with urllib.request.urlopen(url, timeout=30) as response, open(target, 'wb') as f:
+            shutil.copyfileobj(response, f)
+    return list(VENDOR_ASSETS)
+
+
+class AssetPipeline:
+    """Rewrites static URLs to fingerprinted names and serves precompressed files."""
+
+    def __init__(self):
+        self.manifest = {}
+        self._fingerprinted = frozenset()
+
+    def init_app(self, app):
+        if not app.config.get('USE_ASSET_MANIFEST'):
+            return
+        path = os.path.join(app.static_folder, BUILD_DIR, MANIFEST_NAME)
+        try:
+            with open(path) as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            app.logger.warning(f'Asset manifest {path} not found; run `flask assets build`.')
+            return
+        self._fingerprinted = frozenset(self.manifest.values())
+
+        app.url_defaults(self._rewrite_static_url)
+        default_view = app.view_functions['static']
+
+        def static(filename):
+            if filename in self._fingerprinted:
+                return self._send_fingerprinted(app, filename)
+            return default_view(filename=filename)
+
+        app.view_functions['static'] = static
+
+    def _rewrite_static_url(self, endpoint, values):
+        if endpoint == 'static':
+            hashed = self.manifest.get(values.get('filename'))
+            if hashed is not None:
+                values['filename'] = hashed
+
+    def _send_fingerprinted(self, app, filename):
+        response = send_precompressed(app.static_folder, filename, max_age=IMMUTABLE_MAX_AGE)
+        response.cache_control.immutable = True
+        return response
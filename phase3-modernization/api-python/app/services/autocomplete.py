@@ -0,0 +1,313 @@
+"""
+Typeahead completion for the search boxes.
+
+Each source (active job titles, their cities, company names and searchable
+resume titles) is held in memory as a ``PrefixIndex``: sorted arrays of
+normalized keys searched with ``bisect``, weighted by how many rows carry the
+value. A completion is a binary search plus a few range-maximum lookups, so it
+costs microseconds and never touches the database.
+
+Indexes are built per worker from ``GROUP BY`` queries on first use. Committed
+changes to the source columns are applied as weight deltas on top of the
+index straight away, and the index is rebuilt in a background thread once it
+is older than ``AUTOCOMPLETE_REBUILD_SECONDS`` (or has collected many deltas),
+while the old one keeps serving.
+"""
+import bisect
+import heapq
+from array import array
+import re
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import event, inspect
+
+from .db_routing import RoutingSession
+
+# source name -> (model name, column, attribute limiting which rows count)
+SOURCES = {
+    'job_title': ('JobPosting', 'title', 'is_active'),
+    'city': ('JobPosting', 'city', 'is_active'),
+    'company': ('Company', 'company_name', None),
+    'resume_title': ('Resume', 'job_title', 'is_searchable'),
+}
+MAX_PENDING_DELTAS = 500
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize(value):
+    return _SPACE_RE.sub(' ', (value or '').casefold()).strip()
+
+
+def _word_starts(norm):
+    """Offsets at which a completion may match: the start and every later word."""
+    starts = [0]
+    starts.extend(m.end() for m in _SPACE_RE.finditer(norm))
+    return starts[:6]
+
+
+class PrefixIndex:
+    """Immutable prefix index over ``{normalized value: (label, weight)}``.
+
+    Every word start of every value is a key in a sorted array, so the keys
+    matching a prefix form one contiguous range found by binary search. A
+    sparse table of range maxima by weight then yields the heaviest entries of
+    that range one at a time, so a lookup costs ``O(limit * log n)`` however
+    many values share the prefix.
+    """
+
+    def __init__(self, entries):
+        self.labels = {norm: label for norm, (label, weight) in entries.items()}
+        self.weights = {norm: weight for norm, (label, weight) in entries.items()}
+        pairs = sorted((norm[start:], norm) for norm in entries for start in _word_starts(norm))
+        self.keys = [key for key, norm in pairs]
+        self.values = [norm for key, norm in pairs]
+
+        # _maxima[j][i] is the position of the heaviest entry in [i, i + 2**j)
+        weights = [self.weights[norm] for norm in self.values]
+        self._entry_weights = weights
+        level = array('I', range(len(pairs)))
+        self._maxima = [level]
+        width = 1
+        while width * 2 <= len(pairs):
+            previous = level
+            level = array('I', (
+                a if weights[a] >= weights[b] else b
+                for a, b in zip(previous, previous[width:])
+            ))
+            self._maxima.append(level)
+            width *= 2
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _heaviest(self, lo, hi):
+        level = (hi - lo).bit_length() - 1
+        a = self._maxima[level][lo]
+        b = self._maxima[level][hi - (1 << level)]
+        return a if self._entry_weights[a] >= self._entry_weights[b] else b
+
+    def search(self, prefix, limit):
+        """Return the normalized values of the ``limit`` heaviest completions."""
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + '\U0010ffff', lo)
+        results, seen = [], set()
+        heap = []
+        if lo < hi:
+            best = self._heaviest(lo, hi)
+            heap.append((-self._entry_weights[best], best, lo, hi))
+        while heap and len(results) < limit:
+            weight, position, lo, hi = heapq.heappop(heap)
+            norm = self.values[position]
+            if norm not in seen:
+                seen.add(norm)
+                results.append(norm)
+            for a, b in ((lo, position), (position + 1, hi)):
+                if a < b:
+                    best = self._heaviest(a, b)
+                    heapq.heappush(heap, (-self._entry_weights[best], best, a, b))
+        return results
+
+
+def _noop(target, value, oldvalue, initiator):
+    return value
+
+
+class _SourceState:
+    def __init__(self):
+        self.index = None
+        self.built_at = 0.0
+        self.building = False
+        # normalized value -> [label, weight delta, monotonic time of last change]
+        self.pending = {}
+
+
+class Autocomplete:
+    """Per-worker completion indexes, kept current from committed changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sources = {name: _SourceState() for name in SOURCES}
+        self.completions = 0
+        self.completion_seconds = 0.0
+        self._listening = False
+
+    def init_app(self, app):
+        if self._listening:
+            return
+        from .. import models
+
+        # Load the old value when a source column is assigned, so the change
+        # can be subtracted even if the object was expired by a commit
+        for model_name, column_name, flag_name in SOURCES.values():
+            model = getattr(models, model_name)
+            for name in filter(None, (column_name, flag_name)):
+                event.listen(getattr(model, name), 'set', _noop, active_history=True)
+        event.listen(RoutingSession, 'after_flush', self._collect_changes)
+        event.listen(RoutingSession, 'after_commit', self._apply_changes)
+        event.listen(RoutingSession, 'after_rollback', self._discard_changes)
+        self._listening = True
+
+    # Lookup
+
+    def complete(self, source, prefix, limit=8):
+        """Return up to ``limit`` completions (display labels) for ``prefix``."""
+        start = time.perf_counter()
+        state = self._sources[source]
+        prefix = normalize(prefix)
+        index = self._current_index(source, state)
+        if not prefix:
+            return []
+
+        with self._lock:
+            pending = dict(state.pending)
+        if not pending:
+            results = [index.labels[norm] for norm in index.search(prefix, limit)]
+        else:
+            # Look a little further than needed so pending deltas can reorder the tail
+            candidates = set(index.search(prefix, limit + len(pending)))
+            candidates.update(norm for norm in pending
+                              if any(norm[s:].startswith(prefix) for s in _word_starts(norm)))
+            weighted = []
+            for norm in candidates:
+                label, delta, _ = pending.get(norm, (None, 0, 0))
+                weight = index.weights.get(norm, 0) + delta
+                if weight > 0:
+                    weighted.append((weight, norm, index.labels.get(norm) or label))
+            results = [label for weight, norm, label in heapq.nlargest(limit, weighted)]
+
+        with self._lock:
+            self.completions += 1
+            self.completion_seconds += time.perf_counter() - start
+        return results
+
+    def _current_index(self, source, state):
+        config = current_app.config
+        if state.index is None:
+            self.rebuild(source)
+        elif not state.building and (
+            time.monotonic() - state.built_at > config['AUTOCOMPLETE_REBUILD_SECONDS']
+            or len(state.pending) > MAX_PENDING_DELTAS
+        ):
+            state.building = True
+            app = current_app._get_current_object()
+            threading.Thread(target=self._rebuild_in_background, args=(app, source),
+                             name=f'autocomplete-{source}', daemon=True).start()
+        return state.index
+
+    # Building
+
+    def rebuild(self, source):
+        """Rebuild one source's index from the database."""
+        from .. import models
+        from ..extensions import db
+
+        model_name, column_name, flag_name = SOURCES[source]
+        model = getattr(models, model_name)
+        column = getattr(model, column_name)
+        started = time.monotonic()
+        query = db.session.query(column, db.func.count()).filter(column.isnot(None))
+        if flag_name:
+            query = query.filter(getattr(model, flag_name).is_(True))
+        totals, spellings = {}, {}
+        for value, count in query.group_by(column):
+            norm = normalize(value)
+            if not norm:
+                continue
+            totals[norm] = totals.get(norm, 0) + count
+            # Show the most common spelling of a value
+            if count > spellings.get(norm, (None, 0))[1]:
+                spellings[norm] = (value.strip(), count)
+        index = PrefixIndex({norm: (spellings[norm][0], total) for norm, total in totals.items()})
+
+        state = self._sources[source]
+        with self._lock:
+            state.index = index
+            state.built_at = started
+            state.building = False
+            # Changes committed before the query started are in the new index
+            state.pending = {norm: change for norm, change in state.pending.items() if change[2] >= started}
+        return index
+
+    def _rebuild_in_background(self, app, source):
+        from ..extensions import db
+
+        with app.app_context():
+            try:
+                self.rebuild(source)
+            except Exception:
+                app.logger.exception(f'Rebuilding the {source} autocomplete index failed')
+                self._sources[source].building = False
+            finally:
+                db.session.remove()
+
+    # Change tracking
+
+    def _collect_changes(self, session, flush_context):
+        deltas = session.info.setdefault('autocomplete_deltas', [])
+        for obj in session.new:
+            self._object_deltas(obj, 'new', deltas)
+        for obj in session.dirty:
+            self._object_deltas(obj, 'dirty', deltas)
+        for obj in session.deleted:
+            self._object_deltas(obj, 'deleted', deltas)
+
+    def _object_deltas(self, obj, op, deltas):
+        model_name = type(obj).__name__
+        for source, (source_model, column_name, flag_name) in SOURCES.items():
+            if source_model != model_name:
+                continue
+            state = inspect(obj)
+            value_history = state.attrs[column_name].history
+            flag_history = state.attrs[flag_name].history if flag_name else None
+            current_value = getattr(obj, column_name)
+            current_flag = getattr(obj, flag_name) if flag_name else True
+            if op == 'new':
+                old = None
+            else:
+                old_value = value_history.deleted[0] if value_history.deleted else current_value
+                old_flag = True
+                if flag_name:
+                    old_flag = flag_history.deleted[0] if flag_history.deleted else current_flag
+                old = (old_value, old_flag)
+                if op == 'dirty' and old == (current_value, current_flag):
+                    continue
+            if old is not None and old[1] and old[0]:
+                deltas.append((source, old[0], -1))
+            # A row flagged active by its column default has no flag value yet
+            if op != 'deleted' and current_value and current_flag in (True, None):
+                deltas.append((source, current_value, 1))
+
+    def _apply_changes(self, session):
+        deltas = session.info.pop('autocomplete_deltas', None)
+        if not deltas:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for source, value, delta in deltas:
+                state = self._sources[source]
+                if state.index is None:
+                    continue  # built from the database on first use
+                norm = normalize(value)
+                if not norm:
+                    continue
+                label, total, _ = state.pending.get(norm, (value, 0, 0))
+                state.pending[norm] = [label, total + delta, now]
+
+    def _discard_changes(self, session):
+        session.info.pop('autocomplete_deltas', None)
+
+    def snapshot(self):
+        """Return index sizes, pending deltas and mean completion time."""
+        with self._lock:
+            sources = {
+                name: {
+                    'values': len(state.index) if state.index is not None else None,
+                    'pending': len(state.pending),
+                    'age_seconds': time.monotonic() - state.built_at if state.index is not None else None,
+                }
+                for name, state in self._sources.items()
+            }
+            mean = self.completion_seconds / self.completions if self.completions else 0.0
+            return {'sources': sources, 'completions': self.completions, 'mean_seconds': mean}
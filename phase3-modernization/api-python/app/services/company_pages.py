@@ -0,0 +1,100 @@
+"""
+Public company pages.
+
+A company page is a header (name, address, contact details, profile) and the
+company's open positions. Both are built for companies with thousands of
+open postings:
+
+* The rendered header is kept in the shared cache under the company's
+  ``updated_at``, so editing the profile produces a new key and a visit costs
+  one primary-key lookup of that timestamp. The state and country generations
+  are part of the entry, as their names appear in the address.
+* Postings are listed newest first, ``PER_PAGE`` at a time, with keyset
+  cursors: the next page starts after the ``(posted_date, id)`` of the last
+  card, so deep pages cost the same index range scan as the first instead of
+  an ``OFFSET`` over everything before them. Only the columns the cards show
+  are selected.
+"""
+from datetime import datetime
+
+from flask import current_app, render_template
+from markupsafe import Markup
+from sqlalchemy import and_, func, or_, select
+
+from ..extensions import db, shared_cache
+from .tracing import span
+
+PER_PAGE = 20
+HEADER_TEMPLATE = 'main/_company_header.html'
+
+
+def header(company_id):
+    """Return ``(company name, rendered header)``, or ``None`` if there is no such company."""
+    from ..models import Company
+
+    row = db.session.execute(
+        select(Company.company_name, Company.updated_at).where(Company.id == company_id)
+    ).first()
+    if row is None:
+        return None
+    stamp = row.updated_at.isoformat() if row.updated_at else ''
+    key = ('company_header', company_id, stamp)
+    generation = shared_cache.generation(('states', 'countries'))
+    with span('cache.lookup', cache='company_header', company=company_id) as current:
+        html = shared_cache.get(key, generation)
+        current.set('cache.hit', 'shared' if html is not None else 'miss')
+    if html is None:
+        company = db.session.get(Company, company_id)
+        html = render_template(HEADER_TEMPLATE, company=company)
+        shared_cache.set(key, html, generation, current_app.config['SHARED_CACHE_TTL'])
+    return row.company_name, Markup(html)
+
+
+def encode_cursor(row):
+    """The cursor of the page after ``row``."""
+    return f'{row.posted_date.isoformat()}_{row.id}'
+
+
+def decode_cursor(cursor):
+    """Return ``(posted_date, id)``, or ``None`` for a malformed cursor."""
+    try:
+        posted_date, row_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(posted_date), int(row_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def postings(company_id, after=None, per_page=None):
+    """Return ``(rows, next cursor or None)`` for a page of open postings."""
+    from ..models import Country, JobPosting, JobType, State
+
+    per_page = per_page or PER_PAGE
+
+    statement = select(
+        JobPosting.id, JobPosting.title, JobPosting.city, JobPosting.posted_date,
+        State.state_name, Country.country_name, JobType.job_type_name,
+    ).outerjoin(State, State.id == JobPosting.state_id)\
+        .outerjoin(Country, Country.id == JobPosting.country_id)\
+        .outerjoin(JobType, JobType.id == JobPosting.job_type_id)\
+        .where(JobPosting.company_id == company_id, JobPosting.is_active.is_(True),
+               JobPosting.posted_date.isnot(None))\
+        .order_by(JobPosting.posted_date.desc(), JobPosting.id.desc())\
+        .limit(per_page + 1)
+    if after is not None:
+        posted_date, row_id = after
+        statement = statement.where(or_(JobPosting.posted_date < posted_date,
+                                        and_(JobPosting.posted_date == posted_date, JobPosting.id < row_id)))
+    rows = db.session.execute(statement).all()
+    if len(rows) > per_page:
+        return rows[:per_page], encode_cursor(rows[per_page - 1])
+    return rows, None
+
+
+def open_positions(company_id):
+    """Number of open postings of a company."""
+    from ..models import JobPosting
+
+    return db.session.execute(
+        select(func.count()).where(JobPosting.company_id == company_id, JobPosting.is_active.is_(True),
+                                   JobPosting.posted_date.isnot(None))
+    ).scalar()
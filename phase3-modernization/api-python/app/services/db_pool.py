@@ -0,0 +1,184 @@
+"""
+Database connection pool configuration and metrics.
+
+Engine options are built from the ``DB_POOL_*`` settings of the active config
+class, and every engine's pool is instrumented so the admin pages can show
+how many connections are checked out, how much overflow is in use and how
+long checkouts wait.
+"""
+import logging
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+# Upper bounds (seconds) of the checkout latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float('inf'))
+
+PRE_PING_STRATEGIES = ('always', 'idle', 'never')
+
+# SQLAlchemy names a pool's logger after its class's module, which puts
+# MeteredQueuePool's per-checkout debug output under the Flask app logger.
+logging.getLogger(__name__).setLevel(logging.WARNING)
+
+
+def build_engine_options(config):
+    """Build ``SQLALCHEMY_ENGINE_OPTIONS`` from the ``DB_POOL_*`` settings."""
+    strategy = config.get('DB_POOL_PRE_PING', 'always')
+    if strategy not in PRE_PING_STRATEGIES:
+        raise ValueError(f'DB_POOL_PRE_PING must be one of {", ".join(PRE_PING_STRATEGIES)}')
+
+    options = {
+        'pool_pre_ping': strategy == 'always',
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 300),
+    }
+    # In-memory SQLite uses a singleton pool that has no size or overflow
+    if not _is_memory_sqlite(config.get('SQLALCHEMY_DATABASE_URI') or ''):
+        options.update({
+            'poolclass': MeteredQueuePool,
+            'pool_size': config.get('DB_POOL_SIZE', 5),
+            'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+            'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        })
+    # Explicit engine options in the config class win over the pool settings
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+class PoolStats:
+    """Counters and checkout latency histogram for one pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.pings = 0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+        self.latency_counts = [0] * len(LATENCY_BUCKETS)
+
+    def observe_checkout(self, seconds, timed_out=False):
+        """Record one checkout attempt that took ``seconds``."""
+        index = next(i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound)
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            self.latency_counts[index] += 1
+
+    def incr(self, name):
+        """Increment a plain counter."""
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waits for a connection."""
+
+    stats = None
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            if self.stats is not None:
+                self.stats.observe_checkout(time.perf_counter() - start, timed_out=True)
+            raise
+        if self.stats is not None:
+            self.stats.observe_checkout(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class PoolMonitor:
+    """Instruments the pools of every configured engine."""
+
+    def init_app(self, app):
+        from ..extensions import db
+
+        with app.app_context():
+            for engine in db.engines.values():
+                self._instrument(engine, app.config)
+
+    def _instrument(self, engine, config):
+        pool = engine.pool
+        if getattr(pool, 'stats', None) is None:
+            pool.stats = PoolStats()
+        stats = pool.stats
+        ping_idle_seconds = config.get('DB_POOL_PING_IDLE_SECONDS', 30)
+        ping_when_idle = config.get('DB_POOL_PRE_PING', 'always') == 'idle'
+
+        @event.listens_for(engine, 'connect')
+        def on_connect(dbapi_connection, connection_record):
+            stats.incr('connects')
+
+        @event.listens_for(engine, 'invalidate')
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            stats.incr('invalidations')
+
+        @event.listens_for(engine, 'checkin')
+        def on_checkin(dbapi_connection, connection_record):
+            connection_record.info['checked_in_at'] = time.monotonic()
+
+        if ping_when_idle:
+            @event.listens_for(engine, 'checkout')
+            def ping_idle_connection(dbapi_connection, connection_record, connection_proxy):
+                # Only connections that sat idle long enough to be dropped are pinged
+                checked_in_at = connection_record.info.get('checked_in_at')
+                if checked_in_at is None or time.monotonic() - checked_in_at < ping_idle_seconds:
+                    return
+                stats.incr('pings')
+                cursor = dbapi_connection.cursor()
+                try:
+                    cursor.execute('SELECT 1')
+                except Exception as e:
+                    raise exc.DisconnectionError() from e
+                finally:
+                    cursor.close()
+
+    def snapshot(self):
+        """Return current pool gauges and counters for every engine."""
+        from ..extensions import db
+
+        result = {}
+        for bind_key, engine in db.engines.items():
+            pool = engine.pool
+            stats = getattr(pool, 'stats', None) or PoolStats()
+            result[bind_key or 'primary'] = {
+                'pool_class': type(pool).__name__,
+                'size': _call(pool, 'size'),
+                'checked_out': _call(pool, 'checkedout'),
+                'checked_in': _call(pool, 'checkedin'),
+                'overflow': _call(pool, 'overflow'),
+                'checkouts': stats.checkouts,
+                'timeouts': stats.timeouts,
+                'connects': stats.connects,
+                'invalidations': stats.invalidations,
+                'pings': stats.pings,
+                'wait_seconds_total': stats.wait_seconds_total,
+                'max_wait_seconds': stats.max_wait_seconds,
+                'checkout_latency': list(zip(LATENCY_BUCKETS, stats.latency_counts)),
+            }
+        return result
+
+
+def _is_memory_sqlite(uri):
+    """Check whether the URI points at an in-memory SQLite database."""
+    return uri.startswith('sqlite') and (':memory:' in uri or uri.rstrip('/') == 'sqlite:')
+
+
+def _call(pool, method):
+    """Call a QueuePool gauge method if the pool class provides it."""
+    func = getattr(pool, method, None)
+    return func() if func is not None else None
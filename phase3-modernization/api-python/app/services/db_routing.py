@@ -0,0 +1,81 @@
+"""
+Read-replica routing for the SQLAlchemy session.
+
+Views decorated with ``replica_reads`` send their SELECT statements to the
+``replica`` bind (``SQLALCHEMY_BINDS['replica']``) when one is configured.
+Writes, flushes and any read issued after the session has written in the
+current transaction always go to the primary. After a commit that wrote
+something, the user's session is pinned to the primary for
+``DB_REPLICA_STICKY_SECONDS`` so they read their own writes.
+"""
+import time
+from functools import wraps
+
+import sqlalchemy as sa
+from flask import current_app, g, has_request_context, request
+from flask import session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA_BIND_KEY = 'replica'
+STICKY_SESSION_KEY = '_db_primary_until'
+
+
+def replica_reads(f):
+    """Decorator allowing a GET view's reads to be served by the read replica."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.db_replica_reads = True
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def is_pinned_to_primary():
+    """Return True if the current user recently wrote and must read the primary."""
+    return flask_session.get(STICKY_SESSION_KEY, 0) > time.time()
+
+
+def pin_to_primary():
+    """Pin the current user to the primary for the configured stickiness window."""
+    window = current_app.config.get('DB_REPLICA_STICKY_SECONDS', 5)
+    if window > 0:
+        flask_session[STICKY_SESSION_KEY] = time.time() + window
+
+
+class RoutingSession(Session):
+    """Session that sends eligible SELECTs to the read replica bind."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is None and self._use_replica(clause):
+            engines = self._db.engines
+            replica = engines.get(REPLICA_BIND_KEY)
+            if replica is not None and engine is engines.get(None):
+                return replica
+        return engine
+
+    def _use_replica(self, clause):
+        """Check whether the statement may be served by the replica."""
+        if self._flushing or self.info.get('wrote'):
+            return False
+        if not isinstance(clause, sa.Select):
+            return False
+        if not has_request_context() or request.method not in ('GET', 'HEAD'):
+            return False
+        return g.get('db_replica_reads', False) and not is_pinned_to_primary()
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_written(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _stick_after_commit(session):
+    if session.info.pop('wrote', False) and has_request_context():
+        pin_to_primary()
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _reset_after_rollback(session):
+    session.info.pop('wrote', None)
@@ -0,0 +1,267 @@
+"""
+Near-duplicate job posting detection with MinHash and LSH.
+
+A description is reduced to a set of word shingles, and its MinHash signature
+(``NUM_PERM`` minimum hash values) estimates the Jaccard similarity of any two
+descriptions as the fraction of equal positions. The signature is split into
+``BANDS`` bands; each band is hashed (together with the company, so postings
+of different employers are never collapsed) into a bucket stored in
+``job_posting_buckets``. Postings sharing at least one bucket are candidates,
+and candidates whose estimated similarity reaches ``DEDUP_THRESHOLD`` are
+duplicates - so finding them is an index lookup instead of a comparison
+against every posting.
+
+Each cluster of duplicates has a canonical posting, the oldest one; the others
+point at it through ``JobPosting.duplicate_of_id``. Search shows one posting
+per cluster among the active postings matching its filters - the canonical
+one when it matches, else the oldest repost that does.
+"""
+import hashlib
+import random
+import re
+import struct
+from array import array
+from collections import defaultdict
+
+from flask import current_app
+
+from ..extensions import db
+from ..models import JobPosting, JobPostingBucket
+
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(1)  # fixed seed: signatures must be stable across processes and releases
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+                 for _ in range(NUM_PERM)]
+_SIGNATURE = struct.Struct(f'<{NUM_PERM}I')
+_TAG_RE = re.compile(r'<[^>]+>')
+_WORD_RE = re.compile(r'\w+')
+
+
+def shingles(text):
+    """Return the set of ``SHINGLE_SIZE``-word shingles of ``text``."""
+    words = _WORD_RE.findall(_TAG_RE.sub(' ', text or '').lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {' '.join(words)}
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text):
+    """Return the MinHash signature of ``text`` as a tuple of ``NUM_PERM`` ints."""
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), 'little')
+              for s in shingles(text)]
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes) & _MAX_HASH
+        for a, b in _PERMUTATIONS
+    )
+
+
+def pack(signature):
+    return _SIGNATURE.pack(*signature)
+
+
+def unpack(data):
+    return _SIGNATURE.unpack(data)
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def bucket_keys(company_id, signature):
+    """Return the LSH bucket of each band of ``signature``."""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(struct.pack(f'<iB{ROWS}I', company_id, band, *rows), digest_size=8).digest()
+        # Signed 64-bit range so the value fits a BIGINT column on every backend
+        keys.append(int.from_bytes(digest, 'little') & 0x7FFFFFFFFFFFFFFF)
+    return keys
+
+
+def _canonical(job_id, signature, keys, threshold):
+    """Return the canonical posting ``job_id`` duplicates, or ``None``."""
+    candidates = db.session.execute(
+        db.select(JobPosting.id, JobPosting.duplicate_of_id, JobPosting.minhash)
+        .join(JobPostingBucket, JobPostingBucket.job_posting_id == JobPosting.id)
+        .where(JobPostingBucket.bucket.in_(keys), JobPosting.id != job_id)
+        .distinct()
+    ).all()
+    canonical = min((
+        row.duplicate_of_id or row.id
+        for row in candidates
+        if row.minhash and similarity(signature, unpack(row.minhash)) >= threshold
+    ), default=None)
+    return canonical if canonical is not None and canonical < job_id else None
+
+
+def index_posting(job):
+    """Compute ``job``'s signature and buckets and link it to its duplicates.
+
+    Call after the posting was added to the session (and its description
+    set) on create and edit; the caller commits. Postings that pointed at
+    ``job`` are linked again, as the edit may have changed which of them
+    are still duplicates of it.
+    """
+    db.session.flush()
+    signature = minhash(job.description)
+    keys = bucket_keys(job.company_id, signature)
+    job.minhash = pack(signature)
+
+    bucket_table = JobPostingBucket.__table__
+    db.session.execute(bucket_table.delete().where(bucket_table.c.job_posting_id == job.id))
+    db.session.execute(bucket_table.insert(), [{'bucket': key, 'job_posting_id': job.id} for key in keys])
+
+    threshold = current_app.config['DEDUP_THRESHOLD']
+    job.duplicate_of_id = _canonical(job.id, signature, keys, threshold)
+
+    table = JobPosting.__table__
+    followers = db.session.execute(
+        db.select(table.c.id, table.c.company_id, table.c.minhash)
+        .where(table.c.duplicate_of_id == job.id).order_by(table.c.id)
+    ).all()
+    if followers:
+        # Detach them all first, then link each in id order, so a follower
+        # only joins an older one it is actually similar to
+        db.session.execute(table.update().where(table.c.duplicate_of_id == job.id)
+                           .values(duplicate_of_id=None, updated_at=table.c.updated_at))
+        for row in followers:
+            if not row.minhash:
+                continue
+            follower_signature = unpack(row.minhash)
+            canonical = _canonical(row.id, follower_signature,
+                                   bucket_keys(row.company_id, follower_signature), threshold)
+            if canonical is not None:
+                db.session.execute(table.update().where(table.c.id == row.id)
+                                   .values(duplicate_of_id=canonical, updated_at=table.c.updated_at))
+    return job.duplicate_of_id
+
+
+def remove_posting(job):
+    """Forget ``job``'s buckets and detach postings that pointed at it."""
+    bucket_table = JobPostingBucket.__table__
+    db.session.execute(bucket_table.delete().where(bucket_table.c.job_posting_id == job.id))
+    JobPosting.query.filter_by(duplicate_of_id=job.id)\
+        .update({'duplicate_of_id': None}, synchronize_session=False)
+
+
+def collapse_duplicates(query):
+    """Filter a JobPosting query to one posting per cluster among its active results.
+
+    A repost is hidden only when an older member of its cluster (the
+    canonical posting or an older repost) matches the same filters, so a
+    search matching only the repost still finds it.
+    """
+    matching = query.filter(JobPosting.is_active.is_(True)).with_entities(
+        JobPosting.id.label('id'),
+        db.func.coalesce(JobPosting.duplicate_of_id, JobPosting.id).label('cluster'),
+    ).order_by(None).subquery()
+    return query.filter(
+        JobPosting.duplicate_of_id.is_(None) |
+        ~db.select(matching.c.id)
+        .where(matching.c.cluster == JobPosting.duplicate_of_id, matching.c.id < JobPosting.id)
+        .exists()
+    )
+
+
+def duplicate_counts(job_ids):
+    """Return ``{job id: number of active postings collapsed into it}``."""
+    if not job_ids:
+        return {}
+    rows = db.session.query(JobPosting.duplicate_of_id, db.func.count(JobPosting.id))\
+        .filter(JobPosting.duplicate_of_id.in_(job_ids), JobPosting.is_active.is_(True))\
+        .group_by(JobPosting.duplicate_of_id).all()
+    return dict(rows)
+
+
+def cluster_catalog(batch_size=1000, threshold=None, progress=None):
+    """Recompute signatures and buckets for every posting and re-cluster them.
+
+    Postings are read in id order in batches, and only postings sharing a
+    bucket are compared, never all pairs. Memory holds the signatures
+    (packed in arrays of ``NUM_PERM`` 32-bit ints) and the bucket lists. Returns
+    ``(postings, clusters, duplicates)``.
+    """
+    threshold = current_app.config['DEDUP_THRESHOLD'] if threshold is None else threshold
+    bucket_table = JobPostingBucket.__table__
+    db.session.execute(bucket_table.delete())
+
+    signatures = {}
+    buckets = defaultdict(list)
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(JobPosting.id, JobPosting.company_id, JobPosting.description)
+            .where(JobPosting.id > last_id).order_by(JobPosting.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        bucket_rows, signature_rows = [], []
+        for row in rows:
+            signature = minhash(row.description)
+            signatures[row.id] = array('I', signature)
+            signature_rows.append({'job_id': row.id, 'minhash': pack(signature)})
+            for key in bucket_keys(row.company_id, signature):
+                buckets[key].append(row.id)
+                bucket_rows.append({'bucket': key, 'job_posting_id': row.id})
+        db.session.execute(
+            JobPosting.__table__.update()
+            .where(JobPosting.__table__.c.id == db.bindparam('job_id'))
+            .values(minhash=db.bindparam('minhash'), updated_at=JobPosting.__table__.c.updated_at),
+            signature_rows,
+        )
+        db.session.execute(bucket_table.insert(), bucket_rows)
+        db.session.commit()
+        last_id = rows[-1].id
+        if progress:
+            progress(len(signatures))
+
+    # Union-find over bucket-mates that are similar enough; the smallest id
+    # of each component (the oldest posting) becomes its canonical posting.
+    parent = {}
+
+    def find(x):
+        root = x
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while x != root:
+            parent[x], x = root, parent.get(x, x)
+        return root
+
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        # Compare each member with one representative per cluster seen in the
+        # bucket, not with every other member: a bucket holding hundreds of
+        # reposts of one ad costs one comparison per repost.
+        representatives = []
+        for job_id in members:
+            for other in representatives:
+                if similarity(signatures[job_id], signatures[other]) >= threshold:
+                    a, b = find(job_id), find(other)
+                    if a != b:
+                        parent[max(a, b)] = min(a, b)
+                    break
+            else:
+                representatives.append(job_id)
+
+    updates = [{'job_id': job_id, 'canonical': None if find(job_id) == job_id else find(job_id)}
+               for job_id in signatures]
+    table = JobPosting.__table__
+    for start in range(0, len(updates), batch_size):
+        db.session.execute(
+            table.update().where(table.c.id == db.bindparam('job_id'))
+            .values(duplicate_of_id=db.bindparam('canonical'), updated_at=table.c.updated_at),
+            updates[start:start + batch_size],
+        )
+    db.session.commit()
+
+    duplicates = sum(1 for update in updates if update['canonical'] is not None)
+    clusters = len({update['canonical'] for update in updates if update['canonical'] is not None})
+    return len(signatures), clusters, duplicates
@@ -0,0 +1,219 @@
+"""
+Saved jobs and favorite resumes.
+
+A page of favorites is one query: the saved rows joined to their posting (or
+resume), company, location and type names, projected to the columns the page
+shows, with the total count computed alongside as a window column. Pages
+list plain rows, so templates never load a relationship.
+
+Saving is idempotent and race-free: one ``INSERT ... SELECT`` adds whichever
+of the given postings (or resumes) exist and aren't saved yet, skipping
+conflicts with concurrent saves (``ON CONFLICT DO NOTHING`` on PostgreSQL and
+SQLite, ``MERGE`` on SQL Server), and returns the ids it added. Removing is
+one ``DELETE`` restricted to the user's own rows.
+
+Exports stream all of a user's favorites as CSV from a server-side cursor,
+so memory use doesn't grow with the number of favorites.
+"""
+import csv
+import io
+from datetime import datetime
+
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy import and_, bindparam, exists, func, literal, select, text
+from sqlalchemy.orm import aliased
+
+# Favorites handled per bulk request, and per export fetch
+MAX_BULK = 100
+EXPORT_BATCH = 500
+
+
+class ProjectionPagination(Pagination):
+    """Pagination over a select whose last column is ``count(*) OVER ()``."""
+
+    def _query_items(self):
+        from ..extensions import db
+
+        statement = self._query_args['statement'].limit(self.per_page).offset(self._query_offset)
+        rows = db.session.execute(statement).all()
+        self._query_args['total'] = rows[0].total if rows else None
+        return rows
+
+    def _query_count(self):
+        total = self._query_args['total']
+        if total is None:
+            # Past the last page (or nothing saved): count without the rows
+            from ..extensions import db
+
+            statement = self._query_args['statement']
+            total = db.session.execute(select(func.count()).select_from(statement.subquery())).scalar()
+        return total
+
+
+def _saved_jobs(user_id, expired=False):
+    from ..models import ArchivedJobPosting, ArchivedMyJob, Company, Country, JobPosting, JobType, MyJob, State
+
+    saved, posting = (ArchivedMyJob, ArchivedJobPosting) if expired else (MyJob, JobPosting)
+    return select(
+        saved.id, saved.created_at, posting.id.label('job_posting_id'), posting.title, posting.city,
+        posting.posted_date, Company.id.label('company_id'), Company.company_name,
+        State.state_name, Country.country_name, JobType.job_type_name,
+    ).join(posting, posting.id == saved.job_posting_id)\
+        .join(Company, Company.id == posting.company_id)\
+        .outerjoin(State, State.id == posting.state_id)\
+        .outerjoin(Country, Country.id == posting.country_id)\
+        .outerjoin(JobType, JobType.id == posting.job_type_id)\
+        .where(saved.user_id == user_id)\
+        .order_by(saved.created_at.desc(), saved.id.desc())
+
+
+def _favorite_resumes(user_id):
+    from ..models import Country, EducationLevel, MyResume, Resume, State
+
+    state, country = aliased(State), aliased(Country)
+    return select(
+        MyResume.id, MyResume.created_at, Resume.id.label('resume_id'), Resume.job_title, Resume.target_city,
+        state.state_name, country.country_name, EducationLevel.education_level_name,
+    ).join(Resume, Resume.id == MyResume.resume_id)\
+        .outerjoin(state, state.id == Resume.target_state_id)\
+        .outerjoin(country, country.id == Resume.target_country_id)\
+        .outerjoin(EducationLevel, EducationLevel.id == Resume.education_level_id)\
+        .where(MyResume.user_id == user_id)\
+        .order_by(MyResume.created_at.desc(), MyResume.id.desc())
+
+
+def _page(statement, page, per_page):
+    return ProjectionPagination(page=page, per_page=per_page,
+                                statement=statement.add_columns(func.count().over().label('total')))
+
+
+def saved_jobs_page(user_id, page, per_page=10, expired=False):
+    """A page of the user's saved (or expired saved) jobs."""
+    return _page(_saved_jobs(user_id, expired), page, per_page)
+
+
+def favorite_resumes_page(user_id, page, per_page=10):
+    """A page of the employer's favorite resumes."""
+    return _page(_favorite_resumes(user_id), page, per_page)
+
+
+# Saving and removing
+
+def _targets(kind):
+    """(saved model, its target id column, target model, target's visibility flag)."""
+    from ..models import JobPosting, MyJob, MyResume, Resume
+
+    if kind == 'jobs':
+        return MyJob, MyJob.job_posting_id, JobPosting, 'is_active'
+    return MyResume, MyResume.resume_id, Resume, 'is_searchable'
+
+
+def save(kind, user_id, ids):
+    """Save the ``kind`` ('jobs' or 'resumes') with these ids; returns the ids newly saved."""
+    from ..extensions import db
+
+    ids = sorted(set(ids))[:MAX_BULK]
+    if not ids:
+        return []
+    model, column, target, flag = _targets(kind)
+    table = model.__table__
+    now = datetime.utcnow()
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'mssql':
+        statement = text(
+            f'MERGE {table.name} WITH (HOLDLOCK) AS saved '
+            f'USING (SELECT id FROM {target.__tablename__} WHERE id IN :ids AND {flag} = 1) AS target '
+            f'ON saved.user_id = :user_id AND saved.{column.key} = target.id '
+            f'WHEN NOT MATCHED THEN INSERT (user_id, {column.key}, created_at) VALUES (:user_id, target.id, :now) '
+            f'OUTPUT inserted.{column.key};'
+        ).bindparams(bindparam('ids', expanding=True))
+        added = db.session.execute(statement, {'ids': ids, 'user_id': user_id, 'now': now}).scalars().all()
+        db.session.commit()
+        return sorted(added)
+
+    source = select(literal(user_id), target.id, literal(now))\
+        .where(target.id.in_(ids), getattr(target, flag).is_(True),
+               ~exists().where(model.user_id == user_id, column == target.id))
+    statement = table.insert().from_select(['user_id', column.key, 'created_at'], source)
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        statement = insert(table).from_select(['user_id', column.key, 'created_at'], source)\
+            .on_conflict_do_nothing(index_elements=['user_id', column.key])\
+            .returning(table.c[column.key])
+        added = db.session.execute(statement).scalars().all()
+    else:
+        # NOT EXISTS skips rows already saved; only a concurrent save of the
+        # same row can still hit the unique constraint
+        saved = select(column).where(model.user_id == user_id, column.in_(ids))
+        before = set(db.session.execute(saved).scalars())
+        db.session.execute(statement)
+        added = set(db.session.execute(saved).scalars()) - before
+    db.session.commit()
+    return sorted(added)
+
+
+def remove(kind, user_id, favorite_ids):
+    """Remove the user's favorites with these (MyJob / MyResume) ids; returns how many went."""
+    from ..extensions import db
+
+    favorite_ids = list(set(favorite_ids))[:MAX_BULK]
+    if not favorite_ids:
+        return 0
+    model = _targets(kind)[0]
+    table = model.__table__
+    result = db.session.execute(
+        table.delete().where(and_(table.c.user_id == user_id, table.c.id.in_(favorite_ids)))
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+# Export
+
+def _location(*parts):
+    return ', '.join(part for part in parts if part)
+
+
+EXPORTS = {
+    'jobs': (
+        ['Title', 'Company', 'Location', 'Job Type', 'Posted', 'Saved', 'URL'],
+        lambda row, url: [row.title, row.company_name, _location(row.city, row.state_name, row.country_name),
+                          row.job_type_name or '', _date(row.posted_date), _date(row.created_at),
+                          url(row.job_posting_id)],
+    ),
+    'resumes': (
+        ['Job Title', 'Target Location', 'Education', 'Saved', 'URL'],
+        lambda row, url: [row.job_title, _location(row.target_city, row.state_name, row.country_name),
+                          row.education_level_name or '', _date(row.created_at), url(row.resume_id)],
+    ),
+}
+
+
+def _date(value):
+    return value.strftime('%Y-%m-%d') if value else ''
+
+
+def export_csv(kind, user_id, url):
+    """Yield the user's favorites as CSV lines; ``url(id)`` links each row."""
+    from ..extensions import db
+
+    statement = _saved_jobs(user_id) if kind == 'jobs' else _favorite_resumes(user_id)
+    header, fields = EXPORTS[kind]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    yield line(header)
+    result = db.session.execute(statement.execution_options(stream_results=True, yield_per=EXPORT_BATCH))
+    for row in result:
+        yield line(fields(row, url))
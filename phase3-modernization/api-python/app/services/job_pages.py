@@ -0,0 +1,150 @@
+"""
+Static snapshots of public job pages.
+
+Anonymous visitors all see the same job page, so it is rendered once, when
+the posting is created or edited, and written to ``JOB_PAGES_DIR`` (with a
+gzip variant); ``view_job`` sends that file to anonymous requests without
+rendering a template or querying the database. Signed-in job seekers still
+get the live page, which shows whether they saved the job.
+
+A snapshot only exists while its posting is active: ``publish`` removes it
+when the posting was deactivated or no longer exists, and deleting or
+archiving postings calls ``remove``. Files are replaced atomically, so a
+request never reads a half-written page. Editing a company profile queues a
+task republishing the company's postings, and ``flask job-pages publish``
+rebuilds every snapshot (after upgrades, or renaming job types or locations).
+A posting without a snapshot yet is published on its first anonymous visit.
+"""
+import gzip
+import os
+import tempfile
+from functools import wraps
+
+from flask import current_app, render_template
+from flask_login import current_user
+from sqlalchemy import select
+
+from ..extensions import analytics, db
+from .assets import send_precompressed
+from .tasks import task
+
+TEMPLATE = 'jobseeker/view_job.html'
+# Snapshots per directory
+SHARD_SIZE = 1000
+
+
+def pages_root(app=None):
+    app = app or current_app
+    return app.config.get('JOB_PAGES_DIR') or os.path.join(app.instance_path, 'job_pages')
+
+
+def page_path(root, job_id):
+    """Return the path of a posting's snapshot."""
+    return os.path.join(root, str(job_id // SHARD_SIZE), f'{job_id}.html')
+
+
+def _replace(path, data):
+    # A temp file of its own per call: threads of a worker may publish the
+    # same posting at once
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), prefix=os.path.basename(path) + '.',
+                                     suffix='.tmp', delete=False) as f:
+        f.write(data)
+    try:
+        os.replace(f.name, path)
+    except OSError:
+        os.remove(f.name)
+        raise
+
+
+def _render(app, job_id):
+    """Render the anonymous page of an active posting, or return ``None``."""
+    from ..models import JobPosting
+
+    # A fresh app context: the page must not see the current user (kept on g)
+    # nor the caller's session
+    with app.app_context(), app.test_request_context(f'/jobseeker/job/{job_id}'):
+        job = db.session.execute(
+            select(JobPosting).where(JobPosting.id == job_id, JobPosting.is_active.is_(True))
+        ).scalar_one_or_none()
+        if job is None:
+            return None
+        return render_template(TEMPLATE, job=job, public=True)
+
+
+def publish(job_id):
+    """Write the snapshot of a posting, or remove it if the posting isn't active.
+
+    Returns whether a snapshot was written.
+    """
+    app = current_app._get_current_object()
+    html = _render(app, job_id)
+    if html is None:
+        remove(job_id)
+        return False
+    path = page_path(pages_root(app), job_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    content = html.encode('utf-8')
+    _replace(path + '.gz', gzip.compress(content, mtime=0))
+    _replace(path, content)
+    return True
+
+
+def try_publish(job_id):
+    """``publish``, logging file system errors instead of raising them.
+
+    For callers whose change is already committed, or that can fall back to
+    the live page; the next anonymous visit tries again.
+    """
+    try:
+        return publish(job_id)
+    except OSError as e:
+        current_app.logger.warning(f'Could not publish the page of job {job_id}: {e}')
+        return False
+
+
+def remove(*job_ids):
+    """Remove the snapshots of these postings."""
+    root = pages_root()
+    for job_id in job_ids:
+        path = page_path(root, job_id)
+        for name in (path, path + '.gz'):
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                current_app.logger.warning(f'Could not remove the page of job {job_id}: {e}')
+
+
+def publish_all(company_id=None):
+    """Republish every active posting (of one company); return how many were written."""
+    from ..models import JobPosting
+
+    statement = select(JobPosting.id).where(JobPosting.is_active.is_(True)).order_by(JobPosting.id)
+    if company_id is not None:
+        statement = statement.where(JobPosting.company_id == company_id)
+    ids = db.session.execute(statement).scalars().all()
+    return sum(publish(job_id) for job_id in ids)
+
+
+@task(name='job_pages.publish_company', max_attempts=3)
+def publish_company_pages(company_id):
+    """Republish a company's postings after its profile changed."""
+    publish_all(company_id=company_id)
+
+
+def anonymous_snapshot(f):
+    """Serve anonymous requests for ``<id>`` from the posting's snapshot."""
+    @wraps(f)
+    def decorated_function(id, *args, **kwargs):
+        if current_user.is_authenticated:
+            return f(id, *args, **kwargs)
+        root = pages_root()
+        if not os.path.isfile(page_path(root, id)) and not try_publish(id):
+            return f(id, *args, **kwargs)
+        analytics.record(id, 'views')
+        response = send_precompressed(os.path.dirname(page_path(root, id)), f'{id}.html')
+        response.cache_control.public = True
+        response.vary.add('Cookie')
+        return response
+    return decorated_function
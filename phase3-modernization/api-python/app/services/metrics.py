@@ -0,0 +1,406 @@
+"""
+Prometheus metrics, aggregated across worker processes.
+
+``/metrics`` serves, in the Prometheus text format:
+
+* request latency and per-request database time histograms and request
+  counts by status, labelled by blueprint and endpoint,
+* the number of requests in flight,
+* bcrypt hashing time,
+* write-behind flush time, lag, rows and failures, by buffer,
+* search and shared cache lookups by result, and the resulting hit ratios.
+
+Recording takes no lock: every thread adds to its own counters and
+histograms, which only that thread writes. A background thread in each
+worker sums its threads' values every ``METRICS_FLUSH_SECONDS`` and replaces
+``<METRICS_DIR>/<pid>.json`` with them; a scrape, answered by whichever
+worker receives it, adds that worker's live values to the files of the other
+workers. A worker that exits cleanly folds its counters and histograms into
+``retired.json`` and removes its file, so recycled workers neither lose
+counts nor leave files behind; the files of workers that crashed are folded
+the same way by the next scrape, and when the server starts.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, abort, current_app, request, request_started
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BCRYPT_BUCKETS = (0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0)
+LAG_BUCKETS = (1.0, 2.5, 5.0, 10.0, 15.0, 30.0, 60.0, 120.0, 300.0)
+
+# name -> (type, help, buckets)
+METRICS = {
+    'jobsite_http_requests_total': ('counter', 'Requests handled.', None),
+    'jobsite_http_request_duration_seconds': ('histogram', 'Request latency.', LATENCY_BUCKETS),
+    'jobsite_http_request_db_seconds': ('histogram', 'Time a request spent in database calls.', LATENCY_BUCKETS),
+    'jobsite_http_requests_in_flight': ('gauge', 'Requests being handled.', None),
+    'jobsite_bcrypt_duration_seconds': ('histogram', 'bcrypt password hashing and checking time.', BCRYPT_BUCKETS),
+    'jobsite_cache_requests_total': ('counter', 'Cache lookups.', None),
+    'jobsite_cache_hit_ratio': ('gauge', 'Share of cache lookups answered from the cache.', None),
+    'jobsite_write_behind_flush_duration_seconds': ('histogram', 'Time taken to flush a write-behind buffer.',
+                                                    LATENCY_BUCKETS),
+    'jobsite_write_behind_lag_seconds': ('histogram', 'How long the oldest change of a flush waited in memory.',
+                                         LAG_BUCKETS),
+    'jobsite_write_behind_rows_total': ('counter', 'Rows written by write-behind flushes.', None),
+    'jobsite_write_behind_failures_total': ('counter', 'Write-behind flushes that failed.', None),
+}
+
+RETIRED = 'retired'
+
+
+class _Store:
+    """Values recorded by one thread; only that thread writes them."""
+
+    __slots__ = ('thread', 'counters', 'gauges', 'histograms')
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}  # key -> [count per bucket..., count above the last bucket, sum]
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _merge(totals, values):
+    """Add ``values`` (``{'counters', 'gauges', 'histograms'}``) into ``totals``."""
+    for kind in ('counters', 'gauges'):
+        target = totals[kind]
+        for key, value in values[kind].items():
+            target[key] = target.get(key, 0) + value
+    target = totals['histograms']
+    for key, counts in values['histograms'].items():
+        current = target.get(key)
+        target[key] = list(counts) if current is None else [a + b for a, b in zip(current, counts)]
+
+
+def _empty():
+    return {'counters': {}, 'gauges': {}, 'histograms': {}}
+
+
+def _dump(values):
+    return {kind: [[name, list(map(list, labels)), value] for (name, labels), value in values[kind].items()]
+            for kind in values}
+
+
+def _load(data):
+    return {kind: {(name, tuple(map(tuple, labels))): value for name, labels, value in data.get(kind, ())}
+            for kind in ('counters', 'gauges', 'histograms')}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _series(name, labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return name
+    return name + '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(values):
+    """Render aggregated values in the Prometheus text exposition format."""
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        source = values['histograms' if kind == 'histogram' else kind + 's']
+        series = sorted((labels, value) for (metric, labels), value in source.items() if metric == name)
+        if not series:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in series:
+            if kind != 'histogram':
+                lines.append(f'{_series(name, labels)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + (float('inf'),), value[:-1]):
+                cumulative += count
+                lines.append(f'{_series(name + "_bucket", labels, [("le", _number(bound))])} {cumulative}')
+            lines.append(f'{_series(name + "_sum", labels)} {_number(value[-1])}')
+            lines.append(f'{_series(name + "_count", labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+class Metrics:
+    """Lock-free per-thread recording, aggregated per worker and across workers."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._stores = []
+        self._stores_lock = threading.Lock()  # taken once per thread, not per request
+        self._retired = _empty()  # values of finished threads of this worker
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+        self._flusher_pid = None
+        self.directory = None
+        self.flush_seconds = 5.0
+        self._logger = None
+        self._collectors = []
+
+    def init_app(self, app):
+        config = app.config
+        self.directory = config['METRICS_DIR'] or os.path.join(app.instance_path, 'metrics')
+        self.flush_seconds = config['METRICS_FLUSH_SECONDS']
+        self._logger = app.logger
+        request_started.connect(self._start_request, app)
+        app.after_request(self._record_status)
+        app.teardown_request(self._end_request)
+        app.add_url_rule(config['METRICS_PATH'], 'metrics', self._view)
+
+        from ..extensions import search_cache, shared_cache
+        self._collectors = [
+            lambda: {('jobsite_cache_requests_total', (('cache', name), ('result', 'hit'))): cache.hits
+                     for name, cache in (('search', search_cache), ('shared', shared_cache))},
+            lambda: {('jobsite_cache_requests_total', (('cache', name), ('result', 'miss'))): cache.misses
+                     for name, cache in (('search', search_cache), ('shared', shared_cache))},
+        ]
+
+    # Recording
+
+    def _store(self):
+        store = getattr(self._local, 'store', None)
+        if store is None:
+            store = self._local.store = _Store(threading.current_thread())
+            with self._stores_lock:
+                self._stores.append(store)
+        return store
+
+    def inc(self, name, value=1, **labels):
+        counters = self._store().counters
+        key = (name, _labels(labels))
+        counters[key] = counters.get(key, 0) + value
+
+    def add_gauge(self, name, value, **labels):
+        gauges = self._store().gauges
+        key = (name, _labels(labels))
+        gauges[key] = gauges.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        buckets = METRICS[name][2]
+        histograms = self._store().histograms
+        key = (name, _labels(labels))
+        counts = histograms.get(key)
+        if counts is None:
+            counts = histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(buckets, value)] += 1
+        counts[-1] += value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe how long the ``with`` block takes."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    # Requests
+
+    def _start_request(self, sender, **extra):
+        request.environ['metrics.started'] = time.perf_counter()
+        self.add_gauge('jobsite_http_requests_in_flight', 1)
+        if self._flusher_pid != os.getpid() and self.flush_seconds > 0:
+            self._start_flusher()
+
+    def _record_status(self, response):
+        request.environ['metrics.status'] = response.status_code
+        return response
+
+    def _end_request(self, exc):
+        started = request.environ.pop('metrics.started', None)
+        if started is None:
+            return
+        from ..extensions import db_time
+
+        elapsed = time.perf_counter() - started
+        self.add_gauge('jobsite_http_requests_in_flight', -1)
+        status = 500 if exc is not None else request.environ.get('metrics.status', 500)
+        blueprint = request.blueprint or ''
+        endpoint = request.endpoint or 'unmatched'
+        self.inc('jobsite_http_requests_total', blueprint=blueprint, endpoint=endpoint,
+                 method=request.method, status=str(status))
+        self.observe('jobsite_http_request_duration_seconds', elapsed, blueprint=blueprint, endpoint=endpoint)
+        self.observe('jobsite_http_request_db_seconds', min(db_time.request_db_seconds(), elapsed),
+                     blueprint=blueprint, endpoint=endpoint)
+
+    # Aggregation
+
+    def local_values(self):
+        """Return this worker's values, folding in the stores of finished threads."""
+        totals = _empty()
+        # Concurrent scrapes and flushes both fold finished stores
+        with self._stores_lock:
+            live = []
+            for store in self._stores:
+                if store.thread.is_alive():
+                    live.append(store)
+                else:
+                    _merge(self._retired, {'counters': store.counters, 'gauges': {}, 'histograms': store.histograms})
+            self._stores = live
+            _merge(totals, self._retired)
+        for store in live:
+            # Copies are atomic under the GIL; the owning thread keeps writing
+            _merge(totals, {'counters': store.counters.copy(), 'gauges': store.gauges.copy(),
+                            'histograms': {key: list(counts) for key, counts in store.histograms.copy().items()}})
+        for collect in self._collectors:
+            _merge(totals, {'counters': collect(), 'gauges': {}, 'histograms': {}})
+        return totals
+
+    def _path(self, name):
+        return os.path.join(self.directory, f'{name}.json')
+
+    def flush(self):
+        """Publish this worker's values for the other workers' scrapes."""
+        with self._flush_lock:
+            if self._flusher_pid != os.getpid():
+                return  # retired
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(os.getpid())
+            temp_path = f'{path}.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(_dump(self.local_values()), f)
+            os.replace(temp_path, path)
+
+    def _start_flusher(self):
+        self._flusher_pid = os.getpid()
+        self._flusher = threading.Thread(target=self._flush_periodically, name='metrics-flush', daemon=True)
+        self._flusher.start()
+
+    def _flush_periodically(self):
+        pid = os.getpid()
+        while self._flusher_pid == pid:
+            time.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except OSError as e:
+                self._logger.warning(f'Could not publish metrics: {e}')
+
+    def retire(self):
+        """Fold this exiting worker's counters and histograms into the retired totals."""
+        if fcntl is None or self.directory is None:
+            return
+        with self._flush_lock:
+            self._flusher_pid = None
+        values = self.local_values()
+        values['gauges'] = {}
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, 'retired.lock'), 'w') as lock:
+            fcntl.lockf(lock, fcntl.LOCK_EX)
+            totals = self._read(RETIRED) or _empty()
+            _merge(totals, values)
+            self._write_retired(totals)
+            try:
+                os.remove(self._path(os.getpid()))
+            except FileNotFoundError:
+                pass
+
+    def prune(self):
+        """Fold the files of workers that died without retiring into the retired totals.
+
+        Returns how many files were removed.
+        """
+        if fcntl is None or self.directory is None or not os.path.isdir(self.directory):
+            return 0
+        dead = [name for name in self._worker_names() if not _running(int(name))]
+        if not dead:
+            return 0
+        with open(os.path.join(self.directory, 'retired.lock'), 'w') as lock:
+            fcntl.lockf(lock, fcntl.LOCK_EX)
+            totals = self._read(RETIRED) or _empty()
+            pruned = []
+            for name in dead:
+                if not os.path.exists(self._path(name)):
+                    continue  # pruned by another worker
+                values = self._read(name)
+                if values is not None:
+                    values['gauges'] = {}
+                    _merge(totals, values)
+                pruned.append(name)
+            if pruned:
+                self._write_retired(totals)
+            for name in pruned:
+                os.remove(self._path(name))
+        return len(pruned)
+
+    def _write_retired(self, totals):
+        temp_path = f'{self._path(RETIRED)}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(_dump(totals), f)
+        os.replace(temp_path, self._path(RETIRED))
+
+    def _worker_names(self):
+        """pids of the workers that published a file, as strings."""
+        names = os.listdir(self.directory) if os.path.isdir(self.directory) else []
+        return [name for name, extension in map(os.path.splitext, names)
+                if extension == '.json' and name.isdigit()]
+
+    def _read(self, name):
+        try:
+            with open(self._path(name)) as f:
+                return _load(json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    def collect(self):
+        """Return the values of all workers: this one live, the others as last flushed."""
+        try:
+            self.prune()
+        except OSError as e:
+            self._logger.warning(f'Could not prune metrics of stopped workers: {e}')
+        totals = self.local_values()
+        own = str(os.getpid())
+        for name in self._worker_names() + [RETIRED]:
+            if name == own:
+                continue
+            values = self._read(name)
+            if values is None:
+                continue
+            if name != RETIRED and not _running(int(name)):
+                values['gauges'] = {}
+            _merge(totals, values)
+
+        lookups = {}
+        for (metric, labels), value in totals['counters'].items():
+            if metric == 'jobsite_cache_requests_total':
+                labels = dict(labels)
+                hits, total = lookups.get(labels['cache'], (0, 0))
+                lookups[labels['cache']] = (hits + (value if labels['result'] == 'hit' else 0), total + value)
+        for cache, (hits, total) in lookups.items():
+            if total:
+                totals['gauges'][('jobsite_cache_hit_ratio', (('cache', cache),))] = hits / total
+        return totals
+
+    def _view(self):
+        token = current_app.config['METRICS_TOKEN']
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            abort(401)
+        return Response(render(self.collect()), mimetype='text/plain; version=0.0.4')
+
+
+def _running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
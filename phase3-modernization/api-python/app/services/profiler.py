@@ -0,0 +1,301 @@
+"""
+On-demand sampling profiler for individual routes.
+
+Admins pick endpoints and a sample rate on the Profiler admin page, or send
+``X-Profile: 1`` with a request while logged in as an admin. A sampled
+request's thread is registered with a background sampler thread, which every
+``PROFILER_INTERVAL_MS`` reads the thread's current stack from
+``sys._current_frames()`` and counts it. The request itself runs
+uninstrumented, so a sampled request costs little more than a stack walk per
+interval, and requests that are not sampled cost a dictionary lookup and a
+random number.
+
+When a sampled request finishes, its stacks are appended in collapsed-stack
+format (``frame;frame;frame count``, as read by flamegraph.pl and speedscope)
+to ``<PROFILER_DIR>/<endpoint>/<pid>.folded``, so every worker's samples end
+up in the same place. The admin pages merge those files into a top-functions
+report, a downloadable ``.folded`` file and an SVG flame graph.
+
+The targets are kept in ``<PROFILER_DIR>/targets.json`` so all workers see
+changes within ``TARGETS_REFRESH_SECONDS``.
+"""
+import json
+import os
+import random
+import shutil
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+
+from flask import current_app, request
+from markupsafe import escape
+
+TARGETS_REFRESH_SECONDS = 2.0
+MAX_STACK_DEPTH = 128
+HEADER = 'X-Profile'
+
+_labels = {}  # code object -> frame label
+
+
+def profile_dir(app=None):
+    app = app or current_app
+    return app.config['PROFILER_DIR'] or os.path.join(app.instance_path, 'profiles')
+
+
+def _frame_label(code):
+    label = _labels.get(code)
+    if label is None:
+        name = getattr(code, 'co_qualname', code.co_name)
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        label = _labels[code] = f'{module}:{name}'.replace(';', ',').replace(' ', '_')
+    return label
+
+
+def collapse(frame):
+    """Return ``frame``'s stack as ``outermost;...;innermost``."""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class Profiler:
+    """Samples the stacks of selected requests in this worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = {}  # thread ident -> Counter of collapsed stacks
+        self._wake = threading.Event()
+        self._thread = None
+        self._targets = {}
+        self._targets_checked = 0.0
+        self._targets_mtime = None
+        self.interval = 0.005
+
+    def init_app(self, app):
+        self.interval = app.config['PROFILER_INTERVAL_MS'] / 1000
+        app.before_request(self._start)
+        app.teardown_request(self._stop)
+
+    # Targets
+
+    def targets(self):
+        """Return ``{endpoint: sample percent}``, re-read when the file changes."""
+        now = time.monotonic()
+        if now - self._targets_checked < TARGETS_REFRESH_SECONDS:
+            return self._targets
+        self._targets_checked = now
+        path = os.path.join(profile_dir(), 'targets.json')
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            self._targets, self._targets_mtime = {}, None
+            return self._targets
+        if mtime != self._targets_mtime:
+            try:
+                with open(path) as f:
+                    self._targets = json.load(f)
+            except (OSError, ValueError):
+                self._targets = {}
+            self._targets_mtime = mtime
+        return self._targets
+
+    def set_target(self, endpoint, percent):
+        """Sample ``percent`` of ``endpoint``'s requests in every worker (0 stops)."""
+        directory = profile_dir()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, 'targets.json')
+        try:
+            with open(path) as f:
+                targets = json.load(f)
+        except (OSError, ValueError):
+            targets = {}
+        if percent > 0:
+            targets[endpoint] = percent
+        else:
+            targets.pop(endpoint, None)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(targets, f)
+        os.replace(temp_path, path)
+        self._targets_checked = 0.0
+
+    # Sampling
+
+    def _start(self):
+        endpoint = request.endpoint
+        if endpoint is None:
+            return
+        percent = self.targets().get(endpoint)
+        if percent is not None and random.random() * 100 < percent:
+            self._begin()
+        elif request.headers.get(HEADER) == '1':
+            from flask_login import current_user
+            if current_user.is_authenticated and current_user.is_admin:
+                self._begin()
+
+    def _begin(self):
+        request.environ['profiler.started'] = time.perf_counter()
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._sample, name='profiler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _stop(self, exc):
+        started = request.environ.pop('profiler.started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            stacks = self._active.pop(threading.get_ident(), None)
+        if stacks is not None:
+            try:
+                self.record(request.endpoint, stacks, elapsed)
+            except OSError as e:
+                current_app.logger.warning(f'Could not save profile of {request.endpoint}: {e}')
+
+    def _sample(self):
+        me = threading.get_ident()
+        while True:
+            self._wake.wait()
+            with self._lock:
+                if not self._active:
+                    self._wake.clear()
+                    continue
+                active = list(self._active.items())
+            frames = sys._current_frames()
+            for ident, stacks in active:
+                frame = frames.get(ident)
+                if frame is not None and ident != me:
+                    stacks[collapse(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+    # Storage
+
+    def record(self, endpoint, stacks, seconds):
+        """Append one request's stacks to this worker's profile of ``endpoint``."""
+        directory = os.path.join(profile_dir(), endpoint)
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, str(os.getpid()))
+        with open(f'{base}.folded', 'a') as f:
+            f.write(''.join(f'{stack} {count}\n' for stack, count in stacks.items()))
+        with open(f'{base}.requests', 'a') as f:
+            f.write(f'{seconds:.6f}\n')
+
+    def profiles(self):
+        """Return ``{endpoint: {'requests', 'mean_seconds', 'samples'}}`` for recorded endpoints."""
+        directory = profile_dir()
+        result = {}
+        if not os.path.isdir(directory):
+            return result
+        for endpoint in sorted(os.listdir(directory)):
+            if not os.path.isdir(os.path.join(directory, endpoint)):
+                continue
+            durations = self._durations(endpoint)
+            result[endpoint] = {
+                'requests': len(durations),
+                'mean_seconds': sum(durations) / len(durations) if durations else 0.0,
+                'samples': sum(self.stacks(endpoint).values()),
+            }
+        return result
+
+    def _durations(self, endpoint):
+        durations = []
+        for path in self._files(endpoint, '.requests'):
+            with open(path) as f:
+                durations.extend(float(line) for line in f if line.strip())
+        return durations
+
+    def _files(self, endpoint, suffix):
+        directory = os.path.join(profile_dir(), endpoint)
+        if not os.path.isdir(directory):
+            return []
+        return [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(suffix)]
+
+    def stacks(self, endpoint):
+        """Return the merged ``Counter`` of collapsed stacks of ``endpoint``."""
+        merged = Counter()
+        for path in self._files(endpoint, '.folded'):
+            with open(path) as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    if stack and count.isdigit():
+                        merged[stack] += int(count)
+        return merged
+
+    def clear(self, endpoint):
+        shutil.rmtree(os.path.join(profile_dir(), endpoint), ignore_errors=True)
+
+
+def folded(stacks):
+    """Render stacks in collapsed-stack format."""
+    return ''.join(f'{stack} {count}\n' for stack, count in sorted(stacks.items()))
+
+
+def top_functions(stacks, limit=30):
+    """Return ``[(function, self samples, total samples)]``, most self time first."""
+    own, total = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(';')
+        own[frames[-1]] += count
+        for frame in set(frames):
+            total[frame] += count
+    rows = [(name, own[name], total[name]) for name in total]
+    rows.sort(key=lambda row: (-row[1], -row[2], row[0]))
+    return rows[:limit]
+
+
+def flamegraph_svg(stacks, title, width=1200, row_height=16):
+    """Render ``stacks`` as a standalone SVG flame graph."""
+    root = {'children': {}, 'value': 0}
+    for stack, count in stacks.items():
+        root['value'] += count
+        node = root
+        for frame in stack.split(';'):
+            node = node['children'].setdefault(frame, {'children': {}, 'value': 0})
+            node['value'] += count
+
+    total = root['value'] or 1
+    rects, depth = [], 0
+    pending = [(root, 0.0, -1, '')]
+    while pending:
+        node, x, level, name = pending.pop()
+        if level >= 0:
+            w = node['value'] / total * width
+            if w < 0.3:
+                continue
+            rects.append((name, x, level, w, node['value']))
+            depth = max(depth, level + 1)
+        child_x = x
+        for child_name, child in sorted(node['children'].items()):
+            pending.append((child, child_x, level + 1, child_name))
+            child_x += child['value'] / total * width
+
+    height = (depth + 2) * row_height
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="monospace" font-size="11">',
+        f'<text x="4" y="{row_height - 4}">{escape(title)} ({root["value"]} samples)</text>',
+    ]
+    for name, x, level, w, value in rects:
+        y = height - (level + 1) * row_height
+        hue = zlib.crc32(name.encode()) % 60
+        label = escape(name)
+        parts.append(
+            f'<g><title>{label} ({value} samples, {value / total:.1%})</title>'
+            f'<rect x="{x:.2f}" y="{y}" width="{w:.2f}" height="{row_height - 1}" '
+            f'fill="hsl({hue},80%,60%)"/>'
+        )
+        if w > 40:
+            chars = int(w / 7)
+            text = escape(name if len(name) <= chars else name[:chars - 2] + '..')
+            parts.append(f'<text x="{x + 3:.2f}" y="{y + row_height - 4}">{text}</text>')
+        parts.append('</g>')
+    parts.append('</svg>')
+    return '\n'.join(parts)
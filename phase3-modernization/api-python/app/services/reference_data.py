@@ -0,0 +1,36 @@
+"""
+Reference data (countries, states, education levels, ...) for form choices.
+
+These tables are read on most form pages and change only through the admin
+pages, so their ``(id, name)`` pairs are kept in the shared cache and
+invalidated by the table's generation.
+"""
+from flask import current_app
+
+from ..extensions import db, shared_cache
+from .tracing import span
+
+# model name -> (label column, sort by label)
+LABELS = {
+    'Country': ('country_name', True),
+    'State': ('state_name', True),
+    'EducationLevel': ('education_level_name', False),
+    'ExperienceLevel': ('experience_level_name', False),
+    'JobType': ('job_type_name', False),
+}
+
+
+def choices(model):
+    """Return ``((id, name), ...)`` for a reference model."""
+    column_name, by_label = LABELS[model.__name__]
+    generation = shared_cache.generation((model.__tablename__,))
+    key = ('reference', model.__tablename__)
+    with span('cache.lookup', cache='reference', table=model.__tablename__) as current:
+        rows = shared_cache.get(key, generation)
+        current.set('cache.hit', 'shared' if rows is not None else 'miss')
+    if rows is None:
+        label = getattr(model, column_name)
+        query = db.session.query(model.id, label).order_by(label if by_label else model.id)
+        rows = tuple((row_id, name) for row_id, name in query)
+        shared_cache.set(key, rows, generation, current_app.config['SHARED_CACHE_TTL'])
+    return rows
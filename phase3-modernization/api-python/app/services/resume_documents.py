@@ -0,0 +1,215 @@
+"""
+Resume document storage and text extraction.
+
+Uploaded files are streamed in fixed-size chunks into a temporary file while
+being hashed, then renamed into content-addressed storage
+(``<root>/ab/cd/<sha256>.<ext>``), so identical uploads are stored once and a
+file is never held in memory whole. Text is extracted by the
+``resumes.extract_text`` background task - CPU-bound PDF parsing belongs in a
+process-pool worker (``flask worker --pool process``) - and written to
+``Resume.resume_text`` for search. The extracted text is also kept next to
+the document, so a file that was uploaded before is not parsed again.
+"""
+import hashlib
+import os
+import tempfile
+import zipfile
+from xml.etree import ElementTree
+
+from flask import abort, current_app, send_file
+
+from ..extensions import db
+from ..models import Resume
+from .tasks import task
+
+try:
+    import pypdf
+except ImportError:  # pragma: no cover - optional dependency
+    pypdf = None
+
+CHUNK_SIZE = 64 * 1024
+_WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+class DocumentTooLarge(ValueError):
+    """The upload exceeded the configured size limit."""
+
+
+class ExtractionError(ValueError):
+    """The document could not be read as its declared type."""
+
+
+def storage_root(app=None):
+    app = app or current_app
+    return app.config.get('RESUME_STORAGE_DIR') or os.path.join(app.instance_path, 'resumes')
+
+
+def document_path(root, digest, extension):
+    """Return the content-addressed path of a stored document."""
+    return os.path.join(root, digest[:2], digest[2:4], f'{digest}.{extension}')
+
+
+def extracted_text_path(root, digest):
+    """Return the path of the cached text extracted from a stored document."""
+    return os.path.join(root, digest[:2], digest[2:4], f'{digest}.extracted.txt')
+
+
+def store_upload(stream, root, extension, max_bytes):
+    """Stream ``stream`` into storage and return ``(sha256, size)``.
+
+    The file is written under its hash; if that hash is already stored the
+    new copy is discarded.
+    """
+    os.makedirs(root, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=root, suffix='.upload')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise DocumentTooLarge(f'Document is larger than {max_bytes // (1024 * 1024)} MB')
+                digest.update(chunk)
+                f.write(chunk)
+        hexdigest = digest.hexdigest()
+        target = document_path(root, hexdigest, extension)
+        if os.path.exists(target):
+            os.unlink(temp_path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(temp_path, target)
+        return hexdigest, size
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+def extract_text(path):
+    """Return the plain text of a PDF, DOCX or TXT document."""
+    extension = path.rsplit('.', 1)[-1].lower()
+    try:
+        if extension == 'txt':
+            with open(path, 'rb') as f:
+                return f.read().decode('utf-8', errors='replace')
+        if extension == 'docx':
+            return _docx_text(path)
+        if extension == 'pdf':
+            if pypdf is None:
+                raise ExtractionError('PDF support requires the pypdf package')
+            reader = pypdf.PdfReader(path)
+            return '\n'.join(page.extract_text() or '' for page in reader.pages)
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+        raise ExtractionError(f'Could not read {extension.upper()} document: {e}') from e
+    except Exception as e:
+        if pypdf is not None and isinstance(e, pypdf.errors.PdfReadError):
+            raise ExtractionError(f'Could not read PDF document: {e}') from e
+        raise
+    raise ExtractionError(f'Unsupported document type: {extension}')
+
+
+def _docx_text(path):
+    """Collect paragraph text from word/document.xml without loading it whole."""
+    paragraphs, current = [], []
+    with zipfile.ZipFile(path) as archive, archive.open('word/document.xml') as xml:
+        for event, element in ElementTree.iterparse(xml, events=('end',)):
+            if element.tag == _WORD_NS + 't':
+                current.append(element.text or '')
+            elif element.tag == _WORD_NS + 'tab':
+                current.append('\t')
+            elif element.tag == _WORD_NS + 'p':
+                paragraphs.append(''.join(current))
+                current = []
+                element.clear()
+    return '\n'.join(paragraphs)
+
+
+def _fit_filename(name, length):
+    """Shorten ``name`` to ``length`` characters, keeping its extension."""
+    if len(name) <= length:
+        return name
+    stem, dot, extension = name.rpartition('.')
+    if not dot or len(extension) + 1 >= length:
+        return name[:length]
+    return stem[:length - len(extension) - 1] + dot + extension
+
+
+def attach_document(resume, file_storage):
+    """Store an uploaded file for ``resume`` and arrange for its text to be extracted.
+
+    Adds the resume (and, if needed, the extraction task) to the session; the
+    caller commits.
+    """
+    config = current_app.config
+    extension = file_storage.filename.rsplit('.', 1)[-1].lower()
+    digest, size = store_upload(file_storage.stream, storage_root(), extension,
+                                config['RESUME_MAX_UPLOAD_BYTES'])
+    resume.document_sha256 = digest
+    resume.document_filename = _fit_filename(os.path.basename(file_storage.filename), 255)
+
+    cached = _read_extracted(digest)
+    if cached is not None:
+        resume.resume_text = cached
+        resume.document_status = 'ready'
+    else:
+        resume.document_status = 'processing'
+        db.session.add(resume)
+        db.session.flush()
+        extract_resume_text.delay(resume_id=resume.id, sha256=digest, extension=extension)
+    return digest, size
+
+
+def send_document(resume):
+    """Send a resume's stored document under its original file name."""
+    if not resume.document_sha256:
+        abort(404)
+    extension = resume.document_filename.rsplit('.', 1)[-1].lower()
+    path = document_path(storage_root(), resume.document_sha256, extension)
+    if not os.path.isfile(path):
+        abort(404)
+    return send_file(path, as_attachment=True, download_name=resume.document_filename)
+
+
+def _extraction_failed(resume_id, sha256, extension):
+    """Stop showing a document as processing once its extraction gave up."""
+    resume = db.session.get(Resume, resume_id)
+    if resume is not None and resume.document_sha256 == sha256 and resume.document_status == 'processing':
+        resume.document_status = 'failed'
+
+
+@task(name='resumes.extract_text', max_attempts=3, on_failure=_extraction_failed)
+def extract_resume_text(resume_id, sha256, extension):
+    """Fill ``Resume.resume_text`` from the stored document."""
+    resume = db.session.get(Resume, resume_id)
+    if resume is None or resume.document_sha256 != sha256:
+        return  # deleted, or replaced by a newer upload
+    root = storage_root()
+    text = _read_extracted(sha256)
+    if text is None:
+        try:
+            text = extract_text(document_path(root, sha256, extension))
+        except (ExtractionError, FileNotFoundError) as e:
+            # Retrying won't make the document readable (or reappear)
+            current_app.logger.warning(f'Resume {resume_id} document could not be read: {e}')
+            resume.document_status = 'failed'
+            return
+        text = text.strip()[:current_app.config['RESUME_TEXT_MAX_CHARS']]
+        cache_path = extracted_text_path(root, sha256)
+        temp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_path, cache_path)
+    resume.resume_text = text
+    resume.document_status = 'ready'
+
+
+def _read_extracted(digest):
+    try:
+        with open(extracted_text_path(storage_root(), digest), encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
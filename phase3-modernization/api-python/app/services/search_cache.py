@@ -0,0 +1,164 @@
+"""
+Result cache for job search.
+
+Most search traffic repeats a few hundred queries, so the ordered ids of the
+first ``SEARCH_CACHE_MAX_IDS`` matches of each normalized query are kept per
+worker together with the total count. A cached page costs one primary-key
+lookup for its 10 postings instead of the filtered, sorted scan plus count.
+
+Entries are evicted least-recently-used beyond ``SEARCH_CACHE_SIZE`` and
+expire after ``SEARCH_CACHE_TTL`` seconds. Every committed write to
+``job_postings`` in this worker - ORM flushes as well as bulk ``UPDATE`` /
+``DELETE`` statements - bumps a catalog generation, and entries computed
+under an older generation are discarded.
+
+With the shared cache enabled, results missing from this worker's LRU are
+looked up in (and stored to) the shared tier, and the catalog generation is
+the shared ``job_postings`` generation, so a write in any worker invalidates
+every worker's entries. Otherwise writes made by other processes are picked
+up when the TTL runs out.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy import event
+
+from .db_routing import RoutingSession
+from .tracing import span
+
+TRACKED_TABLES = frozenset({'job_postings'})
+
+
+class CachedPagination(Pagination):
+    """Pagination over a cached, ordered id list."""
+
+    def _query_items(self):
+        model = self._query_args['model']
+        ids = self._query_args['ids'][self._query_offset:self._query_offset + self.per_page]
+        if not ids:
+            return []
+        rows = {row.id: row for row in model.query.filter(model.id.in_(ids))}
+        return [rows[i] for i in ids if i in rows]
+
+    def _query_count(self):
+        return self._query_args['total']
+
+
+class _Entry:
+    __slots__ = ('ids', 'total', 'generation', 'expires')
+
+    def __init__(self, ids, total, generation, expires):
+        self.ids = ids
+        self.total = total
+        self.generation = generation
+        self.expires = expires
+
+
+class SearchCache:
+    """Per-worker LRU of search result ids, invalidated by catalog generation."""
+
+    def __init__(self, shared=None):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._shared = shared
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._listening = False
+
+    def init_app(self, app):
+        if self._listening:
+            return
+        event.listen(RoutingSession, 'after_flush', self._collect_flush)
+        event.listen(RoutingSession, 'do_orm_execute', self._collect_statement)
+        event.listen(RoutingSession, 'after_commit', self._apply_writes)
+        event.listen(RoutingSession, 'after_rollback', self._discard_writes)
+        self._listening = True
+
+    def paginate(self, key, query, page, per_page=10):
+        """Return a pagination of ``query`` (which must be ordered), cached under ``key``."""
+        config = current_app.config
+        max_ids = config['SEARCH_CACHE_MAX_IDS']
+        if not config['SEARCH_CACHE_SIZE'] or page < 1 or page * per_page > max_ids:
+            return query.paginate(page=page, per_page=per_page)
+
+        model = query.column_descriptions[0]['entity']
+        shared = self._shared if self._shared is not None and self._shared.enabled else None
+        now = time.monotonic()
+        cached = None
+        with span('cache.lookup', cache='search') as current:
+            with self._lock:
+                generation = shared.generation(TRACKED_TABLES) if shared else self.generation
+                entry = self._entries.get(key)
+                if entry is not None and entry.generation == generation and entry.expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                else:
+                    entry = None
+                    self.misses += 1
+            if entry is None and shared:
+                cached = shared.get(('search',) + key, generation)
+            current.set('cache.hit', 'local' if entry is not None else 'shared' if cached is not None else 'miss')
+
+        if entry is None:
+            ttl = config['SEARCH_CACHE_TTL']
+            if cached is not None:
+                total, ids = cached[0], cached[1:]
+            else:
+                ids = tuple(row_id for row_id, in query.with_entities(model.id).limit(max_ids))
+                total = len(ids) if len(ids) < max_ids else query.order_by(None).count()
+                if shared:
+                    shared.set(('search',) + key, (total,) + ids, generation, ttl)
+            entry = _Entry(ids, total, generation, now + ttl)
+            with self._lock:
+                # A write committed while the query ran leaves the entry stale
+                if generation == (shared.generation(TRACKED_TABLES) if shared else self.generation):
+                    self._entries[key] = entry
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > config['SEARCH_CACHE_SIZE']:
+                        self._entries.popitem(last=False)
+
+        return CachedPagination(page=page, per_page=per_page, model=model, ids=entry.ids, total=entry.total)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    # Write tracking
+
+    def _collect_flush(self, session, flush_context):
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            if getattr(obj, '__tablename__', None) in TRACKED_TABLES:
+                session.info['search_cache_dirty'] = True
+                return
+
+    def _collect_statement(self, orm_execute_state):
+        if orm_execute_state.is_select:
+            return
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if getattr(table, 'name', None) in TRACKED_TABLES:
+            orm_execute_state.session.info['search_cache_dirty'] = True
+
+    def _apply_writes(self, session):
+        if session.info.pop('search_cache_dirty', False):
+            with self._lock:
+                self.generation += 1
+
+    def _discard_writes(self, session):
+        session.info.pop('search_cache_dirty', None)
+
+    def snapshot(self):
+        """Return entry count, generation and hit ratio."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'generation': self.generation,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,428 @@
+"""
+Production serving: ``flask server start`` runs the preloaded application
+under gunicorn.
+
+The app is created once by the ``flask`` command and the master forks
+workers from it (``preload_app``), freezing the garbage collector first so
+the workers share its memory copy-on-write. Unless configured, the number
+of workers (``sync``) or threads per worker (``threaded``) is sized from the
+CPU count and the share of request time spent waiting on the database: a
+worker blocked on a query leaves its core idle, so ``cpus / (1 - ratio)``
+requests in flight keep the cores busy. ``DbTimeMeter`` measures that ratio
+in every worker, and each worker adds its measurement to
+``instance/serve_stats.json`` when it exits, so the next start (and every
+reload) is sized from real traffic.
+
+Workers are recycled after ``SERVE_MAX_REQUESTS`` requests, each with its
+own jitter so they don't all restart at once, which contains slow leaks.
+Every ``MEMORY_REPORT_REQUESTS`` requests and on exit a worker logs its
+memory (RSS, and proportional/unique set sizes, which show how much of the
+preloaded heap is still shared); ``flask server status`` prints the same
+for every worker of a running server.
+"""
+import gc
+import json
+import math
+import os
+import signal
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .startup import freeze_for_fork
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+WORKER_CLASSES = {'sync': 'sync', 'threaded': 'gthread'}
+# Above this the database is the bottleneck and more concurrency only queues
+WAIT_RATIO_CAP = 0.875
+DEFAULT_WAIT_RATIO = 0.5
+# Measurements older than this much request time are phased out
+STATS_WINDOW_SECONDS = 6 * 3600
+# Fewer measured requests than this are too noisy to size from
+MIN_MEASURED_REQUESTS = 100
+MEMORY_REPORT_REQUESTS = 500
+
+
+class DbTimeMeter:
+    """Measures how much of each request's wall time is spent in database calls."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.requests = 0
+        self.request_seconds = 0.0
+        self.db_seconds = 0.0
+        self._listening = False
+
+    def init_app(self, app):
+        app.before_request(self._start_request)
+        app.teardown_request(self._end_request)
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self._before_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_execute)
+            self._listening = True
+
+    def _start_request(self):
+        self._local.started = time.perf_counter()
+        self._local.db_seconds = 0.0
+
+    def _end_request(self, exc):
+        started = getattr(self._local, 'started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        self._local.started = None
+        with self._lock:
+            self.requests += 1
+            self.request_seconds += elapsed
+            self.db_seconds += min(self._local.db_seconds, elapsed)
+
+    def request_db_seconds(self):
+        """Database time of the current (or last) request of this thread."""
+        return getattr(self._local, 'db_seconds', 0.0)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self._local.query_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if getattr(self._local, 'started', None) is not None:
+            self._local.db_seconds += time.perf_counter() - self._local.query_started
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'request_seconds': self.request_seconds,
+                'db_seconds': self.db_seconds,
+                'ratio': self.db_seconds / self.request_seconds if self.request_seconds else None,
+            }
+
+
+def cpu_count():
+    """CPUs this process may run on (respects container CPU sets)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def recommend(cpus, db_wait_ratio, worker_class='sync'):
+    """Return ``(workers, threads)`` for the given CPU count and DB wait ratio."""
+    ratio = min(max(db_wait_ratio, 0.0), WAIT_RATIO_CAP)
+    concurrency = math.ceil(cpus / (1 - ratio))
+    if worker_class == 'threaded':
+        return cpus, max(2, math.ceil(concurrency / cpus))
+    return max(2, concurrency), 1
+
+
+# Measurements shared between runs
+
+def stats_path(app):
+    return os.path.join(app.instance_path, 'serve_stats.json')
+
+
+def load_measured_ratio(path):
+    """Return the DB wait ratio measured by earlier workers, or ``None``."""
+    try:
+        with open(path) as f:
+            stats = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if stats.get('requests', 0) < MIN_MEASURED_REQUESTS or not stats.get('request_seconds'):
+        return None
+    return stats['db_seconds'] / stats['request_seconds']
+
+
+def save_measurement(path, requests, request_seconds, db_seconds):
+    """Add one worker's measurement to the stats file, phasing out old data."""
+    if not request_seconds:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f'{path}.lock', 'a') as lock:
+        if fcntl is not None:
+            fcntl.lockf(lock, fcntl.LOCK_EX)
+        try:
+            with open(path) as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            stats = {'requests': 0, 'request_seconds': 0.0, 'db_seconds': 0.0}
+        old_seconds = stats['request_seconds']
+        if not old_seconds:
+            # Nothing to scale: start over from this measurement
+            stats = {'requests': 0, 'request_seconds': 0.0, 'db_seconds': 0.0}
+        elif old_seconds + request_seconds > STATS_WINDOW_SECONDS:
+            keep = max(0.0, STATS_WINDOW_SECONDS - request_seconds) / old_seconds
+            stats = {name: value * keep for name, value in stats.items()}
+        stats['requests'] += requests
+        stats['request_seconds'] += request_seconds
+        stats['db_seconds'] += db_seconds
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(stats, f)
+        os.replace(temp_path, path)
+
+
+# Memory
+
+def memory_usage(pid='self'):
+    """Return ``{'rss', 'pss', 'uss'}`` in bytes for a process, or ``None``.
+
+    PSS and USS come from ``/proc/<pid>/smaps_rollup`` (Linux); elsewhere only
+    what is available is filled in.
+    """
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty'):
+                    fields[name] = int(value.split()[0]) * 1024
+    except OSError:
+        if pid != 'self':
+            return None
+        try:
+            import resource
+        except ImportError:  # pragma: no cover - Windows
+            return None
+        # Peak rather than current RSS, in KiB on Linux
+        return {'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, 'pss': None, 'uss': None}
+    return {
+        'rss': fields.get('Rss'),
+        'pss': fields.get('Pss'),
+        'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+
+def format_memory(usage):
+    if usage is None:
+        return 'memory unavailable'
+    return ', '.join(f'{name} {value / (1024 * 1024):.1f} MB'
+                     for name, value in usage.items() if value is not None)
+
+
+def worker_pids(master_pid):
+    """Return the pids of a gunicorn master's worker processes (Linux)."""
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; the ppid follows the ')'
+                parent = int(f.read().rpartition(')')[2].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if parent == master_pid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def read_pid(pidfile):
+    try:
+        with open(pidfile) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def reload_server(pidfile, code=False, timeout=60):
+    """Gracefully reload a running server.
+
+    Without ``code``, the master restarts its workers (SIGHUP), sizing them
+    again from the latest measurements, but not new code since the app is
+    preloaded. With
+    ``code``, a new master is started from the current code (SIGUSR2); once
+    its workers are up, the old master is stopped gracefully (SIGTERM), so no
+    request is dropped. Returns the pid of the master now serving.
+    """
+    old_pid = read_pid(pidfile)
+    if old_pid is None or not _alive(old_pid):
+        raise RuntimeError(f'No running server found in {pidfile}')
+    if not code:
+        os.kill(old_pid, signal.SIGHUP)
+        return old_pid
+
+    # The new master writes "<pidfile>.2" and takes over the pidfile once
+    # the old master is gone
+    os.kill(old_pid, signal.SIGUSR2)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        new_pid = read_pid(f'{pidfile}.2')
+        if new_pid and _alive(new_pid) and worker_pids(new_pid):
+            os.kill(old_pid, signal.SIGTERM)
+            return new_pid
+        time.sleep(0.5)
+    raise RuntimeError('The new server did not start its workers in time; the old one is still serving')
+
+
+# gunicorn integration
+
+def _dispose_engines(app):
+    from ..extensions import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def _log_memory(worker, note):
+    worker.log.info(f'Worker {worker.pid} {note}: {format_memory(memory_usage())}')
+
+
+def pre_fork(server, worker):
+    """Freeze the preloaded heap right before each fork."""
+    freeze_for_fork()
+
+
+def post_fork(app, server, worker):
+    """Re-enable garbage collection and drop pooled connections inherited from the master."""
+    gc.enable()
+    _dispose_engines(app)
+
+
+def prune_metrics(server):
+    """Fold the metrics files left behind by workers that crashed."""
+    from ..extensions import metrics
+
+    try:
+        pruned = metrics.prune()
+    except OSError as e:
+        server.log.warning(f'Could not prune metrics of stopped workers: {e}')
+    else:
+        if pruned:
+            server.log.info(f'Folded the metrics of {pruned} stopped workers')
+
+
+def post_request(worker, req, environ, resp):
+    worker.requests_served = getattr(worker, 'requests_served', 0) + 1
+    if worker.requests_served % MEMORY_REPORT_REQUESTS == 0:
+        _log_memory(worker, f'after {worker.requests_served} requests')
+
+
+def worker_exit(app, server, worker):
+    """Log the worker's memory, save its DB wait measurement, flush its write-behind buffers and retire its metrics."""
+    from ..extensions import db_time, metrics
+    from .write_behind import stop_all
+
+    _log_memory(worker, f'exiting after {getattr(worker, "requests_served", 0)} requests')
+    stats = db_time.snapshot()
+    try:
+        save_measurement(stats_path(app), stats['requests'], stats['request_seconds'], stats['db_seconds'])
+    except Exception as e:
+        # Never let a bad measurement break the worker's shutdown
+        worker.log.warning(f'Could not save DB wait measurement: {e}')
+    stop_all(worker.log)
+    try:
+        metrics.retire()
+    except OSError as e:
+        worker.log.warning(f'Could not retire metrics: {e}')
+
+
+def sizing(app, worker_class=None, workers=None, threads=None, db_wait_ratio=None):
+    """Resolve the worker class, counts and the ratio they are based on.
+
+    Explicit arguments win over ``SERVE_*`` settings, which win over the
+    measured ratio. Returns ``(worker_class, workers, threads, ratio, source)``.
+    """
+    config = app.config
+    worker_class = worker_class or config['SERVE_WORKER_CLASS']
+    if worker_class not in WORKER_CLASSES:
+        raise ValueError(f'SERVE_WORKER_CLASS must be one of {", ".join(WORKER_CLASSES)}')
+    if db_wait_ratio is None:
+        db_wait_ratio = config['SERVE_DB_WAIT_RATIO']
+    if db_wait_ratio is not None:
+        source = 'configured'
+    else:
+        db_wait_ratio = load_measured_ratio(stats_path(app))
+        source = 'measured'
+        if db_wait_ratio is None:
+            db_wait_ratio, source = DEFAULT_WAIT_RATIO, 'default'
+    auto_workers, auto_threads = recommend(cpu_count(), db_wait_ratio, worker_class)
+    workers = workers or config['SERVE_WORKERS'] or auto_workers
+    threads = threads or config['SERVE_THREADS'] or auto_threads
+    if worker_class == 'sync':
+        threads = 1
+    return worker_class, workers, threads, db_wait_ratio, source
+
+
+def describe(worker_class, workers, threads):
+    if worker_class == 'threaded':
+        return f'{workers} threaded workers x {threads} threads'
+    return f'{workers} sync workers'
+
+
+def gunicorn_options(app, bind=None, worker_class=None, workers=None, threads=None, db_wait_ratio=None):
+    """Build the gunicorn settings (including hooks) for serving ``app``."""
+    config = app.config
+    worker_class, workers, threads, ratio, source = sizing(app, worker_class, workers, threads, db_wait_ratio)
+    pidfile = config['SERVE_PIDFILE'] or os.path.join(app.instance_path, 'serve.pid')
+    os.makedirs(os.path.dirname(os.path.abspath(pidfile)), exist_ok=True)
+
+    pool_limit = config.get('DB_POOL_SIZE', 5) + config.get('DB_MAX_OVERFLOW', 10)
+    if threads > pool_limit:
+        app.logger.warning(f'{threads} threads per worker but only {pool_limit} pooled database '
+                           'connections; raise DB_POOL_SIZE or DB_MAX_OVERFLOW')
+
+    def log_sizing(server):
+        server.log.info(f'Serving with {describe(worker_class, workers, threads)} '
+                        f'({cpu_count()} CPUs, DB wait ratio {ratio:.2f} {source})')
+
+    def when_ready(server):
+        server.log.info(app.extensions['startup'].report())
+        log_sizing(server)
+        prune_metrics(server)
+
+    return {
+        'bind': bind or config['SERVE_BIND'],
+        'worker_class': WORKER_CLASSES[worker_class],
+        'workers': workers,
+        'threads': threads,
+        'preload_app': True,
+        'pidfile': pidfile,
+        'max_requests': config['SERVE_MAX_REQUESTS'],
+        'max_requests_jitter': config['SERVE_MAX_REQUESTS_JITTER'],
+        'timeout': config['SERVE_TIMEOUT'],
+        'graceful_timeout': config['SERVE_TIMEOUT'],
+        'when_ready': when_ready,
+        'on_reload': log_sizing,
+        'pre_fork': pre_fork,
+        'post_fork': lambda server, worker: post_fork(app, server, worker),
+        'post_request': post_request,
+        'worker_exit': lambda server, worker: worker_exit(app, server, worker),
+    }
+
+
+def application(app, **options):
+    """Return the gunicorn application serving the preloaded ``app``."""
+    from gunicorn.app.base import BaseApplication
+
+    class PreloadedApplication(BaseApplication):
+        def load_config(self):
+            # Also called on SIGHUP: size the new workers from the latest measurements
+            for name, value in gunicorn_options(app, **options).items():
+                self.cfg.set(name, value)
+
+        def load(self):
+            return app
+
+    return PreloadedApplication()
+
+
+def run(app, **options):
+    """Serve ``app`` with gunicorn until the master exits."""
+    application(app, **options).run()
@@ -0,0 +1,306 @@
+"""
+Cache tier shared by all worker processes on a host.
+
+In-process caches are duplicated in every worker and warmed separately, so
+this tier keeps one copy in a memory-mapped file (``SHARED_CACHE_PATH``,
+by default ``instance/shared_cache.bin``) that every worker maps. The file is
+a header followed by ``SHARED_CACHE_SLOTS`` fixed-size slots of
+``SHARED_CACHE_SLOT_SIZE`` bytes:
+
+* A key is hashed to a 16-byte digest that picks a window of ``PROBES``
+  slots. A value goes in the slot already holding its key, an empty or
+  expired one, or else the one expiring soonest.
+* Values are serialized compactly: tuples of small non-negative ints (result
+  id lists) as a packed ``array('I')``, anything else ``marshal`` supports
+  (reference data tuples, rendered fragments as ``str``) with ``marshal``.
+  Values larger than a slot are not cached.
+* Writers lock the slot's byte range with ``fcntl.lockf`` and bump the
+  slot's sequence number before and after writing; readers take no lock and
+  retry if the sequence number was odd or changed while they copied.
+
+Invalidation is by generation: the header holds a counter per table
+(hashed into ``GENERATION_COUNTERS`` buckets) that every worker bumps after
+committing writes to that table. Callers read the generation of the tables
+a value depends on before computing it and pass it to ``set`` and ``get``;
+an entry stored under another generation is a miss in every worker.
+
+Requires ``fcntl`` (POSIX); elsewhere, and with ``SHARED_CACHE_SLOTS = 0``,
+the tier is disabled and every lookup misses.
+"""
+import hashlib
+import marshal
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+
+from sqlalchemy import event
+
+from .db_routing import RoutingSession
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+MAGIC = b'JSCACHE1'
+FORMAT_VERSION = 1
+PROBES = 4
+GENERATION_COUNTERS = 256
+# magic, format version, interpreter version (marshal output is version
+# specific), slot count, slot size, epoch
+_HEADER = struct.Struct('<8sIIIIQ')
+_COUNTERS_OFFSET = 64
+_SLOTS_OFFSET = 4096
+# sequence, key digest, expiry (epoch seconds), generation, payload length
+_SLOT = struct.Struct('<I16sdQI')
+_SEQUENCE = struct.Struct('<I')
+_COUNTER = struct.Struct('<Q')
+_EPOCH_OFFSET = _HEADER.size - _COUNTER.size
+_INTERPRETER = sys.hexversion >> 16
+_MAX_ID = (1 << 32) - 1
+
+
+def encode(value):
+    """Serialize a cache value."""
+    if type(value) is tuple and value and all(type(v) is int and 0 <= v <= _MAX_ID for v in value):
+        return b'I' + array('I', value).tobytes()
+    return b'M' + marshal.dumps(value)
+
+
+def decode(data):
+    """Inverse of ``encode``."""
+    if data[:1] == b'I':
+        ids = array('I')
+        ids.frombytes(data[1:])
+        return tuple(ids)
+    return marshal.loads(data[1:])
+
+
+def _digest(key):
+    return hashlib.blake2b(marshal.dumps(key), digest_size=16).digest()
+
+
+def _counter_offset(table):
+    return _COUNTERS_OFFSET + (zlib.crc32(table.encode()) % GENERATION_COUNTERS) * _COUNTER.size
+
+
+class SharedCache:
+    """Slot-based cache in a memory-mapped file shared between processes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._mmap = None
+        self._fd = None
+        self.slots = 0
+        self.slot_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.oversize = 0
+        self._listening = False
+
+    def init_app(self, app):
+        config = app.config
+        self.close()
+        if config['SHARED_CACHE_SLOTS'] > 0:
+            if fcntl is None:
+                app.logger.warning('Shared cache disabled: fcntl is not available on this platform')
+            else:
+                path = config['SHARED_CACHE_PATH'] or os.path.join(app.instance_path, 'shared_cache.bin')
+                self.open(path, config['SHARED_CACHE_SLOTS'], config['SHARED_CACHE_SLOT_SIZE'])
+        if not self._listening:
+            event.listen(RoutingSession, 'after_flush', self._collect_flush)
+            event.listen(RoutingSession, 'do_orm_execute', self._collect_statement)
+            event.listen(RoutingSession, 'after_commit', self._apply_writes)
+            event.listen(RoutingSession, 'after_rollback', self._discard_writes)
+            self._listening = True
+
+    @property
+    def enabled(self):
+        return self._mmap is not None
+
+    def open(self, path, slots, slot_size):
+        """Map the cache file, creating it (or replacing one of another layout)."""
+        self.close()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        size = _SLOTS_OFFSET + slots * slot_size
+        expected = (MAGIC, FORMAT_VERSION, _INTERPRETER, slots, slot_size)
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.lockf(fd, fcntl.LOCK_EX, _SLOTS_OFFSET, 0)
+            if os.fstat(fd).st_ino != os.stat(path).st_ino:
+                os.close(fd)  # replaced by another process while we waited
+                continue
+            header = os.pread(fd, _HEADER.size, 0)
+            if len(header) == _HEADER.size and _HEADER.unpack(header)[:5] == expected \
+                    and os.fstat(fd).st_size == size:
+                break
+            # Workers still running an old release keep their mapping of the
+            # old file; the new one replaces it atomically.
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.truncate(size)
+                f.write(_HEADER.pack(*expected, 0))
+            os.replace(temp_path, path)
+            os.close(fd)
+        try:
+            self._mmap = mmap.mmap(fd, size)
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN, _SLOTS_OFFSET, 0)
+        self._fd = fd
+        self.slots = slots
+        self.slot_size = slot_size
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            os.close(self._fd)
+        self._mmap = self._fd = None
+
+    # Generations
+
+    def generation(self, tables=()):
+        """Return the combined generation of ``tables`` (0 when disabled)."""
+        mm = self._mmap
+        if mm is None:
+            return 0
+        total = _COUNTER.unpack_from(mm, _EPOCH_OFFSET)[0]
+        for table in tables:
+            total += _COUNTER.unpack_from(mm, _counter_offset(table))[0]
+        return total
+
+    def invalidate(self, *tables):
+        """Bump the generation of ``tables`` in every worker."""
+        for table in tables:
+            self._increment(_counter_offset(table))
+
+    def clear(self):
+        """Invalidate every entry."""
+        self._increment(_EPOCH_OFFSET)
+
+    def _increment(self, offset):
+        mm = self._mmap
+        if mm is None:
+            return
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, _COUNTER.size, offset)
+            try:
+                _COUNTER.pack_into(mm, offset, _COUNTER.unpack_from(mm, offset)[0] + 1)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, _COUNTER.size, offset)
+
+    # Entries
+
+    def _window(self, digest):
+        first = int.from_bytes(digest[:8], 'little') % self.slots
+        return [_SLOTS_OFFSET + ((first + i) % self.slots) * self.slot_size for i in range(PROBES)]
+
+    def get(self, key, generation, default=None):
+        """Return the value stored under ``key`` for ``generation``, or ``default``."""
+        mm = self._mmap
+        if mm is None:
+            return default
+        digest = _digest(key)
+        now = time.time()
+        for offset in self._window(digest):
+            for _ in range(3):
+                sequence, slot_digest, expires, slot_generation, length = _SLOT.unpack_from(mm, offset)
+                if slot_digest != digest or sequence & 1:
+                    break
+                start = offset + _SLOT.size
+                payload = mm[start:start + length]
+                if _SEQUENCE.unpack_from(mm, offset)[0] != sequence:
+                    continue  # overwritten while copying
+                if expires < now or slot_generation != generation:
+                    break
+                self.hits += 1
+                return decode(payload)
+        self.misses += 1
+        return default
+
+    def set(self, key, value, generation, ttl):
+        """Store ``value`` under ``key``; return whether it fit in a slot."""
+        mm = self._mmap
+        if mm is None:
+            return False
+        payload = encode(value)
+        if len(payload) > self.slot_size - _SLOT.size:
+            self.oversize += 1
+            return False
+        digest = _digest(key)
+        now = time.time()
+
+        target, soonest = None, None
+        for offset in self._window(digest):
+            slot_digest, expires = _SLOT.unpack_from(mm, offset)[1:3]
+            if slot_digest == digest or expires < now:
+                target = offset
+                break
+            if soonest is None or expires < soonest[0]:
+                soonest = (expires, offset)
+        if target is None:
+            target = soonest[1]
+
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self.slot_size, target)
+            try:
+                sequence = _SEQUENCE.unpack_from(mm, target)[0]
+                _SEQUENCE.pack_into(mm, target, sequence + 1)
+                start = target + _SLOT.size
+                mm[start:start + len(payload)] = payload
+                _SLOT.pack_into(mm, target, sequence + 1, digest, now + ttl, generation, len(payload))
+                _SEQUENCE.pack_into(mm, target, sequence + 2)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self.slot_size, target)
+        self.stores += 1
+        return True
+
+    # Write tracking
+
+    def _collect_flush(self, session, flush_context):
+        tables = session.info.setdefault('shared_cache_tables', set())
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            table = getattr(obj, '__tablename__', None)
+            if table:
+                tables.add(table)
+
+    def _collect_statement(self, orm_execute_state):
+        if orm_execute_state.is_select:
+            return
+        table = getattr(getattr(orm_execute_state.statement, 'table', None), 'name', None)
+        if table:
+            orm_execute_state.session.info.setdefault('shared_cache_tables', set()).add(table)
+
+    def _apply_writes(self, session):
+        tables = session.info.pop('shared_cache_tables', None)
+        if tables:
+            self.invalidate(*tables)
+
+    def _discard_writes(self, session):
+        session.info.pop('shared_cache_tables', None)
+
+    def snapshot(self):
+        """Return slot usage and this worker's hit counts."""
+        used = 0
+        if self._mmap is not None:
+            now = time.time()
+            for index in range(self.slots):
+                if _SLOT.unpack_from(self._mmap, _SLOTS_OFFSET + index * self.slot_size)[2] >= now:
+                    used += 1
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'slots': self.slots,
+            'slot_size': self.slot_size,
+            'used': used,
+            'hits': self.hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'oversize': self.oversize,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
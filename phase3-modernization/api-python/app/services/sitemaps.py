@@ -0,0 +1,176 @@
+"""
+Sitemaps of active job postings and company pages.
+
+``flask sitemap build`` writes, under ``SITEMAP_DIR``:
+
+* ``<source>-<n>.xml`` for every chunk of each source, listing the pages of
+  the rows whose id is in ``[n * SITEMAP_CHUNK_SIZE, (n + 1) * SITEMAP_CHUNK_SIZE)``
+  (so never more than the protocol's 50,000 URLs), with ``lastmod`` taken
+  from the row's ``updated_at``,
+* ``sitemap.xml``, the index of those files,
+* a gzip variant of each (``.gz``), and ``manifest.json``.
+
+Rows are streamed from a server-side cursor straight into the files, so
+memory use doesn't depend on the size of the catalog. Chunks are fixed id
+ranges so that a change only affects the chunk holding the row: each run
+first reads one ``(count, max(updated_at), sum(id))`` signature per chunk,
+and only rewrites chunks whose signature differs from the manifest's. Files
+are replaced atomically.
+
+``/sitemap.xml`` and ``/sitemaps/<file>`` serve the files from disk (the
+gzip variant when the client accepts it) without touching the database.
+"""
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+
+from flask import current_app, url_for
+from sqlalchemy import func, select
+
+INDEX_NAME = 'sitemap.xml'
+MANIFEST_NAME = 'manifest.json'
+NAMESPACE = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+FETCH_SIZE = 1000
+
+
+def _sources():
+    """source name -> (model, filter of the rows listed, endpoint of their page)."""
+    from ..models import Company, JobPosting
+
+    return {
+        'jobs': (JobPosting, JobPosting.is_active.is_(True), 'jobseeker.view_job'),
+        'companies': (Company, None, 'main.company'),
+    }
+
+
+def sitemap_dir(app):
+    return app.config['SITEMAP_DIR'] or os.path.join(app.instance_path, 'sitemaps')
+
+
+def _lastmod(value):
+    return value.replace(tzinfo=timezone.utc).isoformat(timespec='seconds') if value else None
+
+
+def _signatures(model, condition, chunk_size):
+    """chunk number -> [count, latest updated_at, sum of ids] of the listed rows."""
+    from ..extensions import db
+
+    chunk = (model.id // chunk_size).label('chunk')
+    statement = select(chunk, func.count(), func.max(model.updated_at), func.sum(model.id)).group_by(chunk)
+    if condition is not None:
+        statement = statement.where(condition)
+    return {int(number): [count, _lastmod(latest), int(total)]
+            for number, count, latest, total in db.session.execute(statement)}
+
+
+class _Writer:
+    """Writes a file and its gzip variant, replacing both when closed."""
+
+    def __init__(self, path):
+        self.path = path
+        self._plain = open(f'{path}.tmp', 'w', encoding='utf-8')
+        self._gzip = gzip.open(f'{path}.gz.tmp', 'wt', encoding='utf-8', compresslevel=9)
+
+    def write(self, text):
+        self._plain.write(text)
+        self._gzip.write(text)
+
+    def close(self):
+        self._plain.close()
+        self._gzip.close()
+        os.replace(f'{self.path}.gz.tmp', f'{self.path}.gz')
+        os.replace(f'{self.path}.tmp', self.path)
+
+    def discard(self):
+        self._plain.close()
+        self._gzip.close()
+        for path in (f'{self.path}.tmp', f'{self.path}.gz.tmp'):
+            os.remove(path)
+
+
+def _write_chunk(path, model, condition, endpoint, chunk_size, number):
+    from ..extensions import db
+
+    statement = select(model.id, model.updated_at)\
+        .where(model.id >= number * chunk_size, model.id < (number + 1) * chunk_size)\
+        .order_by(model.id)
+    if condition is not None:
+        statement = statement.where(condition)
+    writer = _Writer(path)
+    try:
+        writer.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{NAMESPACE}">\n')
+        rows = db.session.execute(statement.execution_options(stream_results=True, yield_per=FETCH_SIZE))
+        for row_id, updated_at in rows:
+            lastmod = _lastmod(updated_at)
+            writer.write(f'<url><loc>{escape(url_for(endpoint, id=row_id, _external=True))}</loc>'
+                         + (f'<lastmod>{lastmod}</lastmod>' if lastmod else '') + '</url>\n')
+        writer.write('</urlset>\n')
+    except BaseException:
+        writer.discard()
+        raise
+    writer.close()
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def build(full=False):
+    """Write the sitemaps that changed (all of them with ``full``).
+
+    Returns ``{'written': [...], 'removed': [...], 'unchanged': n}``.
+    Needs an app context; URLs are made absolute with ``SITEMAP_BASE_URL``.
+    """
+    app = current_app._get_current_object()
+    directory = sitemap_dir(app)
+    os.makedirs(directory, exist_ok=True)
+    chunk_size = app.config['SITEMAP_CHUNK_SIZE']
+    previous = {} if full else _read_manifest(directory)
+    if previous.get('chunk_size') != chunk_size or previous.get('base_url') != app.config['SITEMAP_BASE_URL']:
+        previous = {}
+    old_files = previous.get('files', {})
+    files = {}
+    report = {'written': [], 'removed': [], 'unchanged': 0}
+
+    with app.test_request_context(base_url=app.config['SITEMAP_BASE_URL']):
+        for source, (model, condition, endpoint) in _sources().items():
+            for number, signature in sorted(_signatures(model, condition, chunk_size).items()):
+                name = f'{source}-{number}.xml'
+                files[name] = signature
+                if old_files.get(name) == signature and os.path.isfile(os.path.join(directory, name)):
+                    report['unchanged'] += 1
+                    continue
+                _write_chunk(os.path.join(directory, name), model, condition, endpoint, chunk_size, number)
+                report['written'].append(name)
+
+        if report['written'] or set(files) != set(old_files) or not os.path.isfile(os.path.join(directory, INDEX_NAME)):
+            writer = _Writer(os.path.join(directory, INDEX_NAME))
+            writer.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{NAMESPACE}">\n')
+            for name, (_, lastmod, _) in files.items():
+                location = escape(url_for('main.sitemap_file', filename=name, _external=True))
+                writer.write(f'<sitemap><loc>{location}</loc>'
+                             + (f'<lastmod>{lastmod}</lastmod>' if lastmod else '') + '</sitemap>\n')
+            writer.write('</sitemapindex>\n')
+            writer.close()
+
+    for name in set(old_files) - set(files):
+        for path in (name, name + '.gz'):
+            try:
+                os.remove(os.path.join(directory, path))
+            except FileNotFoundError:
+                pass
+        report['removed'].append(name)
+
+    manifest = {'chunk_size': chunk_size, 'base_url': app.config['SITEMAP_BASE_URL'], 'files': files,
+                'built_at': datetime.utcnow().isoformat(timespec='seconds')}
+    temp_path = os.path.join(directory, MANIFEST_NAME + '.tmp')
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, os.path.join(directory, MANIFEST_NAME))
+    return report
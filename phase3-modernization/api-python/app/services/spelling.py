@@ -0,0 +1,255 @@
+"""
+Typo-tolerant search: misspelling correction and "did you mean" suggestions.
+
+Each search domain (``jobs``: active posting titles and descriptions,
+``resumes``: searchable resume titles and text) has a vocabulary of the words
+it contains with their frequencies. A ``SpellingIndex`` maps every word's
+padded character bigrams to word ids, bucketed by word length, so the
+candidates for a misspelled word are the words of similar length sharing
+enough bigrams with it (an edit changes at most three bigrams, so every word
+within the distance bound shares at least ``len(bigrams) - 3 * distance``).
+Only those few candidates are checked with a bounded Damerau-Levenshtein
+distance, which keeps a lookup around a millisecond even for large
+vocabularies, and common words skip the lookup entirely.
+
+Keywords containing words the domain has never seen are corrected before the
+search runs, so a typo costs no extra zero-result query; words it knows, even
+if only once, are searched as typed and only get a "did you mean" suggestion
+when a far more common word is one edit away.
+
+Vocabularies are built per worker by a background thread on first use and
+rebuilt every ``SPELLING_REBUILD_SECONDS``; until the first build finishes,
+searches run uncorrected.
+"""
+import re
+import threading
+import time
+from array import array
+from collections import Counter, namedtuple
+
+from flask import current_app
+
+# domain -> (model name, text columns, attribute limiting which rows count)
+DOMAINS = {
+    'jobs': ('JobPosting', ('title', 'description'), 'is_active'),
+    'resumes': ('Resume', ('job_title', 'resume_text'), 'is_searchable'),
+}
+MIN_WORD_LENGTH = 3
+MAX_WORD_LENGTH = 30
+# Words seen fewer times than this are never offered as corrections
+MIN_KNOWN_FREQUENCY = 2
+# A known word is only questioned if a neighbour is this many times as common
+DOMINANCE_RATIO = 50
+BUILD_BATCH_SIZE = 500
+_WORD_RE = re.compile(r'[^\W\d_]+')
+_TAG_RE = re.compile(r'<[^>]+>')
+
+Correction = namedtuple('Correction', 'keyword applied')
+
+
+def max_distance(word):
+    """Edit distance tolerated for a word of this length."""
+    if len(word) < 4:
+        return 0
+    return 1 if len(word) < 8 else 2
+
+
+def tokenize(text):
+    return _WORD_RE.findall(_TAG_RE.sub(' ', text or '').lower())
+
+
+def _bigrams(word):
+    padded = f'^{word}$'
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def edit_distance(a, b, limit):
+    """Damerau-Levenshtein (optimal string alignment) distance, or ``limit + 1`` if larger."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+
+class SpellingIndex:
+    """Bigram index over a word -> frequency vocabulary."""
+
+    def __init__(self, counts):
+        self.counts = counts
+        self.words = list(counts)
+        postings = {}
+        for word_id, word in enumerate(self.words):
+            for gram in _bigrams(word):
+                postings.setdefault((len(word), gram), []).append(word_id)
+        self._postings = {key: array('I', ids) for key, ids in postings.items()}
+        self.max_count = max(counts.values(), default=0)
+
+    def __len__(self):
+        return len(self.words)
+
+    def candidates(self, word, distance):
+        """Return ``(distance, -frequency, word)`` for vocabulary words within ``distance``."""
+        grams = _bigrams(word)
+        shared = Counter()
+        for length in range(len(word) - distance, len(word) + distance + 1):
+            for gram in grams:
+                ids = self._postings.get((length, gram))
+                if ids:
+                    shared.update(ids)
+        needed = len(grams) - 3 * distance
+        results = []
+        for word_id, count in shared.items():
+            if count < needed:
+                continue
+            candidate = self.words[word_id]
+            d = edit_distance(word, candidate, distance)
+            if 0 < d <= distance:
+                results.append((d, -self.counts[candidate], candidate))
+        return sorted(results)
+
+    def correct(self, word):
+        """Return the replacement for ``word`` and whether to apply it, or ``None``."""
+        distance = max_distance(word)
+        if not distance:
+            return None
+        frequency = self.counts.get(word, 0)
+        if frequency:
+            # Known word: only suggest a much more common neighbour one edit away
+            if frequency * DOMINANCE_RATIO > self.max_count:
+                return None
+            for d, negative_count, candidate in self.candidates(word, 1):
+                if -negative_count >= frequency * DOMINANCE_RATIO:
+                    return candidate, False
+            return None
+        candidates = [c for c in self.candidates(word, distance) if -c[1] >= MIN_KNOWN_FREQUENCY]
+        if candidates:
+            return candidates[0][2], True
+        return None
+
+
+class _DomainState:
+    def __init__(self):
+        self.index = None
+        self.built_at = 0.0
+        self.building = False
+
+
+class SpellChecker:
+    """Per-worker spelling indexes for the search domains."""
+
+    def __init__(self):
+        self._domains = {name: _DomainState() for name in DOMAINS}
+        self._lock = threading.Lock()
+
+    def suggest(self, domain, keyword):
+        """Return a ``Correction`` for ``keyword``, or ``None`` if it looks right.
+
+        ``applied`` is true when the keyword contains words the domain does
+        not know, meaning the search should use the corrected keyword; it
+        then only replaces those words. Otherwise ``keyword`` is a "did you
+        mean" suggestion.
+        """
+        index = self._current_index(domain)
+        if index is None or not keyword:
+            return None
+        replacements = []
+        for match in _WORD_RE.finditer(keyword):
+            word = match.group().lower()
+            if len(word) > MAX_WORD_LENGTH:
+                continue
+            result = index.correct(word)
+            if result is None:
+                continue
+            replacement, apply = result
+            if match.group().istitle():
+                replacement = replacement.title()
+            replacements.append((match, replacement, apply))
+        if not replacements:
+            return None
+        applied = any(apply for _, _, apply in replacements)
+        parts, last = [], 0
+        for match, replacement, apply in replacements:
+            if apply or not applied:
+                parts += [keyword[last:match.start()], replacement]
+                last = match.end()
+        parts.append(keyword[last:])
+        return Correction(''.join(parts), applied)
+
+    def _current_index(self, domain):
+        state = self._domains[domain]
+        with self._lock:
+            stale = time.monotonic() - state.built_at > current_app.config['SPELLING_REBUILD_SECONDS']
+            if (state.index is None or stale) and not state.building:
+                state.building = True
+                app = current_app._get_current_object()
+                threading.Thread(target=self._rebuild_in_background, args=(app, domain),
+                                 name=f'spelling-{domain}', daemon=True).start()
+        return state.index
+
+    def rebuild(self, domain):
+        """Rebuild one domain's vocabulary and index from the database."""
+        from .. import models
+        from ..extensions import db
+
+        model_name, column_names, flag_name = DOMAINS[domain]
+        model = getattr(models, model_name)
+        started = time.monotonic()
+        counts = Counter()
+        last_id = 0
+        while True:
+            rows = db.session.query(model.id, *(getattr(model, name) for name in column_names))\
+                .filter(model.id > last_id, getattr(model, flag_name).is_(True))\
+                .order_by(model.id).limit(BUILD_BATCH_SIZE).all()
+            if not rows:
+                break
+            for row in rows:
+                for text in row[1:]:
+                    counts.update(w for w in tokenize(text) if MIN_WORD_LENGTH <= len(w) <= MAX_WORD_LENGTH)
+            last_id = rows[-1][0]
+        index = SpellingIndex(dict(counts))
+
+        state = self._domains[domain]
+        with self._lock:
+            state.index = index
+            state.built_at = started
+            state.building = False
+        return index
+
+    def _rebuild_in_background(self, app, domain):
+        from ..extensions import db
+
+        with app.app_context():
+            try:
+                self.rebuild(domain)
+            except Exception:
+                app.logger.exception(f'Building the {domain} spelling index failed')
+                with self._lock:
+                    self._domains[domain].building = False
+                    self._domains[domain].built_at = time.monotonic()
+            finally:
+                db.session.remove()
+
+    def snapshot(self):
+        """Return vocabulary sizes and index ages."""
+        with self._lock:
+            return {
+                name: {
+                    'words': len(state.index) if state.index is not None else None,
+                    'age_seconds': time.monotonic() - state.built_at if state.index is not None else None,
+                }
+                for name, state in self._domains.items()
+            }
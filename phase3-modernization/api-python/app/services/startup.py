@@ -0,0 +1,67 @@
+"""
+Startup timing and pre-fork helpers.
+
+``app/__init__.py`` imports this module first so the time spent importing the
+application package can be measured, and ``create_app`` records each of its
+phases on a ``StartupTimer`` stored in ``app.extensions['startup']``.
+"""
+import gc
+import time
+from contextlib import contextmanager
+
+IMPORT_STARTED = time.perf_counter()
+_import_seconds = None
+
+
+def mark_imported():
+    """Record the end of the application package import."""
+    global _import_seconds
+    if _import_seconds is None:
+        _import_seconds = time.perf_counter() - IMPORT_STARTED
+
+
+class StartupTimer:
+    """Collects the duration of each application startup phase."""
+
+    def __init__(self):
+        self.phases = []
+        if _import_seconds is not None:
+            self.phases.append(('import', _import_seconds))
+
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block as the named phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def skip(self, name):
+        """Record a phase that was skipped (e.g. create_all in fast-start mode)."""
+        self.phases.append((name, None))
+
+    @property
+    def total(self):
+        """Total seconds across all timed phases."""
+        return sum(seconds for name, seconds in self.phases if seconds is not None)
+
+    def report(self):
+        """Return a one-line, human readable breakdown."""
+        parts = [
+            f'{name}=skipped' if seconds is None else f'{name}={seconds * 1000:.1f}ms'
+            for name, seconds in self.phases
+        ]
+        parts.append(f'total={self.total * 1000:.1f}ms')
+        return 'Startup: ' + ' '.join(parts)
+
+
+def freeze_for_fork():
+    """Move everything allocated so far out of the garbage collector's reach.
+
+    Called in a preloading master right before forking so that collections in
+    the workers do not touch (and therefore copy) the pages holding the
+    preloaded application.
+    """
+    gc.collect()
+    gc.freeze()
@@ -0,0 +1,272 @@
+"""
+Durable background task queue.
+
+Functions decorated with ``task`` can be queued from a view with
+``func.delay(**kwargs)``. The queued row is added to the current database
+session, so it is committed (or rolled back) together with the request's own
+changes. ``flask worker`` claims due tasks - highest priority first - and runs
+them in a thread or process pool, retrying failures with exponential backoff.
+
+Claims are made with a conditional ``UPDATE`` so several workers can share
+one queue, and tasks held by a worker that died are requeued after
+``TASK_VISIBILITY_TIMEOUT`` seconds (or failed, once out of attempts).
+"""
+import json
+import os
+import random
+import signal
+import socket
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from ..extensions import db
+from ..models import BackgroundTask
+
+_registry = {}
+
+MAX_BACKOFF_SECONDS = 3600
+RECLAIM_INTERVAL_SECONDS = 60
+
+
+class TaskSpec:
+    """A registered task function and its queueing defaults."""
+
+    def __init__(self, func, name, priority, max_attempts, backoff_seconds, on_failure=None):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.on_failure = on_failure
+
+
+def task(name=None, priority=0, max_attempts=5, backoff_seconds=10, on_failure=None):
+    """Decorator registering a function as a background task.
+
+    The function gains ``delay(**kwargs)`` to queue a call with its default
+    priority, and ``enqueue(kwargs, priority=None, countdown=0)`` for more
+    control. Arguments must be JSON serializable. ``on_failure`` is called
+    with the same arguments once the task has failed for good.
+    """
+    def decorator(f):
+        spec = TaskSpec(f, name or f'{f.__module__}.{f.__name__}', priority,
+                        max_attempts, backoff_seconds, on_failure)
+        _registry[spec.name] = spec
+
+        def enqueue_call(kwargs, priority=None, countdown=0):
+            return enqueue(spec.name, kwargs, priority=priority, countdown=countdown)
+
+        f.task_name = spec.name
+        f.enqueue = enqueue_call
+        f.delay = lambda **kwargs: enqueue_call(kwargs)
+        return f
+    return decorator
+
+
+def enqueue(name, kwargs=None, priority=None, countdown=0):
+    """Add a task to the current session; it is queued once the session commits."""
+    spec = _registry[name]
+    row = BackgroundTask(
+        name=name,
+        payload=json.dumps(kwargs or {}),
+        priority=spec.priority if priority is None else priority,
+        max_attempts=spec.max_attempts,
+        run_at=datetime.utcnow() + timedelta(seconds=countdown),
+    )
+    db.session.add(row)
+    return row
+
+
+def run_task(name, payload):
+    """Run a task function in the current app context and commit its work."""
+    try:
+        _registry[name].func(**json.loads(payload))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        db.session.remove()
+
+
+class Worker:
+    """Claims due tasks and runs them in a thread or process pool."""
+
+    def __init__(self, app, concurrency=4, pool='thread', poll_interval=1.0):
+        self.app = app
+        self.concurrency = concurrency
+        self.pool = pool
+        self.poll_interval = poll_interval
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.visibility_timeout = app.config.get('TASK_VISIBILITY_TIMEOUT', 600)
+        self._stopping = False
+        self._last_reclaim = 0
+
+    def stop(self, *args):
+        """Stop claiming new tasks; running tasks are allowed to finish."""
+        self._stopping = True
+
+    def claim(self, limit):
+        """Mark up to ``limit`` due tasks as running by this worker and return them."""
+        now = datetime.utcnow()
+        table = BackgroundTask.__table__
+        with self.app.app_context():
+            try:
+                exhausted = []
+                if time.monotonic() - self._last_reclaim > RECLAIM_INTERVAL_SECONDS:
+                    # Requeue tasks whose worker died while running them, and
+                    # give up on those that took down a worker on every attempt
+                    stale = (table.c.status == 'running') \
+                        & (table.c.locked_at < now - timedelta(seconds=self.visibility_timeout))
+                    exhausted = db.session.execute(
+                        db.select(table.c.id, table.c.name, table.c.payload)
+                        .where(stale, table.c.attempts >= table.c.max_attempts)
+                    ).all()
+                    if exhausted:
+                        db.session.execute(
+                            table.update()
+                            .where(table.c.id.in_([row.id for row in exhausted]), table.c.status == 'running')
+                            .values(status='failed', locked_by=None, locked_at=None, updated_at=now,
+                                    last_error=f'No result after {self.visibility_timeout} seconds; '
+                                               'the worker running it stopped')
+                        )
+                    db.session.execute(
+                        table.update()
+                        .where(stale, table.c.attempts < table.c.max_attempts)
+                        .values(status='queued', locked_by=None, locked_at=None)
+                    )
+                    self._last_reclaim = time.monotonic()
+                candidates = db.session.execute(
+                    db.select(table.c.id, table.c.name, table.c.payload)
+                    .where(table.c.status == 'queued', table.c.run_at <= now)
+                    .order_by(table.c.priority.desc(), table.c.run_at, table.c.id)
+                    .limit(limit * 2)
+                ).all()
+                claimed = []
+                for row in candidates:
+                    result = db.session.execute(
+                        table.update()
+                        .where(table.c.id == row.id, table.c.status == 'queued')
+                        .values(status='running', locked_by=self.worker_id, locked_at=now,
+                                attempts=table.c.attempts + 1, updated_at=now)
+                    )
+                    if result.rowcount == 1:
+                        claimed.append(row)
+                        if len(claimed) == limit:
+                            break
+                db.session.commit()
+                for row in exhausted:
+                    self._give_up(row.name, row.payload)
+                return claimed
+            finally:
+                db.session.remove()
+
+    def record(self, task_id, error=None):
+        """Store the outcome of a run, scheduling a retry with backoff on failure."""
+        with self.app.app_context():
+            try:
+                row = db.session.get(BackgroundTask, task_id)
+                row.locked_by = None
+                row.locked_at = None
+                if error is None:
+                    row.status = 'done'
+                    row.last_error = None
+                else:
+                    row.last_error = ''.join(traceback.format_exception(error))[-4000:]
+                    if row.attempts >= row.max_attempts:
+                        row.status = 'failed'
+                    else:
+                        spec = _registry.get(row.name)
+                        base = spec.backoff_seconds if spec else 10
+                        delay = min(MAX_BACKOFF_SECONDS, base * 2 ** (row.attempts - 1))
+                        row.status = 'queued'
+                        row.run_at = datetime.utcnow() + timedelta(seconds=delay * random.uniform(1, 1.1))
+                    current_app.logger.warning(f'Task {row.name} #{row.id} failed: {error!r}')
+                failed = row.status == 'failed'
+                name, payload = row.name, row.payload
+                db.session.commit()
+                if failed:
+                    self._give_up(name, payload)
+            finally:
+                db.session.remove()
+
+    def _give_up(self, name, payload):
+        """Call the ``on_failure`` handler of a task that won't be run again."""
+        spec = _registry.get(name)
+        if spec is None or spec.on_failure is None:
+            return
+        try:
+            spec.on_failure(**json.loads(payload))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception(f'Failure handler of task {name} failed')
+
+    def run_pending(self):
+        """Run every due task inline, in this thread; return how many ran."""
+        count = 0
+        while True:
+            claimed = self.claim(self.concurrency)
+            if not claimed:
+                return count
+            for row in claimed:
+                error = None
+                try:
+                    with self.app.app_context():
+                        run_task(row.name, row.payload)
+                except Exception as e:
+                    error = e
+                self.record(row.id, error)
+                count += 1
+
+    def run(self, burst=False):
+        """Dispatch tasks to the pool until stopped (or, with ``burst``, until idle)."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        if self.pool == 'process':
+            executor = ProcessPoolExecutor(self.concurrency, initializer=_init_process)
+            submit = lambda row: executor.submit(_run_in_process, row.name, row.payload)
+        else:
+            executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix='task')
+            submit = lambda row: executor.submit(_run_in_thread, self.app, row.name, row.payload)
+
+        running = {}
+        try:
+            while not self._stopping or running:
+                if not self._stopping and len(running) < self.concurrency:
+                    for row in self.claim(self.concurrency - len(running)):
+                        running[submit(row)] = row.id
+                if not running:
+                    if burst:
+                        break
+                    time.sleep(self.poll_interval)
+                    continue
+                done, _ = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.record(running.pop(future), future.exception())
+        finally:
+            executor.shutdown(wait=True)
+
+
+def _run_in_thread(app, name, payload):
+    with app.app_context():
+        run_task(name, payload)
+
+
+_process_app = None
+
+
+def _init_process():
+    """Create a fresh app (and engine) in each pool process."""
+    global _process_app
+    from .. import create_app
+    _process_app = create_app()
+
+
+def _run_in_process(name, payload):
+    with _process_app.app_context():
+        run_task(name, payload)
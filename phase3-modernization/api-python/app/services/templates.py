@@ -0,0 +1,73 @@
+"""
+Jinja template bytecode cache, precompilation and render timing.
+
+Compiled templates are written to a shared on-disk bytecode cache so a new
+worker loads them instead of compiling from source, and ``precompile`` fills
+that cache (and the in-process template cache) ahead of the first request.
+Render timings are collected from Flask's template signals.
+"""
+import os
+import threading
+import time
+
+from flask import before_render_template, g, template_rendered
+from jinja2 import FileSystemBytecodeCache
+
+
+def configure_bytecode_cache(app):
+    """Use a shared on-disk bytecode cache for the app's Jinja environment."""
+    if not app.config.get('TEMPLATE_BYTECODE_CACHE'):
+        return None
+    directory = app.config.get('TEMPLATE_CACHE_DIR') or os.path.join(app.instance_path, 'jinja_cache')
+    os.makedirs(directory, exist_ok=True)
+    cache = FileSystemBytecodeCache(directory)
+    app.jinja_options = {**app.jinja_options, 'bytecode_cache': cache}
+    return cache
+
+
+def precompile(app):
+    """Compile every template of the app and return how many were loaded."""
+    env = app.jinja_env
+    names = env.list_templates(extensions=('html', 'txt', 'xml'))
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+class TemplateProfiler:
+    """Per-template render counts and timings."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def init_app(self, app):
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+
+    def _before_render(self, sender, template, context, **extra):
+        g.setdefault('_template_render_starts', []).append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        starts = g.get('_template_render_starts')
+        if not starts:
+            return
+        self.record(template.name, time.perf_counter() - starts.pop())
+
+    def record(self, name, seconds):
+        """Record one render of template ``name``."""
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0}
+            stats['count'] += 1
+            stats['total_seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+
+    def snapshot(self):
+        """Return render stats per template, slowest total first."""
+        with self._lock:
+            rows = [dict(stats, template=name) for name, stats in self._stats.items()]
+        for row in rows:
+            row['mean_seconds'] = row['total_seconds'] / row['count']
+        return sorted(rows, key=lambda row: row['total_seconds'], reverse=True)
@@ -0,0 +1,192 @@
+"""
+Keyword search using the database's own full-text index.
+
+Job and resume search match keywords against a title and a body column.
+When the native full-text structures created by the "Native full-text
+search" migration exist, matching and ranking run in the database:
+
+* PostgreSQL: the generated ``search_vector`` tsvector column (title weighted
+  above body) with its GIN index, matched with ``to_tsquery`` and ranked by
+  ``ts_rank``. The ``english`` configuration leaves stop words out of the
+  index, so those words ("it", "a", ...) are matched as word prefixes of the
+  columns instead.
+* SQLite: the ``<table>_fts`` FTS5 table, matched with ``MATCH`` and ranked
+  by ``bm25``.
+* SQL Server: the table's full-text index, through ``CONTAINSTABLE`` and its
+  ``RANK``.
+
+Every word of the keyword must match, as a prefix and after stemming, so
+"nurs" finds "nursing". Without those structures (e.g. a database created
+by ``db.create_all()``), or with ``SEARCH_BACKEND = 'like'``, keywords are
+matched as substrings with ``ilike`` and results are not ranked. The backend
+of each table is detected once per process.
+"""
+import re
+import threading
+
+from flask import current_app
+from sqlalchemy import Float, Integer, func, inspect, literal_column, or_, text
+from sqlalchemy.exc import SQLAlchemyError
+
+# table -> (title column, body column); must match the migration
+SEARCHED = {
+    'job_postings': ('title', 'description'),
+    'resumes': ('job_title', 'resume_text'),
+}
+MAX_TERMS = 8
+_TERM = re.compile(r'[^\W_]+')
+
+# PostgreSQL's english.stop: words the english text search configuration
+# drops from both the indexed vectors and the queries
+ENGLISH_STOP_WORDS = frozenset("""
+    i me my myself we our ours ourselves you your yours yourself yourselves he him his himself she her
+    hers herself it its itself they them their theirs themselves what which who whom this that these
+    those am is are was were be been being have has had having do does did doing a an the and but if
+    or because as until while of at by for with about against between into through during before after
+    above below to from up down in out on off over under again further then once here there when where
+    why how all any both each few more most other some such no nor not only own same so than too very s
+    t can will just don should now
+""".split())
+
+
+def terms(keyword):
+    """Return the searchable words of ``keyword``."""
+    return _TERM.findall(keyword.lower())[:MAX_TERMS]
+
+
+class LikeBackend:
+    """Substring matching, available everywhere."""
+
+    name = 'like'
+
+    def available(self, connection, table):
+        return True
+
+    def apply(self, query, model, keyword):
+        columns = [getattr(model, column) for column in SEARCHED[model.__tablename__]]
+        return query.filter(or_(*(column.ilike(f'%{keyword}%') for column in columns))), None
+
+
+class PostgresBackend:
+    """Generated tsvector column with a GIN index."""
+
+    name = 'postgresql'
+
+    def available(self, connection, table):
+        return any(column['name'] == 'search_vector' for column in inspect(connection).get_columns(table))
+
+    def apply(self, query, model, keyword):
+        words = terms(keyword)
+        indexed = [term for term in words if term not in ENGLISH_STOP_WORDS]
+        columns = [getattr(model, column) for column in SEARCHED[model.__tablename__]]
+        for term in words:
+            if term in ENGLISH_STOP_WORDS:
+                # Not in the vector: a word of either column must start with it
+                query = query.filter(or_(*(column.op('~*')(rf'\m{term}') for column in columns)))
+        if not indexed:
+            return query, None
+        tsquery = func.to_tsquery(literal_column("'english'::regconfig"),
+                                  ' & '.join(f'{term}:*' for term in indexed))
+        vector = literal_column(f'{model.__tablename__}.search_vector')
+        return query.filter(vector.op('@@')(tsquery)), func.ts_rank(vector, tsquery).desc()
+
+
+class SqliteBackend:
+    """External-content FTS5 table."""
+
+    name = 'sqlite'
+
+    def available(self, connection, table):
+        return inspect(connection).has_table(f'{table}_fts')
+
+    def apply(self, query, model, keyword):
+        fts = f'{model.__tablename__}_fts'
+        # bm25 is lower for better matches; title matches count double
+        match = text(f'SELECT rowid AS id, bm25({fts}, 2.0, 1.0) AS rank FROM {fts} '
+                     f'WHERE {fts} MATCH :text_query')\
+            .bindparams(text_query=' '.join(f'"{term}"*' for term in terms(keyword)))\
+            .columns(id=Integer, rank=Float).subquery('text_match')
+        return query.join(match, match.c.id == model.id), match.c.rank.asc()
+
+
+class SqlServerBackend:
+    """Full-text index queried with CONTAINSTABLE."""
+
+    name = 'mssql'
+
+    def available(self, connection, table):
+        row = connection.execute(text('SELECT 1 FROM sys.fulltext_indexes WHERE object_id = OBJECT_ID(:table)'),
+                                 {'table': table}).first()
+        return row is not None
+
+    def apply(self, query, model, keyword):
+        table = model.__tablename__
+        title, body = SEARCHED[table]
+        match = text(f'SELECT [KEY] AS id, [RANK] AS rank FROM CONTAINSTABLE({table}, ({title}, {body}), :text_query)')\
+            .bindparams(text_query=' AND '.join(f'"{term}*"' for term in terms(keyword)))\
+            .columns(id=Integer, rank=Integer).subquery('text_match')
+        return query.join(match, match.c.id == model.id), match.c.rank.desc()
+
+
+LIKE = LikeBackend()
+NATIVE = {backend.name: backend for backend in (PostgresBackend(), SqliteBackend(), SqlServerBackend())}
+
+
+class TextSearch:
+    """Picks the search backend of each table."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._backends = {}
+        self.mode = 'auto'
+
+    def init_app(self, app):
+        self.mode = app.config['SEARCH_BACKEND']
+        if self.mode not in ('auto', 'like'):
+            raise ValueError("SEARCH_BACKEND must be 'auto' or 'like'")
+        self.clear()
+
+    def backend(self, table):
+        backend = self._backends.get(table)
+        if backend is None:
+            backend = self._detect(table)
+            if backend is None:
+                # Not cached: the next search checks again
+                return LIKE
+            with self._lock:
+                self._backends[table] = backend
+        return backend
+
+    def _detect(self, table):
+        """Return the backend of ``table``, or ``None`` if the check failed."""
+        from ..extensions import db
+
+        native = NATIVE.get(db.engine.dialect.name)
+        if self.mode == 'like' or native is None:
+            return LIKE
+        try:
+            with db.engine.connect() as connection:
+                return native if native.available(connection, table) else LIKE
+        except SQLAlchemyError as e:
+            current_app.logger.warning(f'Could not check for full-text search on {table}: {e}')
+            return None
+
+    def apply(self, query, model, keyword):
+        """Filter ``query`` to rows of ``model`` matching ``keyword``.
+
+        Returns ``(query, rank)``, where ``rank`` orders the best matches
+        first, or is ``None`` when the backend doesn't rank.
+        """
+        backend = self.backend(model.__tablename__)
+        if not terms(keyword):
+            backend = LIKE
+        return backend.apply(query, model, keyword)
+
+    def clear(self):
+        """Detect the backends again (after migrating)."""
+        with self._lock:
+            self._backends.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {table: backend.name for table, backend in sorted(self._backends.items())}
@@ -0,0 +1,387 @@
+"""
+Local request tracing.
+
+Every request gets a trace whose spans show where its time went: the request
+itself, the view handler, each SQL statement, each ``render_template``,
+bcrypt hashing and cache lookups, nested by what called what. Where a SQL
+count only says a request is slow, the span tree shows e.g. a view loading a
+list of rows and then lazily loading a relationship of each.
+
+Finished traces are appended, one per line, to ``TRACE_FILE`` (by default
+``instance/traces.jsonl``) in the OTLP/JSON encoding of an
+``ExportTraceServiceRequest``, the format written by the OpenTelemetry
+Collector's file exporter, so the file can be replayed into any OTLP
+backend. ``flask traces show`` prints the latest traces as trees.
+
+Sampling is decided when a request starts: a ``TRACE_SAMPLE_RATE`` share of
+requests (or the sampled flag of an incoming W3C ``traceparent`` header) is
+exported. Spans are still collected for the other requests, and a request
+that turns out to take at least ``TRACE_SLOW_MS`` is exported as well.
+
+Code outside the request hooks adds spans with::
+
+    with span('cache.lookup', cache='search') as current:
+        ...
+        current.set('cache.hit', True)
+
+which costs one thread-local lookup when no trace is active.
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from flask import before_render_template, current_app, request, request_started, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# OTLP span kinds
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+# OTLP status codes
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+MAX_STATEMENT_LENGTH = 2000
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+_local = threading.local()
+
+
+class Span:
+    """One timed operation of a trace."""
+
+    __slots__ = ('name', 'kind', 'span_id', 'parent_id', 'start', 'end', 'attributes', 'error')
+
+    def __init__(self, name, kind, span_id, parent_id, start, attributes):
+        self.name = name
+        self.kind = kind
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.start = start
+        self.end = None
+        self.attributes = attributes
+        self.error = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+
+class Trace:
+    """The spans of one request."""
+
+    def __init__(self, trace_id, parent_id, sampled, max_spans):
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.max_spans = max_spans
+        self.spans = []
+        self.stack = []
+        self.dropped = 0
+        # Wall clock for the export, monotonic clock for durations
+        self._wall_ns = time.time_ns()
+        self._perf_ns = time.perf_counter_ns()
+
+    def now(self):
+        return self._wall_ns + time.perf_counter_ns() - self._perf_ns
+
+    def start_span(self, name, kind=KIND_INTERNAL, attributes=None):
+        parent_id = self.stack[-1].span_id if self.stack else self.parent_id
+        current = Span(name, kind, f'{random.getrandbits(64):016x}', parent_id, self.now(), attributes or {})
+        self.stack.append(current)
+        if len(self.spans) < self.max_spans:
+            self.spans.append(current)
+        else:
+            self.dropped += 1
+        return current
+
+    def end_span(self, error=None):
+        """End the innermost open span."""
+        if not self.stack:
+            return None
+        current = self.stack.pop()
+        current.end = self.now()
+        current.error = error
+        return current
+
+    @property
+    def duration_seconds(self):
+        root = self.spans[0]
+        return ((root.end or self.now()) - root.start) / 1e9
+
+
+class _SpanContext:
+    __slots__ = ('_trace', '_name', '_kind', '_attributes')
+
+    def __init__(self, trace, name, kind, attributes):
+        self._trace = trace
+        self._name = name
+        self._kind = kind
+        self._attributes = attributes
+
+    def __enter__(self):
+        return self._trace.start_span(self._name, self._kind, self._attributes)
+
+    def __exit__(self, exc_type, exc, tb):
+        self._trace.end_span(repr(exc) if exc is not None else None)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, key, value):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def current_trace():
+    """Return the trace of the request running in this thread, if any."""
+    return getattr(_local, 'trace', None)
+
+
+def span(name, kind=KIND_INTERNAL, **attributes):
+    """Context manager timing a child span of the current one (no-op outside traces)."""
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        return _NO_SPAN
+    return _SpanContext(trace, name, kind, attributes)
+
+
+def _value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _attributes(attributes):
+    return [{'key': key, 'value': _value(value)} for key, value in attributes.items() if value is not None]
+
+
+def to_otlp(trace, service_name):
+    """Return ``trace`` as an OTLP/JSON ``ExportTraceServiceRequest``."""
+    if trace.dropped:
+        trace.spans[0].set('trace.dropped_spans', trace.dropped)
+    spans = []
+    for current in trace.spans:
+        item = {
+            'traceId': trace.trace_id,
+            'spanId': current.span_id,
+            'name': current.name,
+            'kind': current.kind,
+            'startTimeUnixNano': str(current.start),
+            'endTimeUnixNano': str(current.end or current.start),
+            'attributes': _attributes(current.attributes),
+            'status': {'code': STATUS_ERROR, 'message': current.error} if current.error
+                      else {'code': STATUS_OK},
+        }
+        if current.parent_id:
+            item['parentSpanId'] = current.parent_id
+        spans.append(item)
+    return {'resourceSpans': [{
+        'resource': {'attributes': _attributes({'service.name': service_name, 'process.pid': os.getpid()})},
+        'scopeSpans': [{'scope': {'name': __name__}, 'spans': spans}],
+    }]}
+
+
+def read_traces(path):
+    """Yield the spans of each exported trace in ``path``, oldest first."""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                request_data = json.loads(line)
+                yield [item for resource in request_data['resourceSpans']
+                       for scope in resource['scopeSpans'] for item in scope['spans']]
+
+
+def format_trace(spans):
+    """Render exported spans as an indented tree with durations."""
+    children = {}
+    ids = {item['spanId'] for item in spans}
+    for item in spans:
+        parent = item.get('parentSpanId')
+        children.setdefault(parent if parent in ids else None, []).append(item)
+    lines = []
+
+    def walk(parent, depth):
+        for item in sorted(children.get(parent, ()), key=lambda s: int(s['startTimeUnixNano'])):
+            ms = (int(item['endTimeUnixNano']) - int(item['startTimeUnixNano'])) / 1e6
+            details = {a['key']: next(iter(a['value'].values())) for a in item.get('attributes', ())}
+            detail = details.get('db.statement') or details.get('template.name') or details.get('http.route') or ''
+            if 'cache' in details:
+                detail = f'{details["cache"]}: {details.get("cache.hit")}'
+            detail = ' '.join(str(detail).split())
+            error = ' ERROR' if item.get('status', {}).get('code') == STATUS_ERROR else ''
+            lines.append(f'{ms:9.2f} ms  {"  " * depth}{item["name"]}{error}  {detail[:100]}'.rstrip())
+            walk(item['spanId'], depth + 1)
+
+    walk(None, 0)
+    return '\n'.join(lines)
+
+
+class Tracer:
+    """Creates a trace per request and exports the sampled and slow ones."""
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 0.0
+        self.slow_seconds = None
+        self.max_spans = 1000
+        self.path = None
+        self.service_name = None
+        self._lock = threading.Lock()
+        self.exported = 0
+        self._listening = False
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config['TRACING_ENABLED']
+        self.sample_rate = config['TRACE_SAMPLE_RATE']
+        self.slow_seconds = config['TRACE_SLOW_MS'] / 1000 if config['TRACE_SLOW_MS'] else None
+        self.max_spans = config['TRACE_MAX_SPANS']
+        self.path = config['TRACE_FILE'] or os.path.join(app.instance_path, 'traces.jsonl')
+        self.service_name = config['APP_NAME']
+        request_started.connect(self._start_request, app)
+        app.before_request(self._start_handler)
+        app.after_request(self._end_handler)
+        app.teardown_request(self._end_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self._before_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_execute)
+            event.listen(Engine, 'handle_error', self._execute_failed)
+            self._listening = True
+
+    # Requests
+
+    def _start_request(self, sender, **extra):
+        _local.trace = None
+        if not self.enabled:
+            return
+        trace_id, parent_id, sampled = None, None, None
+        match = _TRACEPARENT.match(request.headers.get('traceparent', ''))
+        if match:
+            trace_id, parent_id = match.group(1), match.group(2)
+            sampled = bool(int(match.group(3), 16) & 1)
+        if sampled is None:
+            sampled = random.random() < self.sample_rate
+        if not sampled and self.slow_seconds is None:
+            return
+        trace = Trace(trace_id or f'{random.getrandbits(128):032x}', parent_id, sampled, self.max_spans)
+        rule = request.url_rule.rule if request.url_rule else None
+        trace.start_span(f'{request.method} {rule or request.path}', KIND_SERVER, {
+            'http.method': request.method,
+            'http.route': rule,
+            'http.target': request.full_path.rstrip('?'),
+            'flask.endpoint': request.endpoint,
+        })
+        _local.trace = trace
+
+    def _start_handler(self):
+        trace = current_trace()
+        if trace is not None and request.endpoint:
+            trace.start_span(f'handler {request.endpoint}', attributes={
+                'flask.blueprint': request.blueprint,
+                'flask.endpoint': request.endpoint,
+            })
+
+    def _end_handler(self, response):
+        trace = current_trace()
+        if trace is not None and len(trace.stack) > 1:
+            trace.end_span()
+            trace.stack[0].set('http.status_code', response.status_code)
+        return response
+
+    def _end_request(self, exc):
+        trace = current_trace()
+        if trace is None:
+            return
+        _local.trace = None
+        error = repr(exc) if exc is not None else None
+        while trace.stack:
+            trace.end_span(error)
+        root = trace.spans[0]
+        if error is None and root.attributes.get('http.status_code', 200) >= 500:
+            root.error = f'HTTP {root.attributes["http.status_code"]}'
+        slow = self.slow_seconds is not None and trace.duration_seconds >= self.slow_seconds
+        if trace.sampled or slow:
+            root.set('trace.kept', 'sampled' if trace.sampled else 'slow')
+            self.export(trace)
+
+    def export(self, trace):
+        """Append ``trace`` to the trace file."""
+        line = json.dumps(to_otlp(trace, self.service_name), separators=(',', ':')) + '\n'
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # One write() per trace so lines from concurrent workers don't interleave
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, line.encode())
+            finally:
+                os.close(fd)
+        except OSError as e:
+            current_app.logger.warning(f'Could not export trace: {e}')
+            return
+        with self._lock:
+            self.exported += 1
+
+    # Templates
+
+    def _before_render(self, sender, template, context, **extra):
+        trace = current_trace()
+        if trace is not None:
+            trace.start_span('render_template', attributes={'template.name': template.name})
+
+    def _after_render(self, sender, template, context, **extra):
+        trace = current_trace()
+        if trace is not None and trace.stack and trace.stack[-1].name == 'render_template':
+            trace.end_span()
+
+    # SQL
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        trace = current_trace()
+        if trace is not None:
+            operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'SQL'
+            trace.start_span(f'db {operation}', KIND_CLIENT, {
+                'db.system': conn.dialect.name,
+                'db.statement': statement[:MAX_STATEMENT_LENGTH],
+                'db.executemany': executemany or None,
+            })
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        trace = current_trace()
+        if trace is not None and trace.stack and trace.stack[-1].kind == KIND_CLIENT:
+            current = trace.end_span()
+            if cursor.rowcount is not None and cursor.rowcount >= 0:
+                current.set('db.rowcount', cursor.rowcount)
+
+    def _execute_failed(self, exception_context):
+        trace = current_trace()
+        if trace is not None and trace.stack and trace.stack[-1].kind == KIND_CLIENT:
+            trace.end_span(repr(exception_context.original_exception))
+
+    def snapshot(self):
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'slow_ms': self.slow_seconds * 1000 if self.slow_seconds is not None else None,
+            'path': self.path,
+            'exported': self.exported,
+        }
@@ -0,0 +1,74 @@
+"""
+Write-behind bookkeeping timestamps of users.
+
+Stamping ``User.last_login`` used to cost a commit per login. The stamps are
+now kept in the worker's memory (see ``app.services.write_behind``), where
+repeated stamps of a user coalesce into the latest one, and flushes write
+them with one executemany ``UPDATE`` per column. A stamp never moves a
+column backwards, so workers flushing in any order agree, and it leaves
+``updated_at`` alone: bookkeeping isn't an edit of the account.
+
+Until a flush, the columns in the database lag behind by up to
+``USER_ACTIVITY_FLUSH_SECONDS``.
+"""
+from datetime import datetime
+
+from sqlalchemy import bindparam, or_
+
+from .write_behind import WriteBehind
+
+# Columns of ``users`` that may be stamped
+FIELDS = ('last_login',)
+
+
+class UserActivity(WriteBehind):
+    """Buffers per-user bookkeeping timestamps and writes them in bulk."""
+
+    name = 'user_activity'
+
+    def init_app(self, app):
+        config = app.config
+        super().init_app(app, config['USER_ACTIVITY_FLUSH_SECONDS'], config['USER_ACTIVITY_MAX_PENDING'])
+
+    def stamp(self, user_id, field, when=None):
+        """Set ``field`` of the user to ``when`` (default: now) at the next flush."""
+        if field not in FIELDS:
+            raise ValueError(f'{field} is not a bookkeeping column')
+        when = when or datetime.utcnow()
+        with self._lock:
+            stamps = self._pending.get(user_id)
+            if stamps is None:
+                stamps = self._pending[user_id] = {}
+                self._mark()
+            if stamps.get(field) is None or stamps[field] < when:
+                stamps[field] = when
+            backlog = len(self._pending)
+        self._changed(backlog)
+
+    def _rows(self, pending):
+        return [(user_id, pending[user_id]) for user_id in sorted(pending)]
+
+    def _restore(self, rows):
+        for user_id, stamps in rows:
+            current = self._pending.setdefault(user_id, {})
+            for field, when in stamps.items():
+                if current.get(field) is None or current[field] < when:
+                    current[field] = when
+
+    def _write(self, connection, rows):
+        from ..models import User
+
+        table = User.__table__
+        for field in FIELDS:
+            params = [{'user_id': user_id, 'stamp': stamps[field]}
+                      for user_id, stamps in rows if field in stamps]
+            if not params:
+                continue
+            column = table.c[field]
+            connection.execute(
+                table.update()
+                .where(table.c.id == bindparam('user_id'),
+                       or_(column.is_(None), column < bindparam('stamp')))
+                .values({field: bindparam('stamp'), 'updated_at': table.c.updated_at}),
+                params,
+            )
@@ -0,0 +1,178 @@
+"""
+Write-behind buffers for low-value writes.
+
+Some writes don't need to happen in the request that causes them: view
+counters, "last login" stamps. A write-behind buffer collects them in the
+worker's memory, where repeated changes to the same row coalesce, and a
+background thread writes whatever has accumulated every ``flush_seconds``
+(or as soon as ``max_pending`` rows are waiting) in one transaction of
+batched statements. Requests never wait for the database.
+
+Changes that could not be written are kept for the next flush. A worker that
+exits cleanly writes what it has left (``serving.worker_exit`` calls
+``stop_all``); changes made since the last flush of a worker that is killed
+are lost, which is the price of keeping these writes off the request path.
+
+Each buffer reports, labelled with its name, the time flushes take, the rows
+they write, failed flushes and the flush lag: how long the oldest change of a
+flush waited in memory.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy.exc import SQLAlchemyError
+
+_buffers = []
+
+
+class WriteBehind:
+    """Base class: subclasses keep changes in ``_pending`` and write them in ``_write``."""
+
+    name = None
+
+    def __init__(self):
+        self._lock = threading.Lock()  # guards _pending; held only to record or swap it
+        self._pending = self._empty()
+        self._oldest = None  # time.monotonic() of the oldest pending change
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher_pid = None
+        self._app = None
+        self.flush_seconds = 10.0
+        self.max_pending = 10000
+        self.flushed_rows = 0
+        self.failed_flushes = 0
+        self.last_flush = None
+        self.last_lag = None
+        _buffers.append(self)
+
+    def init_app(self, app, flush_seconds, max_pending):
+        self._app = app
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+
+    # Subclass interface
+
+    def _empty(self):
+        """A new, empty ``_pending``."""
+        return {}
+
+    def _rows(self, pending):
+        """Turn a swapped-out ``_pending`` into the rows ``_write`` takes."""
+        raise NotImplementedError
+
+    def _restore(self, rows):
+        """Merge rows that could not be written back into ``_pending`` (lock held)."""
+        raise NotImplementedError
+
+    def _write(self, connection, rows):
+        raise NotImplementedError
+
+    # Recording
+
+    def _changed(self, backlog):
+        """Call after recording a change (with the lock released); ``backlog`` is len(_pending)."""
+        if self._flusher_pid != os.getpid() and self.flush_seconds > 0:
+            self._start_flusher()
+        if backlog >= self.max_pending:
+            self._wake.set()
+
+    def _mark(self):
+        """Note the time of a change (lock held)."""
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+
+    def pending(self):
+        """Number of rows waiting to be written."""
+        with self._lock:
+            return len(self._pending)
+
+    def lag(self):
+        """Seconds the oldest pending change has waited, or 0."""
+        oldest = self._oldest
+        return time.monotonic() - oldest if oldest is not None else 0.0
+
+    # Writing
+
+    def flush(self):
+        """Write the pending changes; returns the number of rows written."""
+        from ..extensions import db, metrics
+
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, self._empty()
+                oldest, self._oldest = self._oldest, None
+            rows = self._rows(pending)
+            if not rows:
+                return 0
+            try:
+                with metrics.timer('jobsite_write_behind_flush_duration_seconds', buffer=self.name), \
+                        self._app.app_context():
+                    with db.engine.begin() as connection:
+                        self._write(connection, rows)
+            except Exception:
+                with self._lock:
+                    self._restore(rows)
+                    if oldest is not None:
+                        self._oldest = min(oldest, self._oldest or oldest)
+                self.failed_flushes += 1
+                metrics.inc('jobsite_write_behind_failures_total', buffer=self.name)
+                raise
+            self.flushed_rows += len(rows)
+            self.last_flush = datetime.utcnow()
+            metrics.inc('jobsite_write_behind_rows_total', len(rows), buffer=self.name)
+            if oldest is not None:
+                self.last_lag = time.monotonic() - oldest
+                metrics.observe('jobsite_write_behind_lag_seconds', self.last_lag, buffer=self.name)
+            return len(rows)
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_periodically, name=f'{self.name}-flush', daemon=True).start()
+
+    def _flush_periodically(self):
+        pid = os.getpid()
+        while self._flusher_pid == pid:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except SQLAlchemyError as e:
+                self._app.logger.warning(f'Could not write {self.name} (kept for the next flush): {e}')
+            except Exception:
+                # Keep flushing: a dead flusher would let the buffer grow until the worker exits
+                self._app.logger.exception(f'Could not write {self.name}')
+
+    def stop(self):
+        """Stop the flusher and write what is left (when a worker exits)."""
+        self._flusher_pid = None
+        self._wake.set()
+        return self.flush()
+
+    def snapshot(self):
+        return {
+            'name': self.name,
+            'pending': self.pending(),
+            'lag': self.lag(),
+            'flush_seconds': self.flush_seconds,
+            'flushed_rows': self.flushed_rows,
+            'failed_flushes': self.failed_flushes,
+            'last_flush': self.last_flush,
+            'last_lag': self.last_lag,
+        }
+
+
+def stop_all(logger):
+    """Write what every initialized buffer has left."""
+    for buffer in _buffers:
+        if buffer._app is None:
+            continue
+        try:
+            buffer.stop()
+        except Exception as e:
+            logger.warning(f'Could not write {buffer.name}: {e}')
@@ -56,6 +56,53 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // Search box completions: suggestions are fetched into a <datalist> while typing
+    const autocompleteInputs = document.querySelectorAll('input[data-autocomplete]');
+    autocompleteInputs.forEach(function(input, i) {
+        const datalist = document.createElement('datalist');
+        datalist.id = `autocomplete-${i}`;
+        input.setAttribute('list', datalist.id);
+        input.after(datalist);
+
+        let timer = null;
+        let controller = null;
+        const cache = new Map();
+
+        function show(values) {
+            datalist.replaceChildren(...values.map(function(value) {
+                const option = document.createElement('option');
+                option.value = value;
+                return option;
+            }));
+        }
+
+        input.addEventListener('input', function() {
+            const query = this.value.trim();
+            clearTimeout(timer);
+            if (!query) {
+                show([]);
+                return;
+            }
+            if (cache.has(query)) {
+                show(cache.get(query));
+                return;
+            }
+            timer = setTimeout(function() {
+                if (controller) {
+                    controller.abort();
+                }
+                controller = new AbortController();
+                fetch(`${input.dataset.autocomplete}?q=${encodeURIComponent(query)}`, {signal: controller.signal})
+                    .then(response => response.ok ? response.json() : [])
+                    .then(function(values) {
+                        cache.set(query, values);
+                        show(values);
+                    })
+                    .catch(function() {});
+            }, 120);
+        });
+    });
+
     // Character counter for textareas
     const textareas = document.querySelectorAll('textarea[maxlength]');
     textareas.forEach(function(textarea) {
@@ -0,0 +1,62 @@
+"""
+Gunicorn configuration, for running ``gunicorn --config gunicorn.conf.py run:app``.
+
+``flask server start`` (see ``app/services/serving.py``) is the usual way to
+serve the app and sizes the workers itself; this file applies the same
+preloading and hooks with a fixed worker count.
+
+The application is loaded once in the master (``preload_app``) and the
+garbage collector is frozen before forking, so workers share the preloaded
+application's memory pages copy-on-write and start without re-importing it.
+"""
+import gc
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+preload_app = True
+max_requests = int(os.environ.get('SERVE_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('SERVE_MAX_REQUESTS_JITTER', 100))
+
+# Avoid collections in the master while the app is being imported (turned
+# back on in when_ready)
+gc.disable()
+
+
+def when_ready(server):
+    """Log how long create_app took, fold crashed workers' metrics, then turn garbage collection back on."""
+    from run import app
+    from app.services import serving
+    from app.services.startup import freeze_for_fork
+    server.log.info(app.extensions['startup'].report())
+    serving.prune_metrics(server)
+    # The master runs for days and forks again when workers are recycled;
+    # the preloaded heap is frozen first so later collections skip it
+    freeze_for_fork()
+    gc.enable()
+
+
+def pre_fork(server, worker):
+    """Freeze the preloaded heap right before each fork."""
+    from app.services import serving
+    serving.pre_fork(server, worker)
+
+
+def post_fork(server, worker):
+    """Re-enable garbage collection and drop pooled connections inherited from the master."""
+    from run import app
+    from app.services import serving
+    serving.post_fork(app, server, worker)
+
+
+def post_request(worker, req, environ, resp):
+    """Log the worker's memory every few hundred requests."""
+    from app.services import serving
+    serving.post_request(worker, req, environ, resp)
+
+
+def worker_exit(server, worker):
+    """Log the worker's memory, save its DB wait measurement and retire its metrics."""
+    from run import app
+    from app.services import serving
+    serving.worker_exit(app, server, worker)
@@ -0,0 +1,103 @@
+"""Native full-text search
+
+Creates the structures app/services/text_search.py looks for:
+
+* PostgreSQL: a generated, weighted ``search_vector`` tsvector column with a
+  GIN index on each searched table.
+* SQLite: an external-content FTS5 table ``<table>_fts`` kept in sync by
+  triggers.
+* SQL Server: a full-text index in the ``jobsite_search`` catalog (requires
+  the Full-Text Search feature to be installed).
+
+Revision ID: 056f1cac4068
+Revises: 53c2a374bb0d
+Create Date: 2026-10-19 13:48:42.913192
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '056f1cac4068'
+down_revision = '53c2a374bb0d'
+branch_labels = None
+depends_on = None
+
+# table -> (title column, body column)
+SEARCHED = {
+    'job_postings': ('title', 'description'),
+    'resumes': ('job_title', 'resume_text'),
+}
+CATALOG = 'jobsite_search'
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for table, (title, body) in SEARCHED.items():
+        if dialect == 'postgresql':
+            op.execute(
+                f"ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+                f"setweight(to_tsvector('english', coalesce({title}, '')), 'A') || "
+                f"setweight(to_tsvector('english', coalesce({body}, '')), 'B')) STORED"
+            )
+            op.execute(f'CREATE INDEX ix_{table}_search_vector ON {table} USING gin (search_vector)')
+        elif dialect == 'sqlite':
+            op.execute(
+                f"CREATE VIRTUAL TABLE {table}_fts USING fts5({title}, {body}, "
+                f"content='{table}', content_rowid='id', tokenize='porter unicode61')"
+            )
+            op.execute(
+                f'CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN '
+                f'INSERT INTO {table}_fts (rowid, {title}, {body}) VALUES (new.id, new.{title}, new.{body}); END'
+            )
+            op.execute(
+                f'CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN '
+                f"INSERT INTO {table}_fts ({table}_fts, rowid, {title}, {body}) "
+                f"VALUES ('delete', old.id, old.{title}, old.{body}); END"
+            )
+            op.execute(
+                f'CREATE TRIGGER {table}_fts_update AFTER UPDATE OF {title}, {body} ON {table} BEGIN '
+                f"INSERT INTO {table}_fts ({table}_fts, rowid, {title}, {body}) "
+                f"VALUES ('delete', old.id, old.{title}, old.{body}); "
+                f'INSERT INTO {table}_fts (rowid, {title}, {body}) VALUES (new.id, new.{title}, new.{body}); END'
+            )
+            op.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+        elif dialect == 'mssql':
+            # Full-text DDL cannot run inside a transaction
+            with op.get_context().autocommit_block():
+                op.execute(
+                    f"IF NOT EXISTS (SELECT 1 FROM sys.fulltext_catalogs WHERE name = '{CATALOG}') "
+                    f'CREATE FULLTEXT CATALOG {CATALOG}'
+                )
+                # The key index is the primary key, whose name SQL Server generated
+                op.execute(
+                    f"DECLARE @key sysname = (SELECT name FROM sys.indexes "
+                    f"WHERE object_id = OBJECT_ID('{table}') AND is_primary_key = 1); "
+                    f"EXEC('CREATE FULLTEXT INDEX ON {table} ({title}, {body}) KEY INDEX ' + QUOTENAME(@key) + "
+                    f"' ON {CATALOG} WITH CHANGE_TRACKING AUTO')"
+                )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for table in SEARCHED:
+        if dialect == 'postgresql':
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_search_vector')
+            op.execute(f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector')
+        elif dialect == 'sqlite':
+            for trigger in ('insert', 'delete', 'update'):
+                op.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{trigger}')
+            op.execute(f'DROP TABLE IF EXISTS {table}_fts')
+        elif dialect == 'mssql':
+            with op.get_context().autocommit_block():
+                op.execute(
+                    f"IF EXISTS (SELECT 1 FROM sys.fulltext_indexes WHERE object_id = OBJECT_ID('{table}')) "
+                    f'DROP FULLTEXT INDEX ON {table}'
+                )
+    if dialect == 'mssql':
+        with op.get_context().autocommit_block():
+            op.execute(
+                f"IF EXISTS (SELECT 1 FROM sys.fulltext_catalogs WHERE name = '{CATALOG}') "
+                f'DROP FULLTEXT CATALOG {CATALOG}'
+            )
@@ -0,0 +1,29 @@
+"""Company listing index
+
+Index for the keyset-paginated open positions of public company pages.
+
+Revision ID: 37fe44b26305
+Revises: ef167daa41ea
+Create Date: 2026-10-19 14:01:20.360494
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '37fe44b26305'
+down_revision = 'ef167daa41ea'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('job_postings', schema=None) as batch_op:
+        batch_op.create_index('ix_job_postings_company_listing', ['company_id', 'is_active', 'posted_date', 'id'],
+                              unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('job_postings', schema=None) as batch_op:
+        batch_op.drop_index('ix_job_postings_company_listing')
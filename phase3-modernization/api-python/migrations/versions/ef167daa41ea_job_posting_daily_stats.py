@@ -0,0 +1,33 @@
+"""Job posting daily stats
+
+Per-day view and save counts of job postings, written by
+app/services/analytics.py.
+
+Revision ID: ef167daa41ea
+Revises: 056f1cac4068
+Create Date: 2026-10-19 13:54:00.425866
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ef167daa41ea'
+down_revision = '056f1cac4068'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job_posting_daily_stats',
+    sa.Column('job_posting_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('views', sa.BigInteger(), nullable=False),
+    sa.Column('saves', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('job_posting_id', 'day')
+    )
+
+
+def downgrade():
+    op.drop_table('job_posting_daily_stats')
@@ -1,11 +1,36 @@
 """
 Test configuration and fixtures.
 """
+import os
+import shutil
+import tempfile
+
 import pytest
 from app import create_app
 from app.extensions import db
 from app.config import TestingConfig
 
+# Files the app writes outside the database, kept out of the source tree
+FILE_SETTINGS = {
+    'JOB_PAGES_DIR': 'job_pages',
+    'METRICS_DIR': 'metrics',
+    'PROFILER_DIR': 'profiles',
+    'TRACE_FILE': 'traces.jsonl',
+    'RESUME_STORAGE_DIR': 'resumes',
+    'SITEMAP_DIR': 'sitemaps',
+}
+
+
+def pytest_configure(config):
+    """Point file settings at a scratch directory for the whole run."""
+    config.scratch_dir = tempfile.mkdtemp(prefix='jobsite-tests-')
+    for name, path in FILE_SETTINGS.items():
+        setattr(TestingConfig, name, os.path.join(config.scratch_dir, path))
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(config.scratch_dir, ignore_errors=True)
+
 
 @pytest.fixture(scope='session')
 def app():
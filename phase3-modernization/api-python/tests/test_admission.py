@@ -0,0 +1,119 @@
+"""
+Tests for admission control and rate limiting.
+"""
+import os
+
+import pytest
+from app import create_app
+from app.config import TestingConfig
+from app.services import admission as admission_module
+from app.services.admission import SharedLimiterState
+
+
+@pytest.fixture
+def state(tmp_path):
+    """Limiter state in a temporary shared file."""
+    return SharedLimiterState(str(tmp_path / 'admission.shm'), ['login', 'search'])
+
+
+def test_token_bucket_refills(state):
+    """Test tokens run out and refill over time."""
+    assert state.take_token('ip:1', 2, 60, now=1000) == 0
+    assert state.take_token('ip:1', 2, 60, now=1000) == 0
+    assert state.take_token('ip:1', 2, 60, now=1000) == 30
+    assert state.take_token('ip:1', 2, 60, now=1030) == 0
+
+
+def test_buckets_shared_between_workers(state, tmp_path):
+    """Test two handles on the same file see the same buckets."""
+    other = SharedLimiterState(str(tmp_path / 'admission.shm'), ['login', 'search'])
+    assert state.take_token('user:bob', 1, 60, now=1000) == 0
+    assert other.take_token('user:bob', 1, 60, now=1000) > 0
+
+
+def test_concurrency_cap(state):
+    """Test the in-flight cap and release."""
+    assert state.acquire('search', 2)
+    assert state.acquire('search', 2)
+    assert not state.acquire('search', 2)
+    state.release('search')
+    assert state.in_flight('search') == 1
+    assert state.acquire('search', 2)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_worker_turnover_keeps_the_cap(tmp_path, monkeypatch):
+    """Test slots of exited workers are reused, so the cap holds after many pids."""
+    monkeypatch.setattr(admission_module, 'WORKER_SLOTS', 4)
+    path = str(tmp_path / 'admission.shm')
+    for _ in range(6):
+        pid = os.fork()
+        if pid == 0:
+            worker = SharedLimiterState(path, ['search'])
+            ok = worker.acquire('search', 1)
+            worker.release('search')
+            os._exit(0 if ok else 1)
+        assert os.waitpid(pid, 0)[1] == 0
+
+    state = SharedLimiterState(path, ['search'])
+    assert state.acquire('search', 1)
+    assert not state.acquire('search', 1)
+    assert state.in_flight('search') == 1
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc/self/fd'), reason='needs /proc')
+def test_reopening_after_fork_closes_the_inherited_file(state):
+    """Test a forked worker doesn't keep the parent's descriptor open."""
+    state._ensure_open()
+    pid = os.fork()
+    if pid == 0:
+        before = len(os.listdir('/proc/self/fd'))
+        state.acquire('search', 1)
+        os._exit(0 if len(os.listdir('/proc/self/fd')) == before else 1)
+    assert os.waitpid(pid, 0)[1] == 0
+
+
+def test_requests_without_a_slot_are_refused(tmp_path, monkeypatch):
+    """Test a full slot table refuses requests instead of admitting them uncounted."""
+    monkeypatch.setattr(admission_module, 'WORKER_SLOTS', 1)
+    state = SharedLimiterState(str(tmp_path / 'admission.shm'), ['search'])
+    # A live worker (this test's parent process) holds the only slot
+    state._ensure_open()
+    admission_module._WORKER.pack_into(state._map, state._worker_base('search'), os.getppid(), 1)
+    assert not state.acquire('search', 10)
+
+
+def test_login_rate_limited_with_retry_after(tmp_path):
+    """Test repeated login attempts get a 429 with Retry-After."""
+    class LimitedConfig(TestingConfig):
+        ADMISSION_CONTROL_ENABLED = True
+        ADMISSION_STATE_FILE = str(tmp_path / 'admission.shm')
+        ADMISSION_LIMITS = {
+            'login': {'per_ip': (100, 60), 'per_user': (2, 60), 'concurrency': 4},
+            'search': {'per_ip': (100, 60), 'per_user': (100, 60), 'concurrency': 4},
+        }
+
+    client = create_app(LimitedConfig).test_client()
+    data = {'username': 'victim', 'password': 'guess'}
+    assert client.post('/auth/login', data=data).status_code == 200
+    assert client.post('/auth/login', data=data).status_code == 200
+    response = client.post('/auth/login', data=data)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+    assert client.get('/auth/login').status_code == 200
+    # Rejections are counted in the shared file, for every worker to report
+    shared = SharedLimiterState(LimitedConfig.ADMISSION_STATE_FILE, ['login', 'search'])
+    assert shared.rejections('login', 'rate') == 1
+    # Posting the victim's name from another address doesn't lock them out
+    other = {'REMOTE_ADDR': '10.0.0.2'}
+    assert client.post('/auth/login', data=data, environ_base=other).status_code == 200
+
+
+def test_rejected_attempts_take_no_tokens(state):
+    """Test a bucket without tokens leaves the other buckets untouched."""
+    assert state.take_tokens([('ip:1', 3, 60), ('user:bob', 1, 60)], now=1000) == 0
+    assert state.take_tokens([('ip:1', 3, 60), ('user:bob', 1, 60)], now=1000) == 60
+    assert state.take_tokens([('ip:1', 3, 60), ('user:bob', 1, 60)], now=1000) == 60
+    assert state.take_tokens([('ip:1', 3, 60), ('user:eve', 1, 60)], now=1000) == 0
+    assert state.take_token('ip:1', 3, 60, now=1000) == 0
+    assert state.take_token('ip:1', 3, 60, now=1000) > 0
@@ -0,0 +1,79 @@
+"""
+Tests for write-behind posting analytics.
+"""
+import pytest
+from app.extensions import analytics, db
+from app.models import Company, JobPosting, JobPostingDailyStats, User
+from app.services.analytics import posting_totals
+
+
+@pytest.fixture(scope='module')
+def posting(app):
+    employer = User(username='stats_employer', email='stats_employer@example.com', user_type='employer')
+    employer.set_password('password')
+    seeker = User(username='stats_seeker', email='stats_seeker@example.com', user_type='jobseeker')
+    seeker.set_password('password')
+    db.session.add_all([employer, seeker])
+    db.session.flush()
+    company = Company(user_id=employer.id, company_name='Stats Co')
+    db.session.add(company)
+    db.session.flush()
+    job = JobPosting(company_id=company.id, title='Counted Job', description='Viewed a lot')
+    db.session.add(job)
+    db.session.commit()
+    analytics.flush()
+    return job
+
+
+def test_views_and_saves_are_written_behind(client, posting):
+    """Test requests only buffer counts and a flush upserts one row per posting and day."""
+    client.post('/auth/login', data={'username': 'stats_seeker', 'password': 'password'})
+    for _ in range(3):
+        assert client.get(f'/jobseeker/job/{posting.id}').status_code == 200
+    client.post(f'/jobseeker/favorites/add/{posting.id}')
+    client.get('/auth/logout')
+
+    assert analytics.pending() == 1
+    assert posting_totals([posting.id]) == {}
+
+    assert analytics.flush() == 1
+    assert analytics.pending() == 0
+    analytics.record(posting.id, 'views')
+    assert analytics.flush() == 1
+    assert posting_totals([posting.id]) == {posting.id: (4, 1)}
+    assert JobPostingDailyStats.query.filter_by(job_posting_id=posting.id).count() == 1
+
+
+def test_failed_flush_keeps_counts(app, posting, monkeypatch):
+    """Test counts that could not be written are flushed next time."""
+    from app.services import analytics as module
+
+    def fail(connection, rows):
+        raise RuntimeError('database unavailable')
+
+    analytics.record(posting.id, 'views')
+    monkeypatch.setattr(module, 'upsert', fail)
+    with pytest.raises(RuntimeError):
+        analytics.flush()
+    assert analytics.pending() == 1
+    monkeypatch.undo()
+    analytics.record(posting.id, 'views')
+    before = posting_totals([posting.id]).get(posting.id, (0, 0))
+    assert analytics.flush() == 1
+    assert posting_totals([posting.id]) == {posting.id: (before[0] + 2, before[1])}
+
+
+def test_dashboard_shows_save_rate(client, posting):
+    """Test the employer dashboard lists views, saves and saves per view."""
+    analytics.record(posting.id, 'views')
+    analytics.record(posting.id, 'saves')
+    analytics.flush()
+    views, saves = posting_totals([posting.id])[posting.id]
+    rate = '%.1f%%' % (100 * saves / views)
+
+    client.post('/auth/login', data={'username': 'stats_employer', 'password': 'password'})
+    html = client.get('/employer/dashboard').get_data(as_text=True)
+    listing = client.get('/employer/job-postings').get_data(as_text=True)
+    client.get('/auth/logout')
+    assert 'Save Rate' in html and rate in html
+    assert f'<td>{views}</td>' in listing and rate in listing
@@ -0,0 +1,49 @@
+"""
+Tests for archiving expired job postings.
+"""
+from datetime import datetime, timedelta
+from app.extensions import db
+from app.models import ArchivedJobPosting, ArchivedMyJob, Company, JobPosting, MyJob, User
+from app.services import archive
+
+
+def test_sweep_moves_expired_postings(app, client):
+    """Test old inactive postings and their saves move to the archive."""
+    employer = User(username='archive_employer', email='archive_employer@example.com', user_type='employer')
+    seeker = User(username='archive_seeker', email='archive_seeker@example.com', user_type='jobseeker')
+    for user in (employer, seeker):
+        user.set_password('password')
+    db.session.add_all([employer, seeker])
+    db.session.flush()
+    company = Company(user_id=employer.id, company_name='Archive Co')
+    db.session.add(company)
+    db.session.flush()
+
+    long_ago = datetime.utcnow() - timedelta(days=400)
+    stale = JobPosting(company_id=company.id, title='Stale', description='Old role', is_active=False,
+                       posted_date=long_ago, updated_at=long_ago)
+    fresh = JobPosting(company_id=company.id, title='Fresh', description='New role')
+    db.session.add_all([stale, fresh])
+    db.session.flush()
+    db.session.add(MyJob(user_id=seeker.id, job_posting_id=stale.id))
+    db.session.commit()
+    stale_id, fresh_id = stale.id, fresh.id
+
+    assert archive.count_expired() >= 1
+    assert archive.sweep(batch_size=1) >= 1
+    db.session.expire_all()
+
+    assert db.session.get(JobPosting, stale_id) is None
+    assert db.session.get(JobPosting, fresh_id) is not None
+    archived = db.session.get(ArchivedJobPosting, stale_id)
+    assert archived.title == 'Stale' and archived.archive_reason == 'inactive'
+    assert archived.updated_at == long_ago
+    assert MyJob.query.filter_by(user_id=seeker.id).count() == 0
+    assert ArchivedMyJob.query.filter_by(user_id=seeker.id).one().job_posting.id == stale_id
+
+    client.post('/auth/login', data={'username': 'archive_seeker', 'password': 'password'})
+    response = client.get(f'/jobseeker/job/{stale_id}')
+    assert response.status_code == 410
+    assert b'no longer accepting applications' in response.data
+    assert b'Stale' in client.get('/jobseeker/favorites?expired=1').data
+    client.get('/auth/logout')
@@ -0,0 +1,61 @@
+"""
+Tests for the static asset pipeline.
+"""
+import gzip
+import pytest
+from app import create_app
+from app.config import TestingConfig
+from app.services.assets import build_assets
+
+
+@pytest.fixture
+def static_folder(tmp_path):
+    """A small static folder with one stylesheet."""
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'style.css').write_text('body { margin: 0; }\n' * 50)
+    return tmp_path
+
+
+@pytest.fixture
+def asset_app(static_folder):
+    """Application serving built assets from the temporary static folder."""
+    build_assets(str(static_folder))
+
+    class AssetConfig(TestingConfig):
+        USE_ASSET_MANIFEST = True
+
+    app = create_app(AssetConfig)
+    app.static_folder = str(static_folder)
+    from app.extensions import assets
+    assets.init_app(app)
+    return app
+
+
+def test_build_writes_fingerprinted_and_compressed_files(static_folder):
+    """Test build output includes hashed names and gzip variants."""
+    manifest = build_assets(str(static_folder))
+    hashed = manifest['css/style.css']
+    assert hashed.startswith('build/css/style.') and hashed.endswith('.css')
+    assert (static_folder / (hashed + '.gz')).exists()
+    assert (static_folder / 'build' / 'css' / 'style.css').exists()
+
+
+def test_url_for_static_uses_fingerprinted_name(asset_app):
+    """Test url_for('static') is rewritten through the manifest."""
+    with asset_app.test_request_context():
+        from flask import url_for
+        assert '/static/build/css/style.' in url_for('static', filename='css/style.css')
+
+
+def test_fingerprinted_asset_served_compressed(asset_app):
+    """Test negotiated Content-Encoding and immutable caching."""
+    with asset_app.test_request_context():
+        from flask import url_for
+        url = url_for('static', filename='css/style.css')
+    client = asset_app.test_client()
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert gzip.decompress(response.data).startswith(b'body')
+    plain = client.get(url, headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
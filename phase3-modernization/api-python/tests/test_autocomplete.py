@@ -0,0 +1,69 @@
+"""
+Tests for search box autocomplete.
+"""
+import time
+from app.extensions import autocomplete, db
+from app.models import Company, JobPosting, User
+from app.services.autocomplete import PrefixIndex
+
+
+def test_prefix_index_orders_by_weight():
+    """Test completions match any word start and heavier values come first."""
+    index = PrefixIndex({
+        'software engineer': ('Software Engineer', 5),
+        'sales manager': ('Sales Manager', 9),
+        'site reliability engineer': ('Site Reliability Engineer', 2),
+        'nurse': ('Nurse', 1),
+    })
+    assert index.search('s', 2) == ['sales manager', 'software engineer']
+    assert index.search('engineer', 5) == ['software engineer', 'site reliability engineer']
+    assert index.search('site rel', 5) == ['site reliability engineer']
+    assert index.search('x', 5) == []
+
+
+def test_prefix_index_lookup_is_fast():
+    """Test a completion over a large index takes well under a millisecond."""
+    index = PrefixIndex({f'title {i:05d} role': (f'Title {i}', i % 50) for i in range(20000)})
+    start = time.perf_counter()
+    for prefix in ('t', 'ti', 'title 1', 'title 123', 'role'):
+        index.search(prefix, 8)
+    assert (time.perf_counter() - start) / 5 < 0.001
+
+
+def test_committed_changes_update_completions(app):
+    """Test new and deactivated postings change completions without a rebuild."""
+    user = User(username='autocomplete', email='ac@example.com', user_type='employer')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.flush()
+    company = Company(user_id=user.id, company_name='Acme Widgets')
+    db.session.add(company)
+    db.session.commit()
+    autocomplete.rebuild('job_title')
+    assert 'Acme Widgets' in autocomplete.complete('company', 'acm')
+
+    job = JobPosting(company_id=company.id, title='Quantum Plumber', description='Pipes')
+    db.session.add(job)
+    db.session.commit()
+    assert autocomplete.complete('job_title', 'quan') == ['Quantum Plumber']
+    assert autocomplete.complete('job_title', 'plum') == ['Quantum Plumber']
+
+    job.is_active = False
+    db.session.commit()
+    assert autocomplete.complete('job_title', 'quan') == []
+
+
+def test_autocomplete_endpoint(client, app):
+    """Test the endpoint returns JSON and keeps resume titles to employers."""
+    user = User(username='typeahead', email='typeahead@example.com', user_type='jobseeker')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    client.post('/auth/login', data={'username': 'typeahead', 'password': 'password'})
+
+    response = client.get('/autocomplete/job_title?q=a')
+    assert response.status_code == 200
+    assert isinstance(response.get_json(), list)
+    assert client.get('/autocomplete/resume_title?q=a').status_code == 403
+    assert client.get('/autocomplete/unknown?q=a').status_code == 404
+    client.get('/auth/logout')
@@ -0,0 +1,71 @@
+"""
+Tests for public company pages.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from app.extensions import db, shared_cache
+from app.models import Company, JobPosting, User
+from app.services import company_pages
+
+
+@pytest.fixture
+def company(app):
+    user = User(username='page_employer', email='page_employer@example.com', user_type='employer')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.flush()
+    company = Company(user_id=user.id, company_name='Paged Co', city='Pagetown', phone='555-0100')
+    db.session.add(company)
+    db.session.flush()
+    start = datetime(2026, 1, 1)
+    # Two postings share a date, so the cursor needs the id as a tie-breaker
+    dates = [start, start + timedelta(days=1), start + timedelta(days=1), start + timedelta(days=2),
+             start + timedelta(days=3)]
+    db.session.add_all([JobPosting(company_id=company.id, title=f'Paged Job {n}', description='Role',
+                                   posted_date=date) for n, date in enumerate(dates)])
+    db.session.add(JobPosting(company_id=company.id, title='Closed Job', description='Role', is_active=False))
+    db.session.commit()
+    yield company
+    JobPosting.query.filter_by(company_id=company.id).delete()
+    db.session.delete(company)
+    db.session.delete(user)
+    db.session.commit()
+
+
+def test_keyset_pages_are_public(client, company, monkeypatch):
+    """Test anonymous visitors page through open postings newest first."""
+    monkeypatch.setattr(company_pages, 'PER_PAGE', 2)
+    seen = []
+    url = f'/companies/{company.id}'
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        html = response.get_data(as_text=True)
+        assert 'Paged Co' in html and 'Open Positions (5)' in html
+        seen += [line.strip()[len('<h6 class="mb-1">'):-len('</h6>')]
+                 for line in html.splitlines() if '<h6 class="mb-1">' in line]
+        older = [line for line in html.splitlines() if '>Older<' in line]
+        url = older[0].split('href="')[1].split('"')[0].replace('&amp;', '&') if older else None
+    assert seen == ['Paged Job 4', 'Paged Job 3', 'Paged Job 2', 'Paged Job 1', 'Paged Job 0']
+
+    assert client.get(f'/companies/{company.id}?after=garbage').status_code == 404
+    assert client.get('/companies/999999').status_code == 404
+    assert client.get(f'/jobseeker/company/{company.id}').status_code == 301
+
+
+def test_header_is_cached_until_the_company_changes(app, company, tmp_path):
+    """Test the rendered header is reused, and re-rendered after an edit."""
+    shared_cache.open(str(tmp_path / 'shared_cache.bin'), slots=16, slot_size=4096)
+    try:
+        name, first = company_pages.header(company.id)
+        assert name == 'Paged Co' and '555-0100' in first
+        hits = shared_cache.hits
+        assert company_pages.header(company.id)[1] == first
+        assert shared_cache.hits == hits + 1
+
+        company.phone = '555-0199'
+        db.session.commit()
+        assert '555-0199' in company_pages.header(company.id)[1]
+    finally:
+        shared_cache.close()
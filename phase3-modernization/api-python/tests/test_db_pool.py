@@ -0,0 +1,56 @@
+"""
+Tests for connection pool configuration and metrics.
+"""
+import pytest
+from app.extensions import db, pool_monitor
+from app.services.db_pool import LATENCY_BUCKETS, PoolStats, build_engine_options
+
+
+def test_engine_options_from_pool_settings():
+    """Test pool settings are turned into engine options."""
+    options = build_engine_options({
+        'SQLALCHEMY_DATABASE_URI': 'postgresql://db/jobs',
+        'DB_POOL_SIZE': 20,
+        'DB_MAX_OVERFLOW': 5,
+        'DB_POOL_TIMEOUT': 3,
+        'DB_POOL_RECYCLE': 600,
+        'DB_POOL_PRE_PING': 'idle',
+    })
+    assert options['pool_size'] == 20
+    assert options['max_overflow'] == 5
+    assert options['pool_timeout'] == 3
+    assert options['pool_recycle'] == 600
+    assert options['pool_pre_ping'] is False
+
+
+def test_engine_options_skip_sizing_for_memory_sqlite():
+    """Test in-memory SQLite gets no queue pool options."""
+    options = build_engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+    assert 'pool_size' not in options
+    assert options['pool_pre_ping'] is True
+
+
+def test_invalid_pre_ping_strategy():
+    """Test an unknown pre-ping strategy is rejected."""
+    with pytest.raises(ValueError):
+        build_engine_options({'DB_POOL_PRE_PING': 'sometimes'})
+
+
+def test_checkout_latency_histogram():
+    """Test checkouts land in the right latency bucket."""
+    stats = PoolStats()
+    stats.observe_checkout(0.0005)
+    stats.observe_checkout(0.2)
+    stats.observe_checkout(31.0, timed_out=True)
+    assert stats.checkouts == 2
+    assert stats.timeouts == 1
+    assert stats.latency_counts[0] == 1
+    assert stats.latency_counts[LATENCY_BUCKETS.index(0.5)] == 1
+    assert stats.latency_counts[-1] == 1
+
+
+def test_pool_snapshot(app):
+    """Test the pool snapshot reports the primary engine."""
+    with db.engine.connect():
+        snapshot = pool_monitor.snapshot()
+    assert snapshot['primary']['checkouts'] >= 1
@@ -0,0 +1,70 @@
+"""
+Tests for read-replica routing.
+"""
+import pytest
+from app import create_app
+from app.config import TestingConfig
+from app.extensions import db
+from app.services.db_routing import REPLICA_BIND_KEY, replica_reads
+
+
+@pytest.fixture
+def routed_app(tmp_path):
+    """Application with separate SQLite files for the primary and the replica."""
+    class RoutingConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "primary.db"}'
+        SQLALCHEMY_BINDS = {REPLICA_BIND_KEY: f'sqlite:///{tmp_path / "replica.db"}'}
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+
+    app = create_app(RoutingConfig)
+    from app.models import JobType
+
+    @app.route('/_test/replica')
+    @replica_reads
+    def replica_view():
+        return ','.join(j.job_type_name for j in JobType.query.all())
+
+    @app.route('/_test/primary')
+    def primary_view():
+        return ','.join(j.job_type_name for j in JobType.query.all())
+
+    @app.route('/_test/write', methods=['POST'])
+    def write_view():
+        db.session.add(JobType(job_type_name='Contract'))
+        db.session.commit()
+        return 'ok'
+
+    with app.app_context():
+        db.metadata.create_all(db.engines[REPLICA_BIND_KEY])
+        with db.engines[REPLICA_BIND_KEY].begin() as conn:
+            conn.execute(JobType.__table__.insert(), {'job_type_name': 'Replica'})
+        db.session.add(JobType(job_type_name='Primary'))
+        db.session.commit()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    # The replica bind registers an (empty) metadata on the shared extension
+    db.metadatas.pop(REPLICA_BIND_KEY, None)
+
+
+def test_decorated_get_reads_replica(routed_app):
+    """Test that decorated GET views read from the replica."""
+    client = routed_app.test_client()
+    assert client.get('/_test/replica').data == b'Replica'
+
+
+def test_undecorated_view_reads_primary(routed_app):
+    """Test that views without the decorator stay on the primary."""
+    client = routed_app.test_client()
+    assert client.get('/_test/primary').data == b'Primary'
+
+
+def test_reads_stick_to_primary_after_write(routed_app):
+    """Test read-your-writes after a commit."""
+    client = routed_app.test_client()
+    client.post('/_test/write')
+    assert client.get('/_test/replica').data == b'Primary,Contract'
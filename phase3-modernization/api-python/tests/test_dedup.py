@@ -0,0 +1,116 @@
+"""
+Tests for near-duplicate job posting detection.
+"""
+import pytest
+from app.extensions import db
+from app.models import Company, JobPosting, User
+from app.services import dedup
+
+AD = ('We are hiring a registered nurse for our busy surgical unit. You will care for patients '
+      'before and after surgery, work with doctors and coordinate discharge plans. Two years of '
+      'acute care experience and a current license are required. We offer competitive pay, '
+      'flexible shifts, tuition support and a sign on bonus for experienced candidates.')
+REPOST = AD.replace('busy surgical unit', 'busy surgical unit in Dallas')
+OTHER = ('Senior backend engineer to design and operate payment APIs in Python and Go. You will '
+         'own services end to end, mentor engineers and improve reliability of our platform.')
+
+
+@pytest.fixture
+def companies(app):
+    rows = []
+    for name in ('agency', 'hospital'):
+        user = User(username=f'{name}_dedup', email=f'{name}@dedup.example.com', user_type='employer')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.flush()
+        company = Company(user_id=user.id, company_name=name)
+        db.session.add(company)
+        rows.append(company)
+    db.session.flush()
+    return rows
+
+
+def _post(company, description):
+    job = JobPosting(company_id=company.id, title='Job', description=description)
+    db.session.add(job)
+    dedup.index_posting(job)
+    return job
+
+
+def test_similarity_estimates_jaccard():
+    """Test signatures of a repost are close and of unrelated text are not."""
+    assert dedup.similarity(dedup.minhash(AD), dedup.minhash(REPOST)) > 0.8
+    assert dedup.similarity(dedup.minhash(AD), dedup.minhash(OTHER)) < 0.2
+
+
+def test_repost_linked_within_company_only(app, companies):
+    """Test a repost points at the original, but not across companies."""
+    agency, hospital = companies
+    original = _post(agency, AD)
+    repost = _post(agency, REPOST)
+    elsewhere = _post(hospital, AD)
+    unrelated = _post(agency, OTHER)
+    assert original.duplicate_of_id is None
+    assert repost.duplicate_of_id == original.id
+    assert elsewhere.duplicate_of_id is None
+    assert unrelated.duplicate_of_id is None
+
+    visible = dedup.collapse_duplicates(JobPosting.query.filter(JobPosting.company_id == agency.id)).all()
+    assert repost not in visible and original in visible
+    assert dedup.duplicate_counts([original.id]) == {original.id: 1}
+
+    original.is_active = False
+    db.session.flush()
+    visible = dedup.collapse_duplicates(JobPosting.query.filter(JobPosting.company_id == agency.id)).all()
+    assert repost in visible
+    db.session.rollback()
+
+
+def test_collapse_within_matching_results(app, companies):
+    """Test a repost is shown when it matches a search its canonical posting doesn't."""
+    agency = companies[0]
+    original = JobPosting(company_id=agency.id, title='Job', description=AD, city='Austin')
+    db.session.add(original)
+    dedup.index_posting(original)
+    repost = JobPosting(company_id=agency.id, title='Job', description=REPOST, city='Dallas')
+    db.session.add(repost)
+    dedup.index_posting(repost)
+    assert repost.duplicate_of_id == original.id
+
+    agency_jobs = JobPosting.query.filter(JobPosting.company_id == agency.id)
+    assert dedup.collapse_duplicates(agency_jobs).all() == [original]
+    in_dallas = agency_jobs.filter(JobPosting.city == 'Dallas')
+    assert dedup.collapse_duplicates(in_dallas).all() == [repost]
+    db.session.rollback()
+
+
+def test_editing_canonical_relinks_followers(app, companies):
+    """Test reposts stop pointing at a posting edited into something else."""
+    agency = companies[0]
+    original, repost, again = (_post(agency, text) for text in (AD, REPOST, AD))
+    assert repost.duplicate_of_id == original.id and again.duplicate_of_id == original.id
+
+    original.description = OTHER
+    dedup.index_posting(original)
+    db.session.flush()
+    db.session.refresh(repost)
+    db.session.refresh(again)
+    assert repost.duplicate_of_id is None
+    assert again.duplicate_of_id == repost.id
+    db.session.rollback()
+
+
+def test_cluster_catalog(app, companies):
+    """Test the batch job clusters existing postings."""
+    agency = companies[0]
+    jobs = [JobPosting(company_id=agency.id, title='Job', description=text) for text in (AD, REPOST, AD, OTHER)]
+    db.session.add_all(jobs)
+    db.session.commit()
+
+    postings, clusters, duplicates = dedup.cluster_catalog(batch_size=2)
+    assert postings >= 4 and clusters >= 1 and duplicates >= 2
+    for job in jobs:
+        db.session.refresh(job)
+    assert jobs[1].duplicate_of_id == jobs[0].id
+    assert jobs[2].duplicate_of_id == jobs[0].id
+    assert jobs[3].duplicate_of_id is None
@@ -0,0 +1,94 @@
+"""
+Tests for saved jobs and favorite resumes.
+"""
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models import Company, Country, JobPosting, MyJob, Resume, State, User
+from app.services import favorites
+
+
+def _users():
+    employer = User(username='fav_employer', email='fav_employer@example.com', user_type='employer')
+    seeker = User(username='fav_seeker', email='fav_seeker@example.com', user_type='jobseeker')
+    for user in (employer, seeker):
+        user.set_password('password')
+    db.session.add_all([employer, seeker])
+    db.session.flush()
+    return employer, seeker
+
+
+def test_saved_jobs_page_is_one_query(app, client):
+    """Test saving is idempotent and a favorites page runs a single SELECT."""
+    employer, seeker = _users()
+    country = Country(country_name='Favland')
+    db.session.add(country)
+    db.session.flush()
+    state = State(country_id=country.id, state_name='Favstate')
+    company = Company(user_id=employer.id, company_name='Fav Co')
+    db.session.add_all([state, company])
+    db.session.flush()
+    jobs = [JobPosting(company_id=company.id, title=f'Fav Job {n}', description='Role', city='Favtown',
+                       state_id=state.id) for n in range(3)]
+    hidden = JobPosting(company_id=company.id, title='Closed', description='Role', is_active=False)
+    db.session.add_all(jobs + [hidden])
+    db.session.commit()
+    ids = [job.id for job in jobs]
+
+    assert favorites.save('jobs', seeker.id, ids[:2]) == ids[:2]
+    # Already saved and inactive postings are skipped
+    assert favorites.save('jobs', seeker.id, ids + [hidden.id]) == ids[2:]
+    assert favorites.save('jobs', seeker.id, ids) == []
+    assert MyJob.query.filter_by(user_id=seeker.id).count() == 3
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        page = favorites.saved_jobs_page(seeker.id, 1, per_page=2)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert len(statements) == 1
+    assert page.total == 3 and page.pages == 2
+    assert page.items[0].title == 'Fav Job 2' and page.items[0].state_name == 'Favstate'
+
+    client.post('/auth/login', data={'username': 'fav_seeker', 'password': 'password'})
+    html = client.get('/jobseeker/favorites').get_data(as_text=True)
+    assert 'Fav Job 0' in html and 'Favtown, Favstate' in html
+
+    export = client.get('/jobseeker/favorites/export.csv')
+    lines = export.get_data(as_text=True).splitlines()
+    assert export.mimetype == 'text/csv'
+    assert lines[0].startswith('Title,Company,Location') and len(lines) == 4
+
+    saved = [row.id for row in page.items]
+    client.post('/jobseeker/favorites/remove', data={'id': saved + [999999]})
+    assert [job.title for job in favorites.saved_jobs_page(seeker.id, 1).items] == ['Fav Job 0']
+    client.post('/jobseeker/favorites/add', data={'job_id': ids})
+    assert favorites.saved_jobs_page(seeker.id, 1).total == 3
+    client.get('/auth/logout')
+
+
+def test_favorite_resumes(app, client):
+    """Test employers save, list and remove resumes in bulk, only their own."""
+    employer = User.query.filter_by(username='fav_employer').one()
+    seeker = User.query.filter_by(username='fav_seeker').one()
+    resumes = [Resume(user_id=seeker.id, job_title=f'Fav Resume {n}', target_city='Resumeville')
+               for n in range(2)]
+    private = Resume(user_id=seeker.id, job_title='Private', is_searchable=False)
+    db.session.add_all(resumes + [private])
+    db.session.commit()
+
+    client.post('/auth/login', data={'username': 'fav_employer', 'password': 'password'})
+    client.post('/employer/favorites/add', data={'resume_id': [r.id for r in resumes] + [private.id]})
+    page = favorites.favorite_resumes_page(employer.id, 1)
+    assert sorted(row.job_title for row in page.items) == ['Fav Resume 0', 'Fav Resume 1']
+    assert 'Resumeville' in client.get('/employer/favorites').get_data(as_text=True)
+    assert len(client.get('/employer/favorites/export.csv').get_data(as_text=True).splitlines()) == 3
+
+    # Another user's favorites can't be removed
+    assert favorites.remove('resumes', seeker.id, [row.id for row in page.items]) == 0
+    response = client.post(f'/employer/favorites/remove/{page.items[0].id}')
+    assert response.status_code == 302
+    assert favorites.favorite_resumes_page(employer.id, 1).total == 1
+    client.get('/auth/logout')
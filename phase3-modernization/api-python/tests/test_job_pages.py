@@ -0,0 +1,108 @@
+"""
+Tests for static job page snapshots.
+"""
+import gzip
+import os
+import threading
+
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models import BackgroundTask, JobPosting, User
+from app.services import job_pages
+
+JOB_FORM = {'description': 'Care for patients', 'state_id': 0, 'country_id': 0,
+            'education_level_id': 0, 'job_type_id': 0, 'is_active': 'y'}
+
+
+def test_snapshots_follow_the_posting(app, client, tmp_path, monkeypatch):
+    """Test snapshots are written on create/edit, served anonymously and removed."""
+    monkeypatch.setitem(app.config, 'JOB_PAGES_DIR', str(tmp_path))
+    employer = User(username='snap_employer', email='snap_employer@example.com', user_type='employer')
+    employer.set_password('password')
+    db.session.add(employer)
+    db.session.commit()
+
+    client.post('/auth/login', data={'username': 'snap_employer', 'password': 'password'})
+    client.post('/employer/company-profile', data={'company_name': 'Snap Co', 'state_id': 0, 'country_id': 0})
+    assert BackgroundTask.query.filter_by(name='job_pages.publish_company').count() == 1
+    client.post('/employer/job-postings/new', data=dict(JOB_FORM, title='Snap Nurse'))
+    job = JobPosting.query.filter_by(title='Snap Nurse').one()
+    path = job_pages.page_path(str(tmp_path), job.id)
+    html = open(path, encoding='utf-8').read()
+    assert 'Snap Nurse' in html and 'Snap Co' in html
+    # Rendered as an anonymous visitor, not as the employer who saved it
+    assert 'snap_employer' not in html and 'csrf_token' not in html
+    assert gzip.decompress(open(path + '.gz', 'rb').read()).decode() == html
+
+    client.post(f'/employer/job-postings/{job.id}/edit', data=dict(JOB_FORM, title='Snap Senior Nurse'))
+    assert 'Snap Senior Nurse' in open(path, encoding='utf-8').read()
+    client.get('/auth/logout')
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        response = client.get(f'/jobseeker/job/{job.id}', headers={'Accept-Encoding': 'gzip'})
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert statements == []
+    assert response.status_code == 200 and response.headers['Content-Encoding'] == 'gzip'
+    assert 'Cookie' in response.vary
+    response.close()
+
+    # A missing snapshot is published on the first anonymous visit
+    job_pages.remove(job.id)
+    response = client.get(f'/jobseeker/job/{job.id}')
+    assert 'Snap Senior Nurse' in response.get_data(as_text=True) and os.path.isfile(path)
+    response.close()
+
+    client.post('/auth/login', data={'username': 'snap_employer', 'password': 'password'})
+    client.post(f'/employer/job-postings/{job.id}/edit', data=dict(JOB_FORM, title='Snap Nurse', is_active=''))
+    assert not os.path.exists(path) and not os.path.exists(path + '.gz')
+    job.is_active = True
+    db.session.commit()
+    assert job_pages.publish_all(company_id=job.company_id) == 1
+    client.post(f'/employer/job-postings/{job.id}/delete')
+    assert not os.path.exists(path)
+    client.get('/auth/logout')
+    assert client.get(f'/jobseeker/job/{job.id}').status_code == 302
+
+
+def test_concurrent_publishing_and_write_errors(app, client, tmp_path, monkeypatch):
+    """Test threads publishing one posting don't collide, and write errors don't fail a saved edit."""
+    monkeypatch.setitem(app.config, 'JOB_PAGES_DIR', str(tmp_path))
+    employer = User.query.filter_by(username='snap_employer').one()
+    job = JobPosting(company_id=employer.company.id, title='Snap Porter', description='Carry things')
+    db.session.add(job)
+    db.session.commit()
+
+    path = job_pages.page_path(str(tmp_path), job.id)
+    os.makedirs(os.path.dirname(path))
+    errors = []
+
+    def replace(n):
+        try:
+            for _ in range(50):
+                job_pages._replace(path, f'page {n}'.encode())
+        except OSError as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=replace, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == [] and open(path).read().startswith('page ')
+    assert os.listdir(os.path.dirname(path)) == [f'{job.id}.html']
+
+    def fail(path, data):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(job_pages, '_replace', fail)
+    client.post('/auth/login', data={'username': 'snap_employer', 'password': 'password'})
+    response = client.post(f'/employer/job-postings/{job.id}/edit', data=dict(JOB_FORM, title='Snap Head Porter'))
+    assert response.status_code == 302
+    db.session.refresh(job)
+    assert job.title == 'Snap Head Porter'
+    client.get('/auth/logout')
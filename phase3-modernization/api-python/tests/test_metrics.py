@@ -0,0 +1,112 @@
+"""
+Tests for the Prometheus metrics endpoint.
+"""
+import json
+import threading
+
+import pytest
+from app.extensions import metrics
+from app.services.metrics import Metrics, _dump, _empty, render
+
+
+@pytest.fixture
+def metrics_dir(tmp_path):
+    """Publish and read worker files in a temporary directory."""
+    previous = metrics.directory
+    metrics.directory = str(tmp_path)
+    yield tmp_path
+    metrics.directory = previous
+
+
+def _value(text, series):
+    for line in text.splitlines():
+        if line.startswith(series + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+def test_requests_are_counted_per_endpoint(client, metrics_dir):
+    """Test status counts, latency histograms and in-flight requests are exposed."""
+    client.get('/auth/login')
+    text = client.get('/metrics').get_data(as_text=True)
+    assert '# TYPE jobsite_http_request_duration_seconds histogram' in text
+    assert _value(text, 'jobsite_http_requests_total{blueprint="auth",endpoint="auth.login",'
+                        'method="GET",status="200"}') >= 1
+    count = _value(text, 'jobsite_http_request_duration_seconds_count{blueprint="auth",endpoint="auth.login"}')
+    assert count == _value(text, 'jobsite_http_request_duration_seconds_bucket{blueprint="auth",'
+                                 'endpoint="auth.login",le="+Inf"}')
+    assert _value(text, 'jobsite_http_request_db_seconds_count{blueprint="auth",endpoint="auth.login"}') == count
+    # The scrape itself is in flight
+    assert _value(text, 'jobsite_http_requests_in_flight') == 1
+
+
+def test_values_of_other_workers_are_merged(app, metrics_dir):
+    """Test published, retired and finished-thread values are added up."""
+    other = _empty()
+    other['counters'][('jobsite_cache_requests_total', (('cache', 'search'), ('result', 'hit')))] = 3
+    other['gauges'][('jobsite_http_requests_in_flight', ())] = 5
+    (metrics_dir / '999999999.json').write_text(json.dumps(_dump(other)))
+
+    exiting = Metrics()
+    exiting.directory = str(metrics_dir)
+    exiting.inc('jobsite_cache_requests_total', cache='search', result='miss')
+    exiting.retire()
+    assert (metrics_dir / 'retired.json').exists()
+
+    thread = threading.Thread(target=metrics.observe, args=('jobsite_bcrypt_duration_seconds', 0.07),
+                              kwargs={'operation': 'check'})
+    thread.start()
+    thread.join()
+
+    with app.test_request_context():
+        values = metrics.collect()
+    hits = values['counters'][('jobsite_cache_requests_total', (('cache', 'search'), ('result', 'hit')))]
+    misses = values['counters'][('jobsite_cache_requests_total', (('cache', 'search'), ('result', 'miss')))]
+    assert hits >= 3 and misses >= 1
+    assert values['gauges'][('jobsite_cache_hit_ratio', (('cache', 'search'),))] == hits / (hits + misses)
+    # A worker that is no longer running has nothing in flight
+    assert values['gauges'].get(('jobsite_http_requests_in_flight', ()), 0) == 0
+    assert values['histograms'][('jobsite_bcrypt_duration_seconds', (('operation', 'check'),))][2] >= 1
+    # The crashed worker's file was folded into the retired totals, once
+    assert not (metrics_dir / '999999999.json').exists()
+    with app.test_request_context():
+        again = metrics.collect()
+    assert again['counters'][('jobsite_cache_requests_total', (('cache', 'search'), ('result', 'hit')))] == hits
+
+
+def test_concurrent_scrapes_keep_finished_threads_counts():
+    """Test stores of finished threads are folded once while other threads scrape."""
+    recorder = Metrics()
+    key = ('jobsite_write_behind_rows_total', (('buffer', 'test'),))
+    scraping = True
+
+    def scrape():
+        while scraping:
+            recorder.local_values()
+
+    scrapers = [threading.Thread(target=scrape) for _ in range(4)]
+    for thread in scrapers:
+        thread.start()
+    for _ in range(10):
+        batch = [threading.Thread(target=recorder.inc, args=('jobsite_write_behind_rows_total',),
+                                  kwargs={'buffer': 'test'}) for _ in range(20)]
+        for thread in batch:
+            thread.start()
+        for thread in batch:
+            thread.join()
+    scraping = False
+    for thread in scrapers:
+        thread.join()
+    assert recorder.local_values()['counters'][key] == 200
+
+
+def test_histogram_rendering():
+    """Test buckets are cumulative and end with +Inf."""
+    values = _empty()
+    values['histograms'][('jobsite_bcrypt_duration_seconds', (('operation', 'hash'),))] = \
+        [0, 1, 2, 0, 0, 0, 0, 0, 1, 3.5]
+    text = render(values)
+    assert 'jobsite_bcrypt_duration_seconds_bucket{operation="hash",le="0.05"} 1' in text
+    assert 'jobsite_bcrypt_duration_seconds_bucket{operation="hash",le="+Inf"} 4' in text
+    assert 'jobsite_bcrypt_duration_seconds_sum{operation="hash"} 3.5' in text
+    assert 'jobsite_bcrypt_duration_seconds_count{operation="hash"} 4' in text
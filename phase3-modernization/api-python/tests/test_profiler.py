@@ -0,0 +1,86 @@
+"""
+Tests for the on-demand sampling profiler.
+"""
+import time
+
+import pytest
+from app.extensions import db, profiler
+from app.models import User
+from app.services.profiler import flamegraph_svg, folded, top_functions
+
+
+@pytest.fixture
+def profile_dir(app, tmp_path):
+    """Keep profiles of each test apart."""
+    previous = app.config['PROFILER_DIR']
+    app.config['PROFILER_DIR'] = str(tmp_path)
+    profiler._targets_checked = 0.0
+    yield tmp_path
+    app.config['PROFILER_DIR'] = previous
+    profiler._targets_checked = 0.0
+
+
+def _busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_top_functions_and_exports():
+    """Test self and total samples are attributed per function."""
+    stacks = {'app:view;app:query;db:execute': 6, 'app:view;app:render': 3, 'app:view': 1}
+    rows = top_functions(stacks)
+    assert rows[0] == ('db:execute', 6, 6)
+    assert ('app:view', 1, 10) in rows and ('app:query', 0, 6) in rows
+    assert folded(stacks).splitlines()[0] == 'app:view 1'
+
+    svg = flamegraph_svg(stacks, 'main.index')
+    assert svg.startswith('<svg') and svg.endswith('</svg>')
+    assert '<title>db:execute (6 samples, 60.0%)</title>' in svg
+
+
+def test_sampled_request_records_stacks(app, profile_dir):
+    """Test a sampled request's stacks are saved under its endpoint."""
+    with app.test_request_context('/auth/login'):
+        profiler._begin()
+        _busy_wait(0.1)
+        profiler._stop(None)
+
+    stacks = profiler.stacks('auth.login')
+    assert sum(stacks.values()) > 0
+    assert any('test_profiler:_busy_wait' in stack for stack in stacks)
+    assert profiler.profiles()['auth.login']['requests'] == 1
+
+    profiler.clear('auth.login')
+    assert profiler.profiles() == {}
+
+
+def test_targets_and_admin_pages(app, client, profile_dir):
+    """Test sample rates are shared through the targets file and reports are served."""
+    profiler.set_target('auth.login', 100)
+    assert profiler.targets() == {'auth.login': 100}
+    client.get('/auth/login')
+    assert 'auth.login' in profiler.profiles()
+    profiler.set_target('auth.login', 0)
+    assert profiler.targets() == {}
+
+    admin = User(username='profiler_admin', email='profiler_admin@example.com',
+                 user_type='jobseeker', is_admin=True)
+    admin.set_password('password')
+    db.session.add(admin)
+    db.session.commit()
+    client.post('/auth/login', data={'username': 'profiler_admin', 'password': 'password'})
+    client.get('/auth/login', headers={'X-Profile': '1'})
+    assert profiler.profiles()['auth.login']['requests'] == 2
+    profiler.record('auth.login', {'app:view;app:query': 3}, 0.02)
+
+    assert client.post('/admin/profiler', data={'endpoint': 'main.index', 'rate': '2.5'}).status_code == 302
+    assert profiler.targets() == {'main.index': 2.5}
+    page = client.get('/admin/profiler')
+    assert b'main.index' in page.data and b'auth.login' in page.data
+    assert b'app:query' in client.get('/admin/profiler/auth.login').data
+    assert client.get('/admin/profiler/auth.login.svg').mimetype == 'image/svg+xml'
+    assert client.get('/admin/profiler/auth.login.folded').data.endswith(b'app:view;app:query 3\n')
+    assert client.get('/admin/profiler/..').status_code == 404
+
+    client.get('/auth/logout')
@@ -0,0 +1,110 @@
+"""
+Tests for resume document storage and text extraction.
+"""
+import io
+import os
+import zipfile
+from datetime import datetime
+import pytest
+from werkzeug.datastructures import FileStorage
+from app.extensions import db
+from app.models import BackgroundTask, Resume, User
+from app.services import resume_documents
+from app.services.tasks import Worker
+
+DOCX_XML = (
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+    '<w:p><w:r><w:t>Jane Doe</w:t></w:r></w:p>'
+    '<w:p><w:r><w:t>Python</w:t></w:r><w:r><w:tab/><w:t>Flask</w:t></w:r></w:p>'
+    '</w:body></w:document>'
+)
+
+
+def test_store_upload_deduplicates_by_hash(tmp_path):
+    """Test identical uploads are stored once under their hash."""
+    first = resume_documents.store_upload(io.BytesIO(b'resume'), str(tmp_path), 'txt', 1024)
+    second = resume_documents.store_upload(io.BytesIO(b'resume'), str(tmp_path), 'txt', 1024)
+    assert first == second
+    stored = [name for _, _, names in os.walk(tmp_path) for name in names]
+    assert stored == [f'{first[0]}.txt']
+
+
+def test_store_upload_rejects_large_files(tmp_path):
+    """Test oversized uploads are refused and leave nothing behind."""
+    with pytest.raises(resume_documents.DocumentTooLarge):
+        resume_documents.store_upload(io.BytesIO(b'x' * 2048), str(tmp_path), 'txt', 1024)
+    assert not any(names for _, _, names in os.walk(tmp_path))
+
+
+def test_extract_docx_text(tmp_path):
+    """Test DOCX paragraphs and tabs are extracted."""
+    path = tmp_path / 'resume.docx'
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('word/document.xml', DOCX_XML)
+    assert resume_documents.extract_text(str(path)) == 'Jane Doe\nPython\tFlask'
+
+
+def test_uploaded_text_extracted_by_worker(app, tmp_path, monkeypatch):
+    """Test an attached document fills resume_text once the worker runs."""
+    monkeypatch.setitem(app.config, 'RESUME_STORAGE_DIR', str(tmp_path))
+    user = User(username='uploader', email='uploader@example.com', user_type='jobseeker')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.flush()
+    resume = Resume(user_id=user.id, job_title='Developer')
+    db.session.add(resume)
+    upload = FileStorage(io.BytesIO(b'  Ten years of Flask.  '), filename='cv.txt')
+    resume_documents.attach_document(resume, upload)
+    db.session.commit()
+    assert resume.document_status == 'processing'
+
+    Worker(app).run_pending()
+    db.session.refresh(resume)
+    assert resume.document_status == 'ready'
+    assert resume.resume_text == 'Ten years of Flask.'
+
+    # The same file uploaded again reuses the extracted text immediately
+    resume_documents.attach_document(resume, FileStorage(io.BytesIO(b'  Ten years of Flask.  '), filename='cv.txt'))
+    assert resume.document_status == 'ready'
+    db.session.commit()
+
+    # A long name is shortened without losing the extension the download needs
+    long_name = 'x' * 300 + '.txt'
+    resume_documents.attach_document(resume, FileStorage(io.BytesIO(b'Flask'), filename=long_name))
+    db.session.commit()
+    Worker(app).run_pending()
+    assert resume.document_filename == 'x' * 251 + '.txt'
+    with app.test_request_context():
+        response = resume_documents.send_document(resume)
+        assert response.status_code == 200
+        response.close()
+
+
+def test_extraction_failures_end_processing(app, tmp_path, monkeypatch):
+    """Test a missing upload fails at once and other errors fail after the last attempt."""
+    monkeypatch.setitem(app.config, 'RESUME_STORAGE_DIR', str(tmp_path))
+    user = User.query.filter_by(username='uploader').one()
+    resume = Resume(user_id=user.id, job_title='Tester')
+    db.session.add(resume)
+    resume_documents.attach_document(resume, FileStorage(io.BytesIO(b'Lost'), filename='lost.txt'))
+    db.session.commit()
+    os.remove(resume_documents.document_path(str(tmp_path), resume.document_sha256, 'txt'))
+    Worker(app).run_pending()
+    db.session.refresh(resume)
+    assert resume.document_status == 'failed'
+
+    def crash(path):
+        raise RuntimeError('parser crashed')
+
+    monkeypatch.setattr(resume_documents, 'extract_text', crash)
+    resume_documents.attach_document(resume, FileStorage(io.BytesIO(b'Crash'), filename='crash.txt'))
+    db.session.commit()
+    task = BackgroundTask.query.filter_by(name='resumes.extract_text').order_by(BackgroundTask.id.desc()).first()
+    for status in ('processing', 'processing', 'failed'):
+        task.run_at = datetime.utcnow()
+        db.session.commit()
+        Worker(app).run_pending()
+        db.session.refresh(resume)
+        db.session.refresh(task)
+        assert resume.document_status == status
+    assert task.status == 'failed'
@@ -0,0 +1,44 @@
+"""
+Tests for the job search result cache.
+"""
+from app.extensions import db, search_cache
+from app.models import Company, JobPosting, User
+
+
+def _search():
+    query = JobPosting.query.filter(JobPosting.title.ilike('%cachetest%')).order_by(JobPosting.id.desc())
+    return search_cache.paginate(('cachetest', '', 0), query, page=1, per_page=2)
+
+
+def test_results_cached_until_postings_change(app):
+    """Test repeated searches hit the cache and a committed write invalidates it."""
+    user = User(username='search_cache', email='search_cache@example.com', user_type='employer')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.flush()
+    company = Company(user_id=user.id, company_name='Cache Co')
+    db.session.add(company)
+    db.session.flush()
+    jobs = [JobPosting(company_id=company.id, title=f'Cachetest {i}', description='Role') for i in range(3)]
+    db.session.add_all(jobs)
+    db.session.commit()
+    search_cache.clear()
+
+    first = _search()
+    hits = search_cache.hits
+    second = _search()
+    assert search_cache.hits == hits + 1
+    assert [job.id for job in second.items] == [job.id for job in first.items] == [jobs[2].id, jobs[1].id]
+    assert second.total == 3 and second.pages == 2
+
+    generation = search_cache.generation
+    jobs[2].title = 'Renamed'
+    db.session.commit()
+    assert search_cache.generation == generation + 1
+    assert _search().total == 2
+
+    # Bulk statements count as writes too
+    generation = search_cache.generation
+    JobPosting.query.filter_by(id=jobs[0].id).update({'is_active': False}, synchronize_session=False)
+    db.session.commit()
+    assert search_cache.generation == generation + 1
@@ -0,0 +1,77 @@
+"""
+Tests for production server sizing and worker reporting.
+"""
+import json
+import os
+from app.extensions import db_time
+from app.services import serving
+
+
+def test_recommend_scales_with_db_wait():
+    """Test more concurrency is recommended the longer requests wait on the database."""
+    assert serving.recommend(4, 0.0) == (4, 1)
+    assert serving.recommend(4, 0.5) == (8, 1)
+    assert serving.recommend(4, 0.75, 'threaded') == (4, 4)
+    # Capped: a database-bound app gains nothing from unbounded workers
+    assert serving.recommend(2, 0.99) == (16, 1)
+    assert serving.recommend(1, 0.0) == (2, 1)
+
+
+def test_measurements_accumulate(tmp_path):
+    """Test worker measurements are merged and old data is phased out."""
+    path = str(tmp_path / 'serve_stats.json')
+    assert serving.load_measured_ratio(path) is None
+    serving.save_measurement(path, 10, 4.0, 1.0)
+    # Too few requests to go by
+    assert serving.load_measured_ratio(path) is None
+    serving.save_measurement(path, 100, 4.0, 3.0)
+    assert serving.load_measured_ratio(path) == 0.5
+
+    serving.save_measurement(path, 1000, serving.STATS_WINDOW_SECONDS, serving.STATS_WINDOW_SECONDS * 0.1)
+    assert abs(serving.load_measured_ratio(path) - 0.1) < 1e-9
+
+    # Stored stats without any request time are replaced, not scaled
+    with open(path, 'w') as f:
+        json.dump({'requests': 5, 'request_seconds': 0.0, 'db_seconds': 0.0}, f)
+    serving.save_measurement(path, 1000, serving.STATS_WINDOW_SECONDS + 1, 1.0)
+    assert serving.load_measured_ratio(path) == 1.0 / (serving.STATS_WINDOW_SECONDS + 1)
+
+
+def test_db_time_measured_per_request(app, client):
+    """Test requests are timed and their database share recorded."""
+    before = db_time.snapshot()
+    client.get('/auth/login')
+    after = db_time.snapshot()
+    assert after['requests'] == before['requests'] + 1
+    assert after['request_seconds'] > before['request_seconds']
+    assert 0 <= after['db_seconds'] <= after['request_seconds']
+
+
+def test_sizing_prefers_configuration(app):
+    """Test explicit settings win over the measured ratio."""
+    worker_class, workers, threads, ratio, source = serving.sizing(app, db_wait_ratio=0.5)
+    assert (worker_class, threads, ratio, source) == ('sync', 1, 0.5, 'configured')
+    assert workers == serving.recommend(serving.cpu_count(), 0.5)[0]
+    assert serving.sizing(app, worker_class='threaded', workers=3, threads=5)[1:3] == (3, 5)
+
+
+def test_reload_resizes_from_new_measurements(app, monkeypatch):
+    """Test a reload (SIGHUP) sizes the workers again from serve_stats.json."""
+    measured = {'ratio': 0.0}
+    monkeypatch.setattr(serving, 'load_measured_ratio', lambda path: measured['ratio'])
+    monkeypatch.setattr(serving, 'cpu_count', lambda: 4)
+    monkeypatch.setitem(app.config, 'SERVE_DB_WAIT_RATIO', None)
+    monkeypatch.setitem(app.config, 'SERVE_WORKERS', 0)
+    server = serving.application(app)
+    assert server.cfg.workers == 4
+
+    measured['ratio'] = 0.5
+    server.reload()
+    assert server.cfg.workers == 8
+
+
+def test_memory_usage_of_current_process():
+    """Test the process's own memory can be read."""
+    usage = serving.memory_usage()
+    assert usage is not None and usage['rss'] > 0
+    assert os.getpid() not in serving.worker_pids(os.getpid())
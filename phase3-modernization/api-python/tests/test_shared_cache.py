@@ -0,0 +1,66 @@
+"""
+Tests for the cache tier shared between worker processes.
+"""
+import pytest
+from app.extensions import db
+from app.models import Company, JobPosting, User
+from app.services.search_cache import SearchCache
+from app.services.shared_cache import SharedCache, decode, encode
+
+
+@pytest.fixture
+def caches(tmp_path):
+    """Two mappings of one cache file, standing in for two workers."""
+    path = str(tmp_path / 'shared_cache.bin')
+    first, second = SharedCache(), SharedCache()
+    first.open(path, slots=16, slot_size=256)
+    second.open(path, slots=16, slot_size=256)
+    yield first, second
+    first.close()
+    second.close()
+
+
+def test_encoding_round_trips():
+    """Test id lists are packed 4 bytes per id and other values survive."""
+    ids = tuple(range(100))
+    assert len(encode(ids)) == 401
+    assert decode(encode(ids)) == ids
+    for value in (((1, 'Canada'), (2, 'Mexico')), '<p>fragment</p>', (2 ** 40, 1), ()):
+        assert decode(encode(value)) == value
+
+
+def test_values_and_invalidation_are_shared(caches):
+    """Test a value stored by one worker is seen, and invalidated, by another."""
+    first, second = caches
+    generation = first.generation(['job_postings'])
+    assert first.set(('search', 'nurse'), (3, 7, 8, 9), generation, ttl=60)
+    assert second.get(('search', 'nurse'), generation) == (3, 7, 8, 9)
+
+    second.invalidate('job_postings')
+    assert first.generation(['job_postings']) == generation + 1
+    assert first.get(('search', 'nurse'), first.generation(['job_postings'])) is None
+
+    assert not first.set('too big', 'x' * 1000, 0, ttl=60)
+    assert first.set('expired', 'x', 0, ttl=-1) and second.get('expired', 0) is None
+
+
+def test_search_cache_uses_shared_tier(app, caches):
+    """Test a search computed in one worker is served from the shared tier in another."""
+    first, second = caches
+    user = User(username='shared_cache', email='shared_cache@example.com', user_type='employer')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.flush()
+    company = Company(user_id=user.id, company_name='Shared Co')
+    db.session.add(company)
+    db.session.flush()
+    db.session.add_all([JobPosting(company_id=company.id, title='Sharedtest', description='Role')
+                        for _ in range(2)])
+    db.session.commit()
+
+    query = JobPosting.query.filter(JobPosting.title == 'Sharedtest').order_by(JobPosting.id)
+    worker_a, worker_b = SearchCache(first), SearchCache(second)
+    assert worker_a.paginate(('sharedtest',), query, page=1).total == 2
+    hits = second.hits
+    assert worker_b.paginate(('sharedtest',), query, page=1).total == 2
+    assert second.hits == hits + 1
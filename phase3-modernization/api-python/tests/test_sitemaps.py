@@ -0,0 +1,57 @@
+"""
+Tests for the sitemaps.
+"""
+import gzip
+from datetime import datetime, timedelta
+
+from app.extensions import db
+from app.models import Company, JobPosting, User
+from app.services import sitemaps
+
+
+def test_build_is_incremental(app, client, tmp_path, monkeypatch):
+    """Test only changed chunks are rewritten and files are served precompressed."""
+    monkeypatch.setitem(app.config, 'SITEMAP_DIR', str(tmp_path))
+    monkeypatch.setitem(app.config, 'SITEMAP_CHUNK_SIZE', 5)
+    monkeypatch.setitem(app.config, 'SITEMAP_BASE_URL', 'https://jobs.example.com')
+    employer = User(username='map_employer', email='map_employer@example.com', user_type='employer')
+    employer.set_password('password')
+    db.session.add(employer)
+    db.session.flush()
+    company = Company(user_id=employer.id, company_name='Map Co')
+    db.session.add(company)
+    db.session.flush()
+    jobs = [JobPosting(company_id=company.id, title=f'Map Job {n}', description='Role') for n in range(12)]
+    closed = JobPosting(company_id=company.id, title='Closed', description='Role', is_active=False)
+    db.session.add_all(jobs + [closed])
+    db.session.commit()
+
+    first = sitemaps.build()
+    assert first['written'] and not first['removed']
+    chunk = f'jobs-{jobs[0].id // 5}.xml'
+    xml = (tmp_path / chunk).read_text()
+    assert f'<loc>https://jobs.example.com/jobseeker/job/{jobs[0].id}</loc>' in xml
+    assert f'/jobseeker/job/{closed.id}<' not in (tmp_path / f'jobs-{closed.id // 5}.xml').read_text()
+    assert gzip.decompress((tmp_path / (chunk + '.gz')).read_bytes()).decode() == xml
+    index = (tmp_path / 'sitemap.xml').read_text()
+    assert f'<loc>https://jobs.example.com/sitemaps/{chunk}</loc>' in index
+    assert f'companies-{company.id // 5}.xml' in index
+
+    assert sitemaps.build() == {'written': [], 'removed': [], 'unchanged': len(first['written'])}
+
+    jobs[0].updated_at = datetime.utcnow() + timedelta(minutes=1)
+    db.session.commit()
+    assert sitemaps.build()['written'] == [chunk]
+    assert sitemaps.build(full=True)['written'] == first['written']
+    index, xml = (tmp_path / 'sitemap.xml').read_text(), (tmp_path / chunk).read_text()
+
+    response = client.get('/sitemap.xml', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data).decode() == index
+    response.close()
+    response = client.get(f'/sitemaps/{chunk}')
+    assert response.mimetype == 'application/xml' and 'Content-Encoding' not in response.headers
+    assert response.get_data(as_text=True) == xml
+    response.close()
+    assert client.get('/sitemaps/manifest.json').status_code == 404
+    assert client.get('/sitemaps/jobs-999999.xml').status_code == 404
@@ -0,0 +1,75 @@
+"""
+Tests for typo-tolerant search.
+"""
+import time
+from app.extensions import db, spelling
+from app.models import Company, JobPosting, User
+from app.services.spelling import SpellingIndex, edit_distance
+
+VOCABULARY = {'python': 40, 'engineer': 30, 'engine': 5, 'nurse': 12, 'purse': 1, 'manager': 25}
+
+
+def test_edit_distance_counts_transpositions_once():
+    """Test swapped letters are a single edit and the bound is respected."""
+    assert edit_distance('pyhton', 'python', 2) == 1
+    assert edit_distance('enginer', 'engineer', 2) == 1
+    assert edit_distance('nurse', 'manager', 2) == 3
+
+
+def test_index_corrects_unknown_words():
+    """Test misspellings map to the closest, most common known word."""
+    index = SpellingIndex(VOCABULARY)
+    assert index.correct('pyhton') == ('python', True)
+    assert index.correct('enginer') == ('engineer', True)
+    assert index.correct('python') is None
+    assert index.correct('zzzzzz') is None
+    # Too short to correct safely
+    assert index.correct('pyt') is None
+    # Seen once: a real word, searched as typed
+    assert index.correct('purse') is None
+
+
+def test_only_unknown_words_are_replaced_when_applying(app, monkeypatch):
+    """Test "did you mean" replacements of known words don't leak into the searched keyword."""
+    index = SpellingIndex({'python': 400, 'engineer': 300, 'engineers': 2})
+    assert index.correct('engineers') == ('engineer', False)
+    monkeypatch.setattr(spelling, '_current_index', lambda domain: index)
+    assert spelling.suggest('jobs', 'Pyhton engineers') == ('Python engineers', True)
+    assert spelling.suggest('jobs', 'engineers') == ('engineer', False)
+
+
+def test_index_lookup_is_fast():
+    """Test candidate generation over a large vocabulary stays under a millisecond."""
+    words = {f'{a}{b}{c}tion': 3 for a in 'abcdefghij' for b in 'klmnopqrst' for c in 'uvwxyzabcd'}
+    index = SpellingIndex({**words, **VOCABULARY})
+    start = time.perf_counter()
+    for word in ('pyhton', 'enginer', 'akuitno'):
+        index.correct(word)
+    assert (time.perf_counter() - start) / 3 < 0.001
+
+
+def test_job_search_corrects_keyword(client, app):
+    """Test a misspelled keyword is searched as its correction."""
+    employer = User(username='speller', email='speller@example.com', user_type='employer')
+    seeker = User(username='misspeller', email='misspeller@example.com', user_type='jobseeker')
+    for user in (employer, seeker):
+        user.set_password('password')
+        db.session.add(user)
+    db.session.flush()
+    company = Company(user_id=employer.id, company_name='Snakes Inc')
+    db.session.add(company)
+    db.session.flush()
+    for i in range(2):
+        db.session.add(JobPosting(company_id=company.id, title='Python Developer',
+                                  description='Build Python services'))
+    db.session.commit()
+    spelling.rebuild('jobs')
+
+    client.post('/auth/login', data={'username': 'misspeller', 'password': 'password'})
+    response = client.get('/jobseeker/job-search?keyword=Pyhton')
+    assert b'Showing results for' in response.data
+    assert b'Python Developer' in response.data
+
+    response = client.get('/jobseeker/job-search?keyword=Pyhton&exact=1')
+    assert b'Python Developer' not in response.data
+    client.get('/auth/logout')
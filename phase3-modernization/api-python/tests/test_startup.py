@@ -0,0 +1,40 @@
+"""
+Tests for startup timing and fast-start mode.
+"""
+import pytest
+from app import create_app
+from app.config import TestingConfig, validate_config
+from app.services.startup import StartupTimer
+
+
+def test_startup_report_phases(app):
+    """Test create_app records its startup phases."""
+    report = app.extensions['startup'].report()
+    for phase in ('config', 'extensions', 'blueprints', 'total'):
+        assert f'{phase}=' in report
+
+
+def test_fast_start_skips_create_all_and_alembic():
+    """Test fast-start mode skips create_all and Flask-Migrate."""
+    class FastStartConfig(TestingConfig):
+        FAST_START = True
+
+    app = create_app(FastStartConfig)
+    assert 'create_all=skipped' in app.extensions['startup'].report()
+    assert 'migrate' not in app.extensions
+
+
+def test_skipped_phase_not_in_total():
+    """Test skipped phases do not count towards the total."""
+    timer = StartupTimer()
+    timer.skip('create_all')
+    with timer.phase('config'):
+        pass
+    assert timer.total >= 0
+    assert 'create_all=skipped' in timer.report()
+
+
+def test_validate_config_requires_secret_key():
+    """Test missing required settings are rejected."""
+    with pytest.raises(ValueError):
+        validate_config({'SECRET_KEY': None, 'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
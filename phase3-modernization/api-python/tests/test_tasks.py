@@ -0,0 +1,72 @@
+"""
+Tests for the background task queue.
+"""
+from datetime import datetime, timedelta
+from app.extensions import db
+from app.models import BackgroundTask
+from app.services.tasks import Worker, task
+
+calls = []
+
+
+@task(priority=5)
+def remember(value):
+    calls.append(value)
+
+
+@task(max_attempts=2, backoff_seconds=30)
+def always_fails():
+    raise RuntimeError('boom')
+
+
+def test_queued_task_runs(app):
+    """Test a delayed task runs once the worker drains the queue."""
+    remember.delay(value='hello')
+    db.session.commit()
+    assert Worker(app).run_pending() == 1
+    assert 'hello' in calls
+    row = BackgroundTask.query.filter_by(name=remember.task_name).order_by(BackgroundTask.id.desc()).first()
+    assert row.status == 'done'
+
+
+def test_failed_task_retried_with_backoff_then_failed(app):
+    """Test failures are rescheduled and given up after max attempts."""
+    row = always_fails.delay()
+    db.session.commit()
+    worker = Worker(app)
+    worker.run_pending()
+    db.session.refresh(row)
+    assert row.status == 'queued'
+    assert row.attempts == 1
+    assert row.run_at > datetime.utcnow()
+    assert 'boom' in row.last_error
+
+    row.run_at = datetime.utcnow()
+    db.session.commit()
+    worker.run_pending()
+    db.session.refresh(row)
+    assert row.status == 'failed'
+
+
+def test_claim_orders_by_priority(app):
+    """Test higher-priority tasks are claimed first."""
+    remember.enqueue({'value': 'low'}, priority=0)
+    remember.enqueue({'value': 'high'}, priority=10)
+    db.session.commit()
+    claimed = Worker(app).claim(1)
+    assert '"high"' in claimed[0].payload
+    Worker(app).run_pending()
+
+
+def test_stale_tasks_requeued_until_out_of_attempts(app):
+    """Test tasks held by a dead worker are requeued, then failed after max attempts."""
+    row = always_fails.delay()
+    db.session.commit()
+    stale = datetime.utcnow() - timedelta(seconds=app.config.get('TASK_VISIBILITY_TIMEOUT', 600) + 1)
+    for status in ('queued', 'failed'):
+        row.status, row.attempts, row.locked_by, row.locked_at = 'running', row.attempts + 1, 'dead:1', stale
+        db.session.commit()
+        Worker(app).claim(0)
+        db.session.refresh(row)
+        assert row.status == status and row.locked_by is None
+    assert 'stopped' in row.last_error
@@ -0,0 +1,30 @@
+"""
+Tests for template precompilation and render timing.
+"""
+from app import create_app
+from app.config import TestingConfig
+from app.extensions import template_profiler
+from app.services.templates import precompile
+
+
+def test_precompile_loads_all_templates(app):
+    """Test every template compiles."""
+    assert precompile(app) >= len(['base.html', 'main/index.html', 'auth/login.html'])
+
+
+def test_render_timing_recorded(client):
+    """Test rendering a page records its template timing."""
+    client.get('/about')
+    templates = {row['template']: row for row in template_profiler.snapshot()}
+    assert templates['main/about.html']['count'] >= 1
+
+
+def test_bytecode_cache_written(tmp_path):
+    """Test compiled templates are written to the bytecode cache directory."""
+    class CachedTemplatesConfig(TestingConfig):
+        TEMPLATE_BYTECODE_CACHE = True
+        TEMPLATE_CACHE_DIR = str(tmp_path)
+        PRECOMPILE_TEMPLATES = True
+
+    create_app(CachedTemplatesConfig)
+    assert any(p.suffix == '.cache' for p in tmp_path.iterdir())
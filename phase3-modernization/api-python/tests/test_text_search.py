@@ -0,0 +1,111 @@
+"""
+Tests for the full-text search backends.
+"""
+import importlib.util
+import os
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from app.extensions import db, search_cache, text_search
+from app.models import Company, JobPosting, User
+from app.services.text_search import NATIVE, PostgresBackend, terms
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import OperationalError
+
+MIGRATION = os.path.join(os.path.dirname(__file__), '..', 'migrations', 'versions',
+                         '056f1cac4068_native_full_text_search.py')
+
+
+def _run_migration(direction):
+    spec = importlib.util.spec_from_file_location('full_text_search_migration', MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    with db.engine.begin() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            getattr(migration, direction)()
+    text_search.clear()
+
+
+@pytest.fixture
+def postings(app):
+    user = User(username='fts_employer', email='fts_employer@example.com', user_type='employer')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.flush()
+    company = Company(user_id=user.id, company_name='FTS Co')
+    db.session.add(company)
+    db.session.flush()
+    rows = [
+        JobPosting(company_id=company.id, title='Warehouse Lead', description='Supervise ftsnursing staff'),
+        JobPosting(company_id=company.id, title='Ftsnursing Assistant', description='Night shifts'),
+    ]
+    db.session.add_all(rows)
+    db.session.commit()
+    return rows
+
+
+def _search(keyword):
+    query, rank = text_search.apply(JobPosting.query, JobPosting, keyword)
+    order = (rank,) if rank is not None else ()
+    return [job.title for job in query.order_by(*order, JobPosting.id)]
+
+
+def test_terms_are_words():
+    """Test only letters and digits reach the full-text query syntax."""
+    assert terms('C++ "nurse" night_shift') == ['c', 'nurse', 'night', 'shift']
+
+
+def test_postgres_stop_words_are_matched_as_words(app):
+    """Test stop words, which the english tsvector drops, still filter the results."""
+    def compile(keyword):
+        query, rank = PostgresBackend().apply(JobPosting.query, JobPosting, keyword)
+        sql = str(query.statement.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+        return sql, rank
+
+    sql, rank = compile('IT support')
+    assert "to_tsquery('english'::regconfig, 'support:*')" in sql
+    assert "job_postings.title ~* '\\mit'" in sql and rank is not None
+    sql, rank = compile('it')
+    assert 'to_tsquery' not in sql and '~*' in sql and rank is None
+
+
+def test_failed_detection_is_not_cached(app, monkeypatch):
+    """Test a database error while detecting falls back to LIKE for that search only."""
+    native = NATIVE[db.engine.dialect.name]
+
+    def unavailable(connection, table):
+        raise OperationalError('SELECT 1', {}, Exception('connection reset'))
+
+    text_search.clear()
+    monkeypatch.setattr(native, 'available', unavailable)
+    assert text_search.backend('job_postings').name == 'like'
+    assert 'job_postings' not in text_search.snapshot()
+    monkeypatch.undo()
+    text_search.backend('job_postings')
+    assert 'job_postings' in text_search.snapshot()
+
+
+def test_native_backend_after_migration(app, postings):
+    """Test the FTS5 index is found, kept in sync, and ranks title matches first."""
+    if db.engine.dialect.name != 'sqlite':
+        pytest.skip('exercises the SQLite backend')
+    assert text_search.backend('job_postings').name == 'like'
+    assert _search('ftsnursing') == ['Warehouse Lead', 'Ftsnursing Assistant']
+
+    _run_migration('upgrade')
+    try:
+        assert text_search.backend('job_postings').name == 'sqlite'
+        # Stemmed prefix match, best (title) match first
+        assert _search('ftsnurs') == ['Ftsnursing Assistant', 'Warehouse Lead']
+        assert _search('ftsnursing night') == ['Ftsnursing Assistant']
+        query, rank = text_search.apply(JobPosting.query, JobPosting, 'ftsnurs')
+        page = search_cache.paginate(('ftsnurs',), query.order_by(rank, JobPosting.id), page=1)
+        assert page.total == 2 and page.items[0].title == 'Ftsnursing Assistant'
+
+        postings[0].description = 'Supervise the loading dock'
+        db.session.commit()
+        assert _search('ftsnursing') == ['Ftsnursing Assistant']
+    finally:
+        _run_migration('downgrade')
+    assert text_search.backend('job_postings').name == 'like'
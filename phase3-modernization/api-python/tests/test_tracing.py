@@ -0,0 +1,65 @@
+"""
+Tests for local request tracing.
+"""
+import pytest
+from app.extensions import db, tracer
+from app.models import User
+from app.services.tracing import format_trace, read_traces
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    """Trace every request into a temporary file."""
+    saved = (tracer.enabled, tracer.sample_rate, tracer.slow_seconds, tracer.path)
+    tracer.enabled, tracer.sample_rate, tracer.slow_seconds = True, 1.0, None
+    tracer.path = str(tmp_path / 'traces.jsonl')
+    yield tracer.path
+    tracer.enabled, tracer.sample_rate, tracer.slow_seconds, tracer.path = saved
+
+
+def _attributes(item):
+    return {a['key']: next(iter(a['value'].values())) for a in item['attributes']}
+
+
+def test_request_spans_are_nested(client, trace_file):
+    """Test handler, SQL, bcrypt and template spans hang off the request span."""
+    user = User(username='tracing_user', email='tracing_user@example.com', user_type='jobseeker')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+
+    client.post('/auth/login', data={'username': 'tracing_user', 'password': 'wrong'})
+    (spans,) = read_traces(trace_file)
+    by_name = {}
+    for item in spans:
+        by_name.setdefault(item['name'], item)
+
+    root = by_name['POST /auth/login']
+    handler = by_name['handler auth.login']
+    assert 'parentSpanId' not in root and handler['parentSpanId'] == root['spanId']
+    assert by_name['bcrypt.check']['parentSpanId'] == handler['spanId']
+    assert by_name['render_template']['parentSpanId'] == handler['spanId']
+    query = by_name['db SELECT']
+    assert 'users' in _attributes(query)['db.statement']
+    assert _attributes(root)['http.status_code'] == '200'
+    assert len({item['traceId'] for item in spans}) == 1
+    assert 'handler auth.login' in format_trace(spans)
+
+
+def test_head_sampling_keeps_slow_requests(client, trace_file):
+    """Test unsampled requests are exported only when slow."""
+    tracer.sample_rate = 0.0
+    client.get('/auth/login')
+    tracer.slow_seconds = 0.0
+    client.get('/auth/login')
+    (spans,) = read_traces(trace_file)
+    assert _attributes(spans[0])['trace.kept'] == 'slow'
+
+
+def test_incoming_traceparent_is_continued(client, trace_file):
+    """Test a sampled W3C traceparent sets the trace id and parent."""
+    tracer.sample_rate = 0.0
+    trace_id, parent_id = '4bf92f3577b34da6a3ce929d0e0e4736', '00f067aa0ba902b7'
+    client.get('/auth/login', headers={'traceparent': f'00-{trace_id}-{parent_id}-01'})
+    (spans,) = read_traces(trace_file)
+    assert spans[0]['traceId'] == trace_id and spans[0]['parentSpanId'] == parent_id
@@ -0,0 +1,92 @@
+"""
+Tests for write-behind user bookkeeping.
+"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from app.extensions import db, user_activity
+from app.models import User
+from app.services import write_behind
+
+
+@pytest.fixture(scope='module')
+def member(app):
+    user = User(username='stamped', email='stamped@example.com', user_type='jobseeker')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    user_activity.flush()
+    return user
+
+
+def _stored(user):
+    db.session.expire(user)
+    return user.last_login, user.updated_at
+
+
+def test_login_stamp_is_written_behind(client, member):
+    """Test logging in doesn't write last_login until the buffer is flushed."""
+    _, updated_at = _stored(member)
+    client.post('/auth/login', data={'username': 'stamped', 'password': 'password'})
+    client.get('/auth/logout')
+    assert user_activity.pending() == 1
+    assert _stored(member)[0] is None
+
+    assert user_activity.flush() == 1
+    last_login, after = _stored(member)
+    assert last_login is not None and datetime.utcnow() - last_login < timedelta(minutes=1)
+    # Bookkeeping isn't an edit of the account
+    assert after == updated_at
+    assert user_activity.snapshot()['last_lag'] >= 0
+
+
+def test_stamps_coalesce_and_never_go_backwards(app, member):
+    """Test several stamps of a user become one row holding the latest time."""
+    latest = datetime(2030, 1, 2, 3, 4, 5)
+    user_activity.stamp(member.id, 'last_login', latest - timedelta(hours=1))
+    user_activity.stamp(member.id, 'last_login', latest)
+    user_activity.stamp(member.id, 'last_login', latest - timedelta(hours=2))
+    assert user_activity.pending() == 1
+    assert user_activity.flush() == 1
+    assert _stored(member)[0] == latest
+
+    # An older stamp flushed later (e.g. by another worker) is ignored
+    user_activity.stamp(member.id, 'last_login', latest - timedelta(days=1))
+    user_activity.flush()
+    assert _stored(member)[0] == latest
+
+    with pytest.raises(ValueError):
+        user_activity.stamp(member.id, 'password_hash')
+
+
+def test_flusher_survives_unexpected_errors(app):
+    """Test a flush failing with a non-database error doesn't stop the flusher thread."""
+    attempts = []
+
+    class Broken(write_behind.WriteBehind):
+        name = 'broken'
+
+        def _rows(self, pending):
+            return list(pending.items())
+
+        def _restore(self, rows):
+            self._pending.update(rows)
+
+        def _write(self, connection, rows):
+            attempts.append(rows)
+            raise TypeError('bad row')
+
+    buffer = Broken()
+    write_behind._buffers.remove(buffer)
+    buffer.init_app(app, flush_seconds=0.01, max_pending=100)
+    with buffer._lock:
+        buffer._pending[1] = 'value'
+        buffer._mark()
+    buffer._changed(1)
+    deadline = time.monotonic() + 5
+    while len(attempts) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    buffer._flusher_pid = None
+    buffer._wake.set()
+    assert len(attempts) >= 3 and buffer.pending() == 1